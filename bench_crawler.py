@@ -0,0 +1,169 @@
+"""
+抓取吞吐量基准
+在独立进程中启动本地测试站点（fixture_site.py），按不同的concurrency设置运行FixedAsyncCourtCrawler，
+报告每秒文书数、各阶段p50/p95延迟和本进程树（含浏览器，不含测试站点）的峰值内存。
+使用方法：python bench_crawler.py [--concurrency 1 2 4] [--cases 60] [--http-detail] [--detail-latency 0.2]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+from sh_court_fixed_async_page import FixedAsyncCourtCrawler
+
+# 报告中列出的阶段
+REPORT_STAGES = ('goto', 'submit_search', 'list_extract', 'page_turn', 'detail_http',
+                 'detail_open', 'detail_extract', 'save')
+
+def _children_map():
+    children = {}
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat', 'r') as f:
+                # 进程名可能含空格，从最后一个')'之后取字段
+                fields = f.read().rsplit(')', 1)[1].split()
+            children.setdefault(int(fields[1]), []).append(int(entry))
+        except (OSError, IndexError):
+            continue
+    return children
+
+def _rss_kb(pid):
+    try:
+        with open(f'/proc/{pid}/status', 'r') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return 0
+
+def process_tree_rss_mb(root_pid, exclude=()):
+    """root_pid及其所有子进程的RSS之和（MB），exclude中的进程及其子进程不计入"""
+    if not os.path.isdir('/proc'):
+        # 非Linux：只能取本进程的峰值
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    children = _children_map()
+    total = 0
+    stack = [root_pid]
+    while stack:
+        pid = stack.pop()
+        if pid in exclude:
+            continue
+        total += _rss_kb(pid)
+        stack.extend(children.get(pid, []))
+    return total / 1024
+
+async def sample_peak_rss(peak, exclude, interval=0.2):
+    """定期采样进程树内存，峰值写入peak['mb']"""
+    while True:
+        peak['mb'] = max(peak['mb'], process_tree_rss_mb(os.getpid(), exclude))
+        await asyncio.sleep(interval)
+
+async def wait_for_port(host, port, timeout=10):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            _, writer = await asyncio.open_connection(host, port)
+            writer.close()
+            return True
+        except OSError:
+            await asyncio.sleep(0.1)
+    return False
+
+async def run_setting(start_url, concurrency, args, output_root, exclude):
+    crawler = FixedAsyncCourtCrawler(
+        headless=True,
+        max_cases=args.cases,
+        output_dir=output_root / f"concurrency_{concurrency}",
+        concurrency=concurrency,
+        max_rate=args.max_rate,
+        http_detail=args.http_detail,
+        skip_known=False,
+        parquet_output=False
+    )
+    
+    peak = {'mb': 0.0}
+    sampler = asyncio.create_task(sample_peak_rss(peak, exclude))
+    start = time.monotonic()
+    try:
+        await crawler.run(start_url)
+    finally:
+        sampler.cancel()
+    elapsed = time.monotonic() - start
+    
+    stages = crawler.metrics.summary()['stages']
+    documents = crawler.stats['success']
+    return {
+        'concurrency': concurrency,
+        'documents': documents,
+        'failed': crawler.stats['failed'],
+        'seconds': round(elapsed, 2),
+        'docs_per_sec': round(documents / elapsed, 3) if elapsed else 0.0,
+        'first_record_sec': crawler.stats['first_record_sec'],
+        'peak_rss_mb': round(peak['mb'], 1),
+        'stages': {name: {'p50': info['p50'], 'p95': info['p95'], 'count': info['count']}
+                   for name, info in stages.items() if name in REPORT_STAGES},
+    }
+
+def print_report(results):
+    print("\n" + "=" * 60)
+    print("基准结果")
+    print("=" * 60)
+    print(f"{'并发':>4} {'文书':>6} {'耗时(秒)':>9} {'文书/秒':>8} {'峰值内存(MB)':>12}")
+    for r in results:
+        print(f"{r['concurrency']:>4} {r['documents']:>6} {r['seconds']:>9} {r['docs_per_sec']:>8} {r['peak_rss_mb']:>12}")
+    print("\n各阶段延迟 p50 / p95（秒）:")
+    for r in results:
+        stages = '  '.join(f"{name} {info['p50']}/{info['p95']}" for name, info in r['stages'].items())
+        print(f"  并发{r['concurrency']}: {stages}")
+
+async def main():
+    parser = argparse.ArgumentParser(description="抓取吞吐量基准（本地测试站点）")
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 2, 4], help="要比较的worker数量")
+    parser.add_argument('--cases', type=int, default=60, help="每组抓取的文书数")
+    parser.add_argument('--max-rate', type=float, default=50, help="限速（每秒请求数），基准测试时放宽")
+    parser.add_argument('--http-detail', action='store_true', help="详情页使用直连模式")
+    parser.add_argument('--port', type=int, default=8900)
+    parser.add_argument('--docs', type=int, default=300, help="测试站点文书总数")
+    parser.add_argument('--detail-latency', type=float, default=0.2, help="测试站点详情页延迟（秒）")
+    parser.add_argument('--output-root', default='基准测试')
+    args = parser.parse_args()
+    
+    output_root = Path(args.output_root) / datetime.now().strftime('%Y%m%d_%H%M%S')
+    output_root.mkdir(parents=True, exist_ok=True)
+    
+    site = subprocess.Popen(
+        [sys.executable, 'fixture_site.py', '--port', str(args.port), '--docs', str(args.docs),
+         '--detail-latency', str(args.detail_latency)],
+        cwd=Path(__file__).resolve().parent
+    )
+    try:
+        if not await wait_for_port('127.0.0.1', args.port):
+            print("❌ 测试站点未能启动")
+            return
+        start_url = f"http://127.0.0.1:{args.port}/shfy/gweb2017/flws_list_new.jsp?ajlb=aYWpsYj3QzMrCz"
+        
+        results = []
+        for concurrency in args.concurrency:
+            print(f"\n🏁 并发 {concurrency}：抓取 {args.cases} 篇")
+            results.append(await run_setting(start_url, concurrency, args, output_root, {site.pid}))
+        
+        print_report(results)
+        report_file = output_root / "bench_results.json"
+        with open(report_file, 'w', encoding='utf-8') as f:
+            json.dump({'args': vars(args), 'results': results}, f, ensure_ascii=False, indent=2)
+        print(f"\n📄 结果已保存: {report_file}")
+    finally:
+        site.terminate()
+        site.wait()
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,91 @@
+"""
+列表页提取微基准：逐locator提取 vs 单次evaluate提取
+使用方法：python bench_list_extract.py [列表页HTML文件] [重复次数]
+默认读取 debug_page_structure.py 保存的 页面诊断/page_source.html
+"""
+
+import asyncio
+import re
+import sys
+import time
+from pathlib import Path
+from playwright.async_api import async_playwright
+from list_extract import ROW_SELECTOR, extract_rows
+
+async def extract_rows_per_locator(page):
+    """旧的逐行逐单元格提取方式（每个属性/单元格一次浏览器往返）"""
+    rows = []
+    case_rows = await page.locator(ROW_SELECTOR).all()
+    for i, row in enumerate(case_rows):
+        row_id = await row.get_attribute('id') or f"tr{i}"
+        onclick_attr = await row.get_attribute('onclick') or ""
+        
+        detail_param = ""
+        if onclick_attr:
+            match = re.search(r"showone\('([^']+)'\)", onclick_attr)
+            if match:
+                detail_param = match.group(1)
+        
+        cells = await row.locator('td').all()
+        if len(cells) >= 7:
+            texts = [await cell.inner_text() for cell in cells[:7]]
+            rows.append({
+                'row_id': row_id,
+                'case_number': texts[0].strip(),
+                'title': texts[1].strip(),
+                'doc_type': texts[2].strip(),
+                'case_reason': texts[3].replace('&nbsp;', '').strip(),
+                'department': texts[4].replace('&nbsp;', '').strip(),
+                'level': texts[5].replace('&nbsp;', '').strip(),
+                'close_date': texts[6].strip(),
+                'detail_param': detail_param,
+                'row_index': i
+            })
+    return len(case_rows), rows
+
+async def timeit(func, page, rounds):
+    """返回 (每轮平均毫秒, 最后一轮的行数)"""
+    count = 0
+    start = time.perf_counter()
+    for _ in range(rounds):
+        count, _ = await func(page)
+    elapsed = time.perf_counter() - start
+    return elapsed / rounds * 1000, count
+
+async def main():
+    html_file = Path(sys.argv[1]) if len(sys.argv) > 1 else Path("页面诊断") / "page_source.html"
+    rounds = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    
+    if not html_file.exists():
+        print(f"❌ 找不到列表页文件: {html_file}")
+        print("请先运行 python debug_page_structure.py 保存页面源码")
+        return
+    
+    html = html_file.read_text(encoding='utf-8')
+    
+    async with async_playwright() as p:
+        browser = await p.chromium.launch(headless=True)
+        page = await browser.new_page()
+        # 禁止页面脚本访问网络，只测提取本身
+        await page.route('**/*', lambda route: route.abort())
+        await page.set_content(html)
+        
+        # 预热并校验两种方式结果一致
+        _, old_rows = await extract_rows_per_locator(page)
+        _, new_rows = await extract_rows(page)
+        new_dicts = [row.to_dict() for row in new_rows]
+        same = [r['case_number'] for r in old_rows] == [r['case_number'] for r in new_dicts]
+        print(f"📄 {html_file}: {len(new_rows)} 个文书行，结果一致: {same}")
+        
+        old_ms, _ = await timeit(extract_rows_per_locator, page, rounds)
+        new_ms, _ = await timeit(extract_rows, page, rounds)
+        
+        print(f"逐locator提取: {old_ms:.1f} ms/页")
+        print(f"单次evaluate: {new_ms:.1f} ms/页")
+        if new_ms > 0:
+            print(f"加速比: {old_ms / new_ms:.1f}x")
+        
+        await browser.close()
+
+if __name__ == "__main__":
+    asyncio.run(main())
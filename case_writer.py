@@ -0,0 +1,164 @@
+"""
+增量数据写入
+每抓完一篇文书就追加一行到JSONL文件（后台任务写盘、批量fsync），
+JSON/CSV快照只在结束时或按需从JSONL逐条流式生成，内存占用与文书数量无关
+"""
+
+import asyncio
+import csv
+import json
+import os
+import time
+
+class JsonlCaseWriter:
+    def __init__(self, path, fsync_every=20, fsync_interval=5.0, max_pending=200):
+        """
+        path: JSONL输出文件（追加写入）
+        fsync_every: 累计写入多少条记录后fsync一次
+        fsync_interval: 距上次fsync超过多少秒时也会fsync（包括空闲时）
+        max_pending: 等待写盘的记录上限，磁盘跟不上时write()会等待，而不是在内存中堆积
+        """
+        self.path = path
+        self.fsync_every = fsync_every
+        self.fsync_interval = fsync_interval
+        self.max_pending = max_pending
+        self.written = 0
+        self._queue = None
+        self._task = None
+        self._file = None
+    
+    async def start(self):
+        """打开文件并启动后台写盘任务"""
+        if self._task:
+            return
+        self._file = open(self.path, 'a', encoding='utf-8')
+        self._queue = asyncio.Queue(maxsize=self.max_pending)
+        self._task = asyncio.create_task(self._run())
+    
+    async def write(self, record):
+        """提交一条记录，由后台任务写盘（待写记录达到上限时等待）"""
+        if not self._task:
+            await self.start()
+        await self._queue.put(record)
+    
+    async def close(self):
+        """写完队列中剩余记录，fsync并关闭文件"""
+        if not self._task:
+            return
+        await self._queue.put(None)
+        await self._task
+        self._task = None
+        self._file.close()
+        self._file = None
+    
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        unsynced = 0
+        last_sync = time.monotonic()
+        closing = False
+        
+        while not closing:
+            try:
+                record = await asyncio.wait_for(self._queue.get(), timeout=self.fsync_interval)
+                batch = [record]
+            except asyncio.TimeoutError:
+                batch = []
+            
+            # 把已经排队的记录一起取出，合并成一次写盘
+            while not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            
+            if None in batch:
+                closing = True
+                batch = [r for r in batch if r is not None]
+            
+            lines = ''.join(json.dumps(r, ensure_ascii=False) + '\n' for r in batch)
+            unsynced += len(batch)
+            self.written += len(batch)
+            
+            need_sync = unsynced and (
+                closing
+                or unsynced >= self.fsync_every
+                or time.monotonic() - last_sync >= self.fsync_interval
+            )
+            try:
+                await loop.run_in_executor(None, self._write_lines, lines, need_sync)
+            except Exception as e:
+                print(f"❌ 写入JSONL失败: {e}")
+            
+            if need_sync:
+                unsynced = 0
+                last_sync = time.monotonic()
+    
+    def _write_lines(self, lines, sync):
+        if lines:
+            self._file.write(lines)
+            self._file.flush()
+        if sync:
+            os.fsync(self._file.fileno())
+
+def iter_jsonl(path):
+    """逐条读取JSONL文件，跳过崩溃时可能残留的不完整末行"""
+    if not os.path.exists(path):
+        return
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                continue
+
+def read_jsonl(path):
+    """读取JSONL文件的全部记录（只用于小文件，大文件用iter_jsonl）"""
+    return list(iter_jsonl(path))
+
+def _collect_fields(jsonl_file):
+    """第一遍扫描：按首次出现的顺序收集所有字段名，返回 (字段列表, 记录数)"""
+    fields = {}
+    count = 0
+    for record in iter_jsonl(jsonl_file):
+        count += 1
+        for key in record:
+            fields.setdefault(key, None)
+    return list(fields), count
+
+def build_snapshots(jsonl_file, json_file, csv_file):
+    """
+    从JSONL生成JSON、CSV和简版CSV（不含长文本）快照
+    先扫描一遍收集字段，再逐条写出三个文件，不把全部记录读入内存
+    返回写出的文件列表
+    """
+    fields, count = _collect_fields(jsonl_file)
+    if not count:
+        return []
+    
+    outputs = [json_file, csv_file]
+    simple_file = None
+    if 'detail_text' in fields:
+        simple_file = csv_file.with_name(f"简版_{csv_file.name}")
+        outputs.append(simple_file)
+    simple_fields = [name for name in fields if name != 'detail_text']
+    
+    with open(json_file, 'w', encoding='utf-8') as jf, \
+            open(csv_file, 'w', encoding='utf-8-sig', newline='') as cf, \
+            open(simple_file or os.devnull, 'w', encoding='utf-8-sig', newline='') as sf:
+        csv_writer = csv.DictWriter(cf, fieldnames=fields)
+        csv_writer.writeheader()
+        simple_writer = csv.DictWriter(sf, fieldnames=simple_fields, extrasaction='ignore')
+        if simple_file:
+            simple_writer.writeheader()
+        
+        # 与json.dump(records, indent=2)的格式相同
+        jf.write('[')
+        for index, record in enumerate(iter_jsonl(jsonl_file)):
+            body = json.dumps(record, ensure_ascii=False, indent=2).replace('\n', '\n  ')
+            jf.write((',\n  ' if index else '\n  ') + body)
+            csv_writer.writerow(record)
+            if simple_file:
+                simple_writer.writerow(record)
+        jf.write('\n]')
+    
+    return outputs
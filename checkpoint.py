@@ -0,0 +1,151 @@
+"""
+抓取断点日志
+以追加方式记录查询、当前列表页码和已完成的文书，
+程序中断后可以用 --resume 直接跳回断点所在页并跳过已完成的文书
+"""
+
+import hashlib
+import json
+import os
+import time
+from datetime import datetime
+from pathlib import Path
+
+class CrawlCheckpoint:
+    def __init__(self, output_dir, query, fsync_every=20, fsync_interval=5.0):
+        """
+        output_dir: 断点文件所在目录
+        query: 查询标识（起始URL），不同查询使用不同的断点文件
+        fsync_every / fsync_interval: 与JsonlCaseWriter相同的批量fsync策略（累计条数或间隔秒数）
+        """
+        self.query = query
+        self.fsync_every = fsync_every
+        self.fsync_interval = fsync_interval
+        key = hashlib.sha1(query.encode('utf-8')).hexdigest()[:12]
+        self.path = Path(output_dir) / f"checkpoint_{key}.jsonl"
+        
+        self.page = 1
+        self.output_file = None
+        self.done_params = set()
+        self.done_rows = set()
+        self.done_numbers = set()
+        # 每篇已完成文书一个键，用于计数（查询分区之间页码和行号会重复，不能按行计数）
+        self.done_keys = set()
+        self._file = None
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+    
+    @property
+    def done_count(self):
+        return len(self.done_keys)
+    
+    def load(self):
+        """回放断点日志，返回是否找到可恢复的断点"""
+        if not self.path.exists():
+            return False
+        
+        found = False
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    event = json.loads(line)
+                except json.JSONDecodeError:
+                    # 崩溃时最后一行可能没写完整
+                    continue
+                
+                kind = event.get('type')
+                if kind == 'start' and event.get('query') == self.query:
+                    found = True
+                    self.output_file = event.get('output_file')
+                elif kind == 'page':
+                    self.page = event['page']
+                elif kind == 'done':
+                    self._remember(event)
+        return found
+    
+    def start(self, resume, output_file):
+        """
+        resume=True 时尝试恢复已有断点，否则开始新的断点日志
+        返回是否从断点恢复
+        """
+        if resume and self.load():
+            self._file = open(self.path, 'a', encoding='utf-8')
+            return True
+        
+        self.page = 1
+        self.output_file = str(output_file)
+        self.done_params.clear()
+        self.done_rows.clear()
+        self.done_numbers.clear()
+        self.done_keys.clear()
+        self._file = open(self.path, 'w', encoding='utf-8')
+        self._append({
+            'type': 'start',
+            'query': self.query,
+            'output_file': self.output_file,
+            'time': datetime.now().isoformat()
+        })
+        return False
+    
+    def record_page(self, page_num):
+        """记录开始处理的列表页"""
+        if page_num != self.page:
+            self.page = page_num
+            self._append({'type': 'page', 'page': page_num})
+    
+    def mark_done(self, case):
+        """记录一篇已成功抓取的文书"""
+        event = {
+            'type': 'done',
+            'row_id': case.get('row_id', ''),
+            'detail_param': case.get('detail_param', ''),
+            'case_number': case.get('case_number', ''),
+            'page': case.get('page_number', self.page)
+        }
+        self._remember(event)
+        self._append(event)
+    
+    def is_done(self, case):
+        """判断文书是否在之前的运行中已完成"""
+        if case.get('detail_param') and case['detail_param'] in self.done_params:
+            return True
+        if case.get('case_number') and case['case_number'] in self.done_numbers:
+            return True
+        if case.get('detail_param') or case.get('case_number'):
+            # 有文书标识时不按行号判断：每页的行号都是tr0起，不同查询分区的同一页同一行是不同文书
+            return False
+        return self._row_key(case.get('page_number', self.page), case.get('row_id', '')) in self.done_rows
+    
+    def close(self):
+        if self._file:
+            if self._unsynced:
+                os.fsync(self._file.fileno())
+                self._unsynced = 0
+            self._file.close()
+            self._file = None
+    
+    def _remember(self, event):
+        if event.get('detail_param'):
+            self.done_params.add(event['detail_param'])
+        if event.get('case_number'):
+            self.done_numbers.add(event['case_number'])
+        row_key = self._row_key(event.get('page'), event.get('row_id', ''))
+        self.done_rows.add(row_key)
+        self.done_keys.add(event.get('detail_param') or event.get('case_number') or row_key)
+    
+    @staticmethod
+    def _row_key(page_num, row_id):
+        return f"{page_num}:{row_id}"
+    
+    def _append(self, event):
+        # 每条事件都立即flush到操作系统，进程被杀时断点不丢；fsync按批进行，不在事件循环上每篇文书阻塞一次。
+        # 断电时最多丢最近一批done事件，这些文书下次会重新抓取（JSONL按相同策略fsync，断点不会领先于数据）
+        if not self._file:
+            return
+        self._file.write(json.dumps(event, ensure_ascii=False) + '\n')
+        self._file.flush()
+        self._unsynced += 1
+        if self._unsynced >= self.fsync_every or time.monotonic() - self._last_sync >= self.fsync_interval:
+            os.fsync(self._file.fileno())
+            self._unsynced = 0
+            self._last_sync = time.monotonic()
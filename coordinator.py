@@ -0,0 +1,337 @@
+"""
+多机抓取协调器
+把一次抓取切分为工作单元（列表页码范围），通过带过期时间的租约分发给各台机器上的worker。
+worker崩溃或失联导致租约过期的单元会重新排队；每个单元用现有的FixedAsyncCourtCrawler抓取，
+最后按案号去重合并所有单元的结果。
+队列后端可替换：提供与SqliteWorkQueue相同的方法（add_units/lease/renew/complete/fail/units/counts）即可，
+单机测试直接用本地SQLite文件。
+
+使用方法：
+python coordinator.py plan --queue work_queue.sqlite3 --start-url <列表页地址> --pages-per-unit 10
+python coordinator.py work --queue work_queue.sqlite3 --worker-id node1
+python coordinator.py status --queue work_queue.sqlite3
+python coordinator.py merge --queue work_queue.sqlite3 --output 合并结果
+
+队列里记录的是各单元结果文件的绝对路径，merge在一台机器上读取所有单元的结果，
+所以各worker的 --output-root 需要放在共享存储上（或在merge前把各机器的输出目录同步到相同路径）
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from case_writer import build_snapshots, iter_jsonl
+from sh_court_fixed_async_page import FixedAsyncCourtCrawler
+
+class SqliteWorkQueue:
+    """
+    SQLite实现的租约队列，多个worker进程可以同时使用同一个文件
+    等待其他进程的写锁最长会阻塞30秒，worker在事件循环中通过run_in_executor调用各方法
+    """
+    
+    def __init__(self, path):
+        self.path = path
+        # isolation_level=None：自己控制事务，领取单元时用BEGIN IMMEDIATE加写锁
+        # 各方法在线程池中执行，连接跨线程使用，由_lock串行化
+        self.conn = sqlite3.connect(str(path), timeout=30, isolation_level=None, check_same_thread=False)
+        self._lock = threading.Lock()
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS work_units (
+                unit_id TEXT PRIMARY KEY,
+                start_url TEXT,
+                first_page INTEGER,
+                last_page INTEGER,
+                status TEXT DEFAULT 'pending',
+                worker_id TEXT,
+                lease_expires REAL,
+                attempts INTEGER DEFAULT 0,
+                output_file TEXT,
+                updated_at TEXT
+            )
+        """)
+        self.conn.execute('CREATE INDEX IF NOT EXISTS idx_units_status ON work_units(status)')
+    
+    def add_units(self, units):
+        """加入工作单元，已存在的单元保持原状态（重复plan不会重置进度）"""
+        with self._lock:
+            added = 0
+            for unit in units:
+                cursor = self.conn.execute(
+                    'INSERT OR IGNORE INTO work_units (unit_id, start_url, first_page, last_page, updated_at) '
+                    'VALUES (?, ?, ?, ?, ?)',
+                    (unit['unit_id'], unit['start_url'], unit['first_page'], unit['last_page'],
+                     datetime.now().isoformat())
+                )
+                added += cursor.rowcount
+            return added
+    
+    def lease(self, worker_id, lease_seconds):
+        """
+        领取一个待处理单元，先把租约已过期的单元放回队列
+        没有可领取的单元时返回None
+        """
+        with self._lock:
+            now = time.time()
+            self.conn.execute('BEGIN IMMEDIATE')
+            try:
+                requeued = self.conn.execute(
+                    "UPDATE work_units SET status = 'pending', worker_id = NULL "
+                    "WHERE status = 'leased' AND lease_expires < ?", (now,)
+                ).rowcount
+                if requeued:
+                    print(f"♻️ {requeued} 个租约过期的单元重新排队")
+            
+                row = self.conn.execute(
+                    "SELECT unit_id, start_url, first_page, last_page, attempts FROM work_units "
+                    "WHERE status = 'pending' ORDER BY rowid LIMIT 1"
+                ).fetchone()
+                if row is None:
+                    self.conn.execute('COMMIT')
+                    return None
+            
+                self.conn.execute(
+                    "UPDATE work_units SET status = 'leased', worker_id = ?, lease_expires = ?, "
+                    "attempts = attempts + 1, updated_at = ? WHERE unit_id = ?",
+                    (worker_id, now + lease_seconds, datetime.now().isoformat(), row[0])
+                )
+                self.conn.execute('COMMIT')
+            except Exception:
+                self.conn.execute('ROLLBACK')
+                raise
+        
+            return {
+                'unit_id': row[0],
+                'start_url': row[1],
+                'first_page': row[2],
+                'last_page': row[3],
+                'attempts': row[4] + 1,
+            }
+    
+    def renew(self, unit_id, worker_id, lease_seconds):
+        """续租，租约已经被收回时返回False"""
+        with self._lock:
+            cursor = self.conn.execute(
+                "UPDATE work_units SET lease_expires = ? "
+                "WHERE unit_id = ? AND worker_id = ? AND status = 'leased'",
+                (time.time() + lease_seconds, unit_id, worker_id)
+            )
+            return cursor.rowcount == 1
+    
+    def complete(self, unit_id, worker_id, output_file):
+        """标记完成并记录结果文件，租约已被收回时返回False"""
+        with self._lock:
+            cursor = self.conn.execute(
+                "UPDATE work_units SET status = 'done', output_file = ?, updated_at = ? "
+                "WHERE unit_id = ? AND worker_id = ? AND status = 'leased'",
+                (str(output_file), datetime.now().isoformat(), unit_id, worker_id)
+            )
+            return cursor.rowcount == 1
+    
+    def fail(self, unit_id, worker_id, max_attempts):
+        """单元处理失败：未超过重试次数时重新排队，否则标记为failed"""
+        with self._lock:
+            self.conn.execute(
+                "UPDATE work_units SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END, "
+                "worker_id = NULL, updated_at = ? "
+                "WHERE unit_id = ? AND worker_id = ? AND status = 'leased'",
+                (max_attempts, datetime.now().isoformat(), unit_id, worker_id)
+            )
+    
+    def units(self, status=None):
+        with self._lock:
+            sql = 'SELECT unit_id, start_url, first_page, last_page, status, worker_id, attempts, output_file FROM work_units'
+            params = ()
+            if status:
+                sql += ' WHERE status = ?'
+                params = (status,)
+            columns = ('unit_id', 'start_url', 'first_page', 'last_page', 'status', 'worker_id', 'attempts', 'output_file')
+            return [dict(zip(columns, row)) for row in self.conn.execute(sql + ' ORDER BY rowid', params)]
+    
+    def counts(self):
+        with self._lock:
+            rows = self.conn.execute('SELECT status, COUNT(*) FROM work_units GROUP BY status')
+            return dict(rows.fetchall())
+    
+    def close(self):
+        with self._lock:
+            self.conn.close()
+
+def open_queue(spec):
+    """按地址打开队列后端，目前支持 sqlite:///路径 或直接给SQLite文件路径"""
+    if spec.startswith('sqlite:///'):
+        return SqliteWorkQueue(spec[len('sqlite:///'):])
+    if '://' in spec:
+        raise ValueError(f"不支持的队列后端: {spec}")
+    return SqliteWorkQueue(spec)
+
+def plan_page_units(start_url, total_pages, pages_per_unit):
+    """把1..total_pages切分为连续的页码范围，单元ID由查询和页码范围决定"""
+    query_key = hashlib.sha1(start_url.encode('utf-8')).hexdigest()[:8]
+    units = []
+    for first in range(1, total_pages + 1, pages_per_unit):
+        last = min(first + pages_per_unit - 1, total_pages)
+        units.append({
+            'unit_id': f"{query_key}-p{first:05d}-{last:05d}",
+            'start_url': start_url,
+            'first_page': first,
+            'last_page': last,
+        })
+    return units
+
+async def _queue_call(method, *args):
+    """在线程池中调用队列方法：SQLite等待其他worker的写锁时不阻塞抓取所在的事件循环"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, method, *args)
+
+async def _keep_lease(queue, unit, worker_id, lease_seconds):
+    """抓取期间定期续租"""
+    while True:
+        await asyncio.sleep(lease_seconds / 3)
+        if not await _queue_call(queue.renew, unit['unit_id'], worker_id, lease_seconds):
+            print(f"⚠️ 单元 {unit['unit_id']} 的租约已被收回，结果合并时会去重")
+            return
+
+async def run_worker(queue, worker_id, output_root, crawler_options,
+                     lease_seconds=600, max_attempts=3, poll_interval=30):
+    """
+    循环领取单元并抓取，直到队列中既没有待处理也没有租出的单元
+    每个单元使用独立的输出目录，并开启断点恢复，同一台机器重新领到时从断点页继续
+    """
+    processed = 0
+    while True:
+        unit = await _queue_call(queue.lease, worker_id, lease_seconds)
+        if unit is None:
+            counts = await _queue_call(queue.counts)
+            if counts.get('leased', 0):
+                # 其他worker还有未完成的单元，租约过期后可能重新排队
+                await asyncio.sleep(poll_interval)
+                continue
+            break
+        
+        print(f"\n📦 [{worker_id}] 领取单元 {unit['unit_id']}: "
+              f"第{unit['first_page']}-{unit['last_page']}页 (第{unit['attempts']}次尝试)")
+        
+        crawler = FixedAsyncCourtCrawler(
+            output_dir=Path(output_root) / unit['unit_id'],
+            resume=True,
+            **crawler_options
+        )
+        heartbeat = asyncio.create_task(_keep_lease(queue, unit, worker_id, lease_seconds))
+        try:
+            await crawler.run(unit['start_url'], page_range=(unit['first_page'], unit['last_page']))
+        finally:
+            heartbeat.cancel()
+        
+        # 抓取流程确认处理到了范围的最后一页（或已没有下一页）才算完成，搜索失败、异常退出都重新排队
+        if crawler.range_finished:
+            if await _queue_call(queue.complete, unit['unit_id'], worker_id, crawler.jsonl_file.resolve()):
+                processed += 1
+                print(f"✅ [{worker_id}] 单元 {unit['unit_id']} 完成")
+        else:
+            await _queue_call(queue.fail, unit['unit_id'], worker_id, max_attempts)
+            print(f"❌ [{worker_id}] 单元 {unit['unit_id']} 未完成，已放回队列")
+    
+    print(f"🏁 [{worker_id}] 没有待处理单元，共完成 {processed} 个")
+    return processed
+
+def merge_results(queue, output_dir):
+    """
+    按案号（没有案号时按加密参数）去重，合并所有已完成单元的结果
+    有已完成单元的结果文件在本机找不到时（worker的输出目录不在共享存储上）直接报错，不输出缺数据的合并结果
+    """
+    done_units = queue.units('done')
+    missing = [unit for unit in done_units if not unit['output_file'] or not Path(unit['output_file']).exists()]
+    if missing:
+        print(f"❌ {len(missing)} 个已完成单元的结果文件不存在（worker的 --output-root 需要在共享存储上）:")
+        for unit in missing:
+            print(f"   {unit['unit_id']}: {unit['output_file']} (worker={unit['worker_id']})")
+        raise FileNotFoundError(f"{len(missing)} 个单元的结果文件不存在，无法合并")
+    
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    jsonl_file = output_dir / "merged_cases.jsonl"
+    
+    seen = set()
+    merged = 0
+    duplicates = 0
+    with open(jsonl_file, 'w', encoding='utf-8') as f:
+        for unit in done_units:
+            for record in iter_jsonl(unit['output_file']):
+                key = record.get('case_number') or record.get('detail_param')
+                if key and key in seen:
+                    duplicates += 1
+                    continue
+                if key:
+                    seen.add(key)
+                f.write(json.dumps(record, ensure_ascii=False) + '\n')
+                merged += 1
+    
+    outputs = build_snapshots(jsonl_file, jsonl_file.with_suffix('.json'), jsonl_file.with_suffix('.csv'))
+    print(f"✅ 合并 {merged} 条（去掉重复 {duplicates} 条）: {jsonl_file}")
+    for path in outputs:
+        print(f"   {path}")
+    return merged
+
+async def main():
+    """命令行入口"""
+    parser = argparse.ArgumentParser(description="多机抓取协调器")
+    parser.add_argument('command', choices=['plan', 'work', 'status', 'merge'])
+    parser.add_argument('--queue', default='work_queue.sqlite3', help="队列地址：SQLite文件路径或 sqlite:///路径")
+    parser.add_argument('--start-url', help="plan: 列表页地址")
+    parser.add_argument('--pages-per-unit', type=int, default=10, help="plan: 每个工作单元的页数")
+    parser.add_argument('--total-pages', type=int, default=0, help="plan: 总页数，不给时打开浏览器读取")
+    parser.add_argument('--worker-id', default=f"{socket.gethostname()}-{os.getpid()}", help="work: worker标识")
+    parser.add_argument('--output-root', default='分布式抓取', help="work: 各单元输出的根目录")
+    parser.add_argument('--lease-seconds', type=int, default=600, help="work: 租约时长（秒）")
+    parser.add_argument('--max-attempts', type=int, default=3, help="work: 单元最多尝试次数")
+    parser.add_argument('--output', default='合并结果', help="merge: 合并结果输出目录")
+    args = parser.parse_args()
+    
+    # worker使用的抓取配置，max_rate是单台机器的上限
+    crawler_options = {
+        'headless': True,
+        'max_cases': 10 ** 9,   # 由页码范围限定抓取量
+        'concurrency': 3,
+        'max_rate': 0.5,
+        'http_detail': True,
+        'parquet_output': False,
+    }
+    
+    queue = open_queue(args.queue)
+    try:
+        if args.command == 'plan':
+            if not args.start_url:
+                parser.error("plan 需要 --start-url")
+            total_pages = args.total_pages
+            if not total_pages:
+                probe = FixedAsyncCourtCrawler(output_dir=args.output_root, skip_known=False, headless=True)
+                total_pages = await probe.count_pages(args.start_url)
+            if not total_pages:
+                print("❌ 无法读取总页数")
+                return
+            units = plan_page_units(args.start_url, total_pages, args.pages_per_unit)
+            added = queue.add_units(units)
+            print(f"✅ 共{total_pages}页，切分为 {len(units)} 个单元（新增 {added} 个）")
+        elif args.command == 'work':
+            await run_worker(queue, args.worker_id, args.output_root, crawler_options,
+                             lease_seconds=args.lease_seconds, max_attempts=args.max_attempts)
+        elif args.command == 'status':
+            print(f"队列状态: {queue.counts()}")
+            for unit in queue.units():
+                if unit['status'] != 'done':
+                    print(f"  {unit['unit_id']}: {unit['status']} worker={unit['worker_id']} 尝试={unit['attempts']}")
+        elif args.command == 'merge':
+            merge_results(queue, args.output)
+    finally:
+        queue.close()
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -4,25 +4,36 @@
 """
 
 import asyncio
-import json
-import random
-import re
 from datetime import datetime
 from pathlib import Path
-import pandas as pd
 from playwright.async_api import async_playwright
+from case_writer import JsonlCaseWriter, build_snapshots
+from list_extract import extract_rows
+from rate_limiter import RateLimiter
+from readiness import Readiness
 
 class FixedAsyncCourtCrawler:
-    def __init__(self, headless=False, max_cases=3, output_dir="抓取结果"):
+    def __init__(self, headless=False, max_cases=3, output_dir="抓取结果",
+                 concurrency=1, max_rate=0.3):
         self.headless = headless
         self.max_cases = max_cases
+        # 详情页worker数量，所有worker共享一个浏览器上下文和一个全局限速器
+        self.concurrency = max(1, concurrency)
+        # 礼貌限速只由max_rate控制：提交搜索和详情请求都要先经过这个限速器
+        self.rate_limiter = RateLimiter(max_rate=max_rate)
+        # 就绪等待：按具体信号等待（列表响应、行数稳定、正文长度），代替固定等待
+        self.readiness = Readiness()
+        # 点击行打开新标签页必须串行，否则expect_page无法区分是哪个worker的弹窗
+        self._popup_lock = asyncio.Lock()
         self.output_dir = Path(output_dir)
         self.output_dir.mkdir(exist_ok=True)
         
-        self.all_cases = []
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
         self.json_file = self.output_dir / f"cases_{timestamp}.json"
         self.csv_file = self.output_dir / f"cases_{timestamp}.csv"
+        # 每篇文书追加写入JSONL，JSON/CSV只在结束时或按需从它生成
+        self.jsonl_file = self.output_dir / f"cases_{timestamp}.jsonl"
+        self.writer = JsonlCaseWriter(self.jsonl_file)
         
         self.stats = {
             'total': 0,
@@ -31,17 +42,14 @@ class FixedAsyncCourtCrawler:
             'start': datetime.now().isoformat()
         }
     
-    async def random_delay(self, min_sec=1, max_sec=3):
-        await asyncio.sleep(random.uniform(min_sec, max_sec))
-    
     async def submit_search(self, page):
         """提交搜索表单"""
         print("🔍 提交搜索表单...")
         
         try:
-            # 等待页面加载
-            await page.wait_for_load_state('networkidle', timeout=15000)
-            await self.random_delay(1, 2)
+            # 等待表单可用
+            await page.wait_for_load_state('domcontentloaded', timeout=15000)
+            await self.rate_limiter.acquire()
             
             # 直接通过JavaScript提交
             submit_script = """
@@ -56,16 +64,18 @@ class FixedAsyncCourtCrawler:
             }
             """
             
-            result = await page.evaluate(submit_script)
-            if result:
-                print("✅ 表单已提交")
+            result = False
+            
+            async def submit():
+                nonlocal result
+                result = await page.evaluate(submit_script)
             
-            # 等待结果加载
+            # 提交并等待结果：列表数据响应 + 文书行数量稳定
             print("⏳ 等待搜索结果...")
-            await page.wait_for_timeout(5000)
+            has_case_rows = await self.readiness.run_and_wait_for_list(page, submit)
+            if result:
+                print("✅ 表单已提交")
             
-            # 检查是否出现文书行
-            has_case_rows = await page.locator('tr[id^="tr"]').count() > 0
             if has_case_rows:
                 print("✅ 检测到文书数据行")
                 return True
@@ -86,75 +96,25 @@ class FixedAsyncCourtCrawler:
             # 等待文书行出现
             await page.wait_for_selector('tr[id^="tr"]', timeout=10000)
             
-            # 找到所有文书行
-            case_rows = await page.locator('tr[id^="tr"]').all()
-            print(f"找到 {len(case_rows)} 个文书行")
+            # 一次页面内evaluate取回所有行（id、onclick参数、七个单元格）
+            row_count, rows = await extract_rows(page)
+            print(f"找到 {row_count} 个文书行")
             
             # 限制处理数量
-            rows_to_process = case_rows[:self.max_cases]
-            
-            for i, row in enumerate(rows_to_process):
-                try:
-                    # 获取行属性
-                    row_id = await row.get_attribute('id') or f"tr{i}"
-                    onclick_attr = await row.get_attribute('onclick') or ""
-                    
-                    # 提取加密参数
-                    detail_param = ""
-                    if onclick_attr:
-                        match = re.search(r"showone\('([^']+)'\)", onclick_attr)
-                        if match:
-                            detail_param = match.group(1)
-                    
-                    # 提取所有单元格 - 修复：确保每个inner_text()都使用await
-                    cells = await row.locator('td').all()
-                    
-                    if len(cells) >= 7:
-                        # 分别获取每个单元格的文本
-                        case_number = await cells[0].inner_text()
-                        title = await cells[1].inner_text()
-                        doc_type = await cells[2].inner_text()
-                        
-                        # 修复：await后再调用字符串方法
-                        case_reason_text = await cells[3].inner_text()
-                        case_reason = case_reason_text.replace('&nbsp;', '').strip()
-                        
-                        department_text = await cells[4].inner_text()
-                        department = department_text.replace('&nbsp;', '').strip()
-                        
-                        level_text = await cells[5].inner_text()
-                        level = level_text.replace('&nbsp;', '').strip()
-                        
-                        close_date = await cells[6].inner_text()
-                        
-                        case_data = {
-                            'row_id': row_id,
-                            'case_number': case_number.strip(),
-                            'title': title.strip(),
-                            'doc_type': doc_type.strip(),
-                            'case_reason': case_reason,
-                            'department': department,
-                            'level': level,
-                            'close_date': close_date.strip(),
-                            'detail_param': detail_param,
-                            'row_index': i
-                        }
-                        
-                        # 构建详情页URL
-                        if detail_param:
-                            base_url = "https://www.XXXXX.XX.cn/XXXX/web/flws_view.jsp" #注意要替换网址
-                            case_data['detail_url'] = f"{base_url}?pa={detail_param}"
-                        else:
-                            case_data['detail_url'] = ""
-                        
-                        cases.append(case_data)
-                        print(f"  已提取: {case_data['case_number']}")
-                        
-                except Exception as e:
-                    print(f"  第{i}行提取失败: {str(e)[:100]}")
-                    continue
+            for row in rows[:self.max_cases]:
+                case_data = row.to_dict()
+                
+                # 构建详情页URL
+                if case_data['detail_param']:
+                    base_url = "https://www.XXXXX.XX.cn/XXXX/web/flws_view.jsp" #注意要替换网址
+                    case_data['detail_url'] = f"{base_url}?pa={case_data['detail_param']}"
+                else:
+                    case_data['detail_url'] = ""
+                
+                cases.append(case_data)
+                print(f"  已提取: {case_data['case_number']}")
             
-            self.stats['total'] = len(case_rows)
+            self.stats['total'] = row_count
             print(f"✅ 成功提取 {len(cases)} 个文书")
             return cases
             
@@ -173,37 +133,40 @@ class FixedAsyncCourtCrawler:
         
         detail_page = None
         try:
-            # 监听新页面打开
-            async with context.expect_page() as new_page_info:
-                # 点击对应的行
-                try:
-                    row_selector = f'tr[id="{case_data["row_id"]}"]'
-                    if await main_page.locator(row_selector).count() > 0:
-                        await main_page.click(row_selector)
-                        print(f"  点击行: {case_data['row_id']}")
-                    else:
-                        # 备选：通过案号查找
-                        case_number_text = case_data['case_number'].replace('(', '\\(').replace(')', '\\)')
-                        text_selector = f'text="{case_number_text}"'
-                        if await main_page.locator(text_selector).count() > 0:
-                            await main_page.click(text_selector)
-                            print(f"  点击案号文本: {case_data['case_number']}")
-                except Exception as e:
-                    print(f"  点击失败: {e}")
-                    # 直接访问URL
-                    detail_page = await context.new_page()
-                    await detail_page.goto(case_data['detail_url'], timeout=30000)
-            
-            # 获取新页面
-            if not detail_page:
-                detail_page = await new_page_info.value
+            # 多个worker共用主页面，打开弹窗这一步需要加锁串行
+            async with self._popup_lock:
+                # 监听新页面打开
+                async with context.expect_page() as new_page_info:
+                    # 点击对应的行
+                    try:
+                        row_selector = f'tr[id="{case_data["row_id"]}"]'
+                        if await main_page.locator(row_selector).count() > 0:
+                            await main_page.click(row_selector)
+                            print(f"  点击行: {case_data['row_id']}")
+                        else:
+                            # 备选：通过案号查找
+                            case_number_text = case_data['case_number'].replace('(', '\\(').replace(')', '\\)')
+                            text_selector = f'text="{case_number_text}"'
+                            if await main_page.locator(text_selector).count() > 0:
+                                await main_page.click(text_selector)
+                                print(f"  点击案号文本: {case_data['case_number']}")
+                    except Exception as e:
+                        print(f"  点击失败: {e}")
+                        # 直接访问URL
+                        detail_page = await context.new_page()
+                        await detail_page.goto(case_data['detail_url'], timeout=30000)
+                
+                # 获取新页面
+                if not detail_page:
+                    detail_page = await new_page_info.value
             
-            # 等待详情页加载
-            await detail_page.wait_for_load_state('networkidle', timeout=15000)
-            await self.random_delay(0.5, 1.5)
+            # 等待详情页文档加载（正文就绪在extract_detail_content中等待）
+            await detail_page.wait_for_load_state('domcontentloaded', timeout=15000)
             
             # 提取详情内容
             detail_content = await self.extract_detail_content(detail_page)
+            if not detail_content:
+                raise RuntimeError("详情页正文未加载")
             
             # 合并数据
             full_data = {**case_data, **detail_content}
@@ -220,11 +183,30 @@ class FixedAsyncCourtCrawler:
             if detail_page:
                 await detail_page.close()
     
+    async def detail_worker(self, worker_id, queue, context, main_page):
+        """详情页worker：从队列中取文书，在全局限速下抓取详情"""
+        while True:
+            case = await queue.get()
+            try:
+                await self.rate_limiter.acquire()
+                print(f"\n[W{worker_id}] {case['case_number']}")
+                
+                detail_data = await self.crawl_detail_page(context, case, main_page)
+                if detail_data:
+                    # 立即追加到JSONL（后台写盘，不阻塞事件循环）
+                    await self.writer.write(detail_data)
+                    print(f"  [W{worker_id}] 已保存")
+            except Exception as e:
+                print(f"❌ [W{worker_id}] 处理异常: {str(e)[:100]}")
+            finally:
+                queue.task_done()
+    
     async def extract_detail_content(self, page):
         """提取详情页内容"""
         try:
-            # 等待内容加载
-            await page.wait_for_timeout(2000)
+            # 等待正文达到最小长度
+            if not await self.readiness.wait_for_detail_text(page):
+                return {}
             
             # 获取页面内容
             content = await page.content()
@@ -244,30 +226,24 @@ class FixedAsyncCourtCrawler:
             return {}
     
     async def save_data(self):
-        """保存数据"""
-        if not self.all_cases:
-            print("⚠️ 无数据可保存")
-            return
+        """生成JSON/CSV快照（从增量JSONL构建，只在结束时或按需调用）"""
+        # 先把后台写入任务中的记录全部落盘，之后再有写入会自动重新打开文件
+        await self.writer.close()
         
-        print("💾 保存数据...")
+        print("💾 生成数据快照...")
         
         try:
-            # 保存JSON
-            with open(self.json_file, 'w', encoding='utf-8') as f:
-                json.dump(self.all_cases, f, ensure_ascii=False, indent=2)
-            print(f"   JSON: {self.json_file}")
-            
-            # 保存CSV
-            df = pd.DataFrame(self.all_cases)
-            df.to_csv(self.csv_file, index=False, encoding='utf-8-sig')
-            print(f"   CSV: {self.csv_file}")
+            loop = asyncio.get_running_loop()
+            outputs = await loop.run_in_executor(
+                None, build_snapshots, self.jsonl_file, self.json_file, self.csv_file
+            )
+            if not outputs:
+                print("⚠️ 无数据可保存")
+                return
             
-            # 保存简版CSV（不含长文本）
-            if 'detail_text' in df.columns:
-                simple_df = df.drop(columns=['detail_text'])
-                simple_file = self.csv_file.with_name(f"简版_{self.csv_file.name}")
-                simple_df.to_csv(simple_file, index=False, encoding='utf-8-sig')
-                print(f"   简版CSV: {simple_file}")
+            print(f"   JSONL: {self.jsonl_file}")
+            for output in outputs:
+                print(f"   快照: {output}")
                 
         except Exception as e:
             print(f"❌ 保存失败: {e}")
@@ -280,6 +256,7 @@ class FixedAsyncCourtCrawler:
         
         playwright = None
         browser = None
+        workers = []
         
         try:
             # 启动浏览器
@@ -302,9 +279,8 @@ class FixedAsyncCourtCrawler:
                 print("❌ 搜索失败，程序结束")
                 return
             
-            # 提取列表
+            # 提取列表（submit_search已等到文书行稳定）
             print("\n📋 提取文书列表...")
-            await self.random_delay(2, 3)
             cases = await self.extract_case_data(page)
             
             if not cases:
@@ -315,27 +291,16 @@ class FixedAsyncCourtCrawler:
             
             print(f"📊 找到 {len(cases)} 个文书，开始抓取详情...")
             
-            # 抓取详情页
-            for i, case in enumerate(cases):
-                print(f"\n[{i+1}/{len(cases)}] {case['case_number']}")
-                
-                detail_data = await self.crawl_detail_page(context, case, page)
-                if detail_data:
-                    self.all_cases.append(detail_data)
-                    print(f"  已保存到列表")
-                
-                # 每抓取1个就保存一次（避免丢失数据）
-                if (i + 1) % 1 == 0:
-                    await self.save_data()
-                
-                # 延迟（避免请求过快）
-                if i < len(cases) - 1:
-                    delay = random.uniform(2, 4)
-                    print(f"  等待 {delay:.1f}秒...")
-                    await asyncio.sleep(delay)
-            
-            # 最终保存
-            await self.save_data()
+            # 抓取详情页：worker池共享浏览器上下文，受全局限速器约束
+            queue = asyncio.Queue()
+            for case in cases:
+                queue.put_nowait(case)
+            workers = [
+                asyncio.create_task(self.detail_worker(n + 1, queue, context, page))
+                for n in range(self.concurrency)
+            ]
+            print(f"👷 启动 {self.concurrency} 个详情页worker")
+            await queue.join()
             
             # 统计信息
             self.stats['end'] = datetime.now().isoformat()
@@ -357,15 +322,19 @@ class FixedAsyncCourtCrawler:
             import traceback
             traceback.print_exc()
         finally:
+            # 停止worker
+            for worker in workers:
+                worker.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+            
             # 清理资源
             if browser:
                 await browser.close()
             if playwright:
                 await playwright.stop()
             
-            # 最后保存一次
-            if self.all_cases:
-                await self.save_data()
+            # 最后生成一次快照（异常退出时JSONL中已有的数据也不会丢）
+            await self.save_data()
 
 async def main():
     """主函数"""
@@ -373,7 +342,9 @@ async def main():
         'start_url': 'https://www.hshfy.sh.cn/shfy/gweb2017/flws_list_new.jsp?ajlb=aYWpsYj3QzMrCz',
         'headless': False,  # 调试时设为False
         'max_cases': 9,     # 测试用9个
-        'output_dir': '最终抓取测试'
+        'output_dir': '最终抓取测试',
+        'concurrency': 3,   # 详情页worker数量
+        'max_rate': 0.5     # 全局请求上限（每秒请求数）
     }
     
     print("配置:")
@@ -383,12 +354,14 @@ async def main():
     crawler = FixedAsyncCourtCrawler(
         headless=config['headless'],
         max_cases=config['max_cases'],
-        output_dir=config['output_dir']
+        output_dir=config['output_dir'],
+        concurrency=config['concurrency'],
+        max_rate=config['max_rate']
     )
     
     await crawler.run(config['start_url'])
 
 if __name__ == "__main__":
-
+    
     asyncio.run(main())
 
@@ -0,0 +1,395 @@
+"""
+常驻抓取服务
+保持一个浏览器常驻，通过本地HTTP接口接收抓取任务，所有任务共享浏览器和一个全局限速器，
+抓取完成的文书实时以NDJSON流式返回，下游不需要等文件写完。
+使用方法：python crawl_service.py [--port 8765] [--max-rate 0.5] [--max-jobs 2]
+
+接口：
+POST   /jobs                 提交任务，JSON：{"start_url": ..., "max_cases": 30, "partitions": {...}}
+GET    /jobs                 所有任务状态
+GET    /jobs/<id>            单个任务状态和统计
+GET    /jobs/<id>/records    流式返回任务记录（NDJSON，从任务的JSONL文件第一条开始读，任务结束后关闭）
+DELETE /jobs/<id>            取消任务
+GET    /metrics              所有任务合计的阶段耗时和计数器（Prometheus文本格式）
+
+每个任务的记录、快照和断点写到 <output_root>/<任务id>/，跨任务的状态（已知文书索引、HTML归档、死信文件）
+所有任务共用 <output_root>/state/ 下的同一份
+
+记录不保存在服务内存中，流式接口直接读取任务输出目录的JSONL；结束超过job_ttl的任务从任务列表中移除
+（输出文件保留）
+"""
+
+import argparse
+import asyncio
+import json
+import time
+import uuid
+from datetime import datetime
+from pathlib import Path
+from urllib.parse import urlsplit
+from playwright.async_api import async_playwright
+from html_archive import HtmlArchive
+from known_index import KnownDocIndex
+from metrics import CrawlMetrics
+from rate_limiter import RateLimiter
+from retry_queue import DEAD_LETTER_FILE, DeadLetterLog
+from sh_court_fixed_async_page import FixedAsyncCourtCrawler
+
+# 任务请求中可以覆盖的抓取参数
+JOB_OPTIONS = ('max_cases', 'concurrency', 'http_detail', 'skip_known', 'partitions', 'shards')
+
+# 流式读取JSONL时，读到文件末尾后最多等待多久再检查一次（秒）
+TAIL_INTERVAL = 1.0
+
+HTTP_REASONS = {200: 'OK', 201: 'Created', 400: 'Bad Request', 404: 'Not Found',
+                405: 'Method Not Allowed', 500: 'Internal Server Error'}
+
+class CrawlJob:
+    def __init__(self, job_id, start_url, options):
+        self.job_id = job_id
+        self.start_url = start_url
+        self.options = options
+        self.status = 'queued'
+        self.record_count = 0
+        self.finished_at = None
+        self.crawler = None
+        self.task = None
+        self.error = ''
+        self.created_at = datetime.now().isoformat()
+        self._changed = asyncio.Condition()
+    
+    async def write(self, record):
+        """抓取器的record_sink：只计数并唤醒等待中的流式请求，记录本身由抓取器写入JSONL"""
+        async with self._changed:
+            self.record_count += 1
+            self._changed.notify_all()
+    
+    async def set_status(self, status):
+        async with self._changed:
+            self.status = status
+            if self.finished:
+                self.finished_at = time.monotonic()
+            self._changed.notify_all()
+    
+    @property
+    def finished(self):
+        return self.status in ('done', 'failed', 'cancelled')
+    
+    async def stream(self):
+        """
+        从任务的JSONL文件依次产出记录（读到末尾时等待新记录），任务结束且文件读完后停止
+        每个订阅者只持有一行缓冲，内存占用与记录数无关
+        """
+        handle = None
+        pending = ''
+        try:
+            while True:
+                async with self._changed:
+                    finished = self.finished
+                path = self.crawler.jsonl_file if self.crawler else None
+                if handle is None and path and path.exists():
+                    handle = open(path, 'r', encoding='utf-8')
+                
+                got_line = False
+                if handle:
+                    # 只产出完整的行，写了一半的末行留到下次
+                    for chunk in iter(handle.readline, ''):
+                        pending += chunk
+                        if not pending.endswith('\n'):
+                            break
+                        line, pending = pending.strip(), ''
+                        if line:
+                            got_line = True
+                            yield json.loads(line)
+                
+                if finished and not got_line:
+                    return
+                if not got_line:
+                    async with self._changed:
+                        try:
+                            await asyncio.wait_for(self._changed.wait(), TAIL_INTERVAL)
+                        except asyncio.TimeoutError:
+                            pass
+        finally:
+            if handle:
+                handle.close()
+    
+    def summary(self):
+        info = {
+            'job_id': self.job_id,
+            'status': self.status,
+            'start_url': self.start_url,
+            'options': self.options,
+            'records': self.record_count,
+            'created_at': self.created_at,
+        }
+        if self.crawler:
+            info['stats'] = self.crawler.stats
+            info['output_dir'] = str(self.crawler.output_dir)
+        if self.error:
+            info['error'] = self.error
+        return info
+
+class CrawlService:
+    def __init__(self, host='127.0.0.1', port=8765, output_root='抓取服务', max_rate=0.5,
+                 max_jobs=2, headless=True, crawler_options=None, job_ttl=3600):
+        """
+        max_rate: 所有任务共享的全局请求上限（每秒请求数）
+        max_jobs: 同时运行的任务数，其余任务排队
+        job_ttl: 任务结束多少秒后从任务列表中移除（输出文件保留）
+        crawler_options: 所有任务的默认抓取参数，任务请求可以覆盖JOB_OPTIONS中的项
+        """
+        self.host = host
+        self.port = port
+        self.output_root = Path(output_root)
+        self.output_root.mkdir(exist_ok=True)
+        self.state_dir = self.output_root / "state"
+        self.headless = headless
+        self.crawler_options = crawler_options or {}
+        self.max_rate = max_rate
+        self.max_jobs = max_jobs
+        self.metrics = CrawlMetrics()
+        # 限速器和任务槽位内部持有asyncio锁，在start()中（事件循环内）创建，Python 3.8/3.9下
+        # 在asyncio.run之前创建会绑定到另一个事件循环
+        self.rate_limiter = None
+        self.job_slots = None
+        self.jobs = {}
+        self.job_ttl = job_ttl
+        self.playwright = None
+        self.browser = None
+        self.server = None
+        self.known_index = None
+        self.html_archive = None
+        self.dead_letters = None
+    
+    async def start(self):
+        self.rate_limiter = RateLimiter(max_rate=self.max_rate)
+        self.job_slots = asyncio.Semaphore(self.max_jobs)
+        self.state_dir.mkdir(exist_ok=True)
+        self.known_index = KnownDocIndex(self.state_dir / "known_docs.sqlite3")
+        self.html_archive = HtmlArchive(self.state_dir / "html_archive")
+        self.dead_letters = DeadLetterLog(self.state_dir / DEAD_LETTER_FILE)
+        self.playwright = await async_playwright().start()
+        self.browser = await self.playwright.chromium.launch(headless=self.headless)
+        self.server = await asyncio.start_server(self.handle, self.host, self.port)
+        print(f"🚀 抓取服务已启动: http://{self.host}:{self.port}")
+    
+    async def serve_forever(self):
+        await self.start()
+        try:
+            async with self.server:
+                await self.server.serve_forever()
+        finally:
+            await self.stop()
+    
+    async def stop(self):
+        for job in self.jobs.values():
+            if job.task and not job.task.done():
+                job.task.cancel()
+        await asyncio.gather(*(job.task for job in self.jobs.values() if job.task), return_exceptions=True)
+        if self.browser:
+            await self.browser.close()
+        if self.playwright:
+            await self.playwright.stop()
+        if self.known_index:
+            self.known_index.close()
+        if self.html_archive:
+            self.html_archive.close()
+        if self.dead_letters:
+            self.dead_letters.close()
+    
+    def prune_jobs(self):
+        """移除结束超过job_ttl的任务，常驻服务的任务列表不会无限增长"""
+        now = time.monotonic()
+        expired = [job_id for job_id, job in self.jobs.items()
+                   if job.finished_at is not None and now - job.finished_at > self.job_ttl]
+        for job_id in expired:
+            del self.jobs[job_id]
+        if expired:
+            print(f"🧹 移除 {len(expired)} 个已过期的任务")
+    
+    def submit(self, params):
+        """创建任务并在后台运行，返回任务对象"""
+        start_url = params.get('start_url')
+        if not start_url:
+            raise ValueError("缺少 start_url")
+        options = {key: params[key] for key in JOB_OPTIONS if key in params}
+        job = CrawlJob(uuid.uuid4().hex[:12], start_url, options)
+        self.jobs[job.job_id] = job
+        job.task = asyncio.create_task(self.run_job(job))
+        print(f"📥 新任务 {job.job_id}: {start_url} {options}")
+        return job
+    
+    async def run_job(self, job):
+        async with self.job_slots:
+            if job.status == 'cancelled':
+                return
+            await job.set_status('running')
+            options = dict(self.crawler_options)
+            options.update(job.options)
+            try:
+                job.crawler = FixedAsyncCourtCrawler(
+                    headless=self.headless,
+                    output_dir=self.output_root / job.job_id,
+                    rate_limiter=self.rate_limiter,
+                    metrics=self.metrics,
+                    record_sink=job,
+                    known_index=self.known_index,
+                    html_archive=self.html_archive,
+                    dead_letters=self.dead_letters,
+                    **options
+                )
+                if await job.crawler.run(job.start_url, browser=self.browser):
+                    await job.set_status('done')
+                else:
+                    job.error = job.crawler.stats.get('error', '')
+                    await job.set_status('failed')
+            except asyncio.CancelledError:
+                await job.set_status('cancelled')
+                raise
+            except Exception as e:
+                job.error = str(e)[:200]
+                await job.set_status('failed')
+            print(f"📤 任务 {job.job_id} 结束: {job.status}，{job.record_count} 条")
+    
+    async def handle(self, reader, writer):
+        """处理一个HTTP请求（每个连接一个请求）"""
+        try:
+            request_line = await reader.readline()
+            if not request_line:
+                return
+            method, target, _ = request_line.decode('latin-1').split(' ', 2)
+            headers = {}
+            while True:
+                line = await reader.readline()
+                if line in (b'\r\n', b'\n', b''):
+                    break
+                name, _, value = line.decode('latin-1').partition(':')
+                headers[name.strip().lower()] = value.strip()
+            length = int(headers.get('content-length') or 0)
+            body = await reader.readexactly(length) if length else b''
+            
+            await self.route(method.upper(), urlsplit(target).path.rstrip('/'), body, writer)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except Exception as e:
+            print(f"❌ 请求处理失败: {e}")
+            try:
+                await self.send_json(writer, 500, {'error': str(e)[:200]})
+            except Exception:
+                pass
+        finally:
+            writer.close()
+    
+    async def route(self, method, path, body, writer):
+        self.prune_jobs()
+        if path == '/metrics' and method == 'GET':
+            await self.send_text(writer, self.metrics.render_prometheus())
+            return
+        
+        parts = [part for part in path.split('/') if part]
+        if not parts or parts[0] != 'jobs':
+            await self.send_json(writer, 404, {'error': 'not found'})
+            return
+        
+        if len(parts) == 1:
+            if method == 'POST':
+                try:
+                    job = self.submit(json.loads(body or b'{}'))
+                except ValueError as e:
+                    await self.send_json(writer, 400, {'error': str(e)})
+                    return
+                await self.send_json(writer, 201, job.summary())
+            elif method == 'GET':
+                await self.send_json(writer, 200, [job.summary() for job in self.jobs.values()])
+            else:
+                await self.send_json(writer, 405, {'error': 'method not allowed'})
+            return
+        
+        job = self.jobs.get(parts[1])
+        if not job:
+            await self.send_json(writer, 404, {'error': 'job not found'})
+        elif len(parts) == 3 and parts[2] == 'records' and method == 'GET':
+            await self.stream_records(job, writer)
+        elif len(parts) == 2 and method == 'GET':
+            await self.send_json(writer, 200, job.summary())
+        elif len(parts) == 2 and method == 'DELETE':
+            if not job.finished:
+                if job.status == 'queued':
+                    await job.set_status('cancelled')
+                job.task.cancel()
+            await self.send_json(writer, 200, job.summary())
+        else:
+            await self.send_json(writer, 405, {'error': 'method not allowed'})
+    
+    async def send_json(self, writer, status, payload):
+        data = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        writer.write(
+            f"HTTP/1.1 {status} {HTTP_REASONS.get(status, '')}\r\n"
+            f"Content-Type: application/json; charset=utf-8\r\n"
+            f"Content-Length: {len(data)}\r\n"
+            f"Connection: close\r\n\r\n".encode('latin-1') + data
+        )
+        await writer.drain()
+    
+    async def send_text(self, writer, text):
+        data = text.encode('utf-8')
+        writer.write(
+            f"HTTP/1.1 200 OK\r\n"
+            f"Content-Type: text/plain; version=0.0.4\r\n"
+            f"Content-Length: {len(data)}\r\n"
+            f"Connection: close\r\n\r\n".encode('latin-1') + data
+        )
+        await writer.drain()
+    
+    async def stream_records(self, job, writer):
+        """分块传输，每条记录一行JSON"""
+        writer.write(
+            b"HTTP/1.1 200 OK\r\n"
+            b"Content-Type: application/x-ndjson; charset=utf-8\r\n"
+            b"Transfer-Encoding: chunked\r\n"
+            b"Connection: close\r\n\r\n"
+        )
+        async for record in job.stream():
+            data = (json.dumps(record, ensure_ascii=False) + '\n').encode('utf-8')
+            writer.write(f"{len(data):X}\r\n".encode('latin-1') + data + b"\r\n")
+            await writer.drain()
+        writer.write(b"0\r\n\r\n")
+        await writer.drain()
+
+def main():
+    parser = argparse.ArgumentParser(description="常驻抓取服务")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--output-root', default='抓取服务', help="各任务输出目录的根目录")
+    parser.add_argument('--max-rate', type=float, default=0.5, help="所有任务共享的每秒请求上限")
+    parser.add_argument('--max-jobs', type=int, default=2, help="同时运行的任务数")
+    parser.add_argument('--job-ttl', type=int, default=3600, help="任务结束多少秒后从任务列表中移除")
+    parser.add_argument('--show-browser', action='store_true', help="显示浏览器窗口（调试用）")
+    args = parser.parse_args()
+    
+    # 任务默认参数，提交任务时可以覆盖
+    crawler_options = {
+        'max_cases': 30,
+        'concurrency': 3,
+        'http_detail': True,
+        'parquet_output': False,
+    }
+    
+    service = CrawlService(
+        host=args.host,
+        port=args.port,
+        output_root=args.output_root,
+        max_rate=args.max_rate,
+        max_jobs=args.max_jobs,
+        headless=not args.show_browser,
+        crawler_options=crawler_options,
+        job_ttl=args.job_ttl
+    )
+    try:
+        asyncio.run(service.serve_forever())
+    except KeyboardInterrupt:
+        print("\n👋 抓取服务已关闭")
+
+if __name__ == "__main__":
+    main()
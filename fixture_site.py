@@ -0,0 +1,275 @@
+"""
+本地测试站点
+按抓取程序看到的样子模拟 flws_list_new.jsp 和 flws_view.jsp：搜索表单、
+tr[id^="tr"] 七列文书行和 showone('...') 点击参数、带 goPage(n) 链接的 div.meneame 分页控件、
+“共N条”结果数，以及延迟可配置的详情页。文书数据由随机种子固定生成，每次运行结果相同，
+用于离线调试和可复现的性能测试。
+使用方法：python fixture_site.py [--port 8900] [--docs 300] [--detail-latency 0.2]
+抓取地址：http://127.0.0.1:8900/shfy/gweb2017/flws_list_new.jsp
+"""
+
+import argparse
+import asyncio
+import hashlib
+import html
+import random
+from datetime import date, timedelta
+from urllib.parse import parse_qs, urlsplit
+
+LIST_PATH = '/shfy/gweb2017/flws_list_new.jsp'
+DETAIL_PATH = '/shfy/web/flws_view.jsp'
+
+CASE_REASONS = ('买卖合同纠纷', '民间借贷纠纷', '房屋租赁合同纠纷', '劳动争议', '金融借款合同纠纷', '建设工程施工合同纠纷')
+DEPARTMENTS = ('民事审判第一庭', '民事审判第二庭', '商事审判庭', '金融审判庭')
+DOC_TYPES = ('判决书', '裁定书')
+LEVELS = ('二审', '一审', '再审')
+SURNAMES = '张王李赵刘陈杨黄周吴'
+CN_DIGITS = '〇一二三四五六七八九'
+
+SEARCH_PAGE = """<html><head><meta charset="utf-8"><title>裁判文书</title>{script}</head><body>
+<form name="searchForm" method="post" action="flws_list_new.jsp">
+<input type="hidden" name="ajlb" value="{ajlb}">
+<input type="text" name="jarqks" value="{date_from}">
+<input type="text" name="jarqjs" value="{date_to}">
+<input type="hidden" name="pagesnum" value="{page}">
+<input type="submit" value="查询">
+</form>
+{results}
+</body></html>"""
+
+PAGE_SCRIPT = """<script>
+function goPage(n) { var f = document.forms[0]; f.pagesnum.value = n; f.submit(); }
+function showone(pa) { window.open('../web/flws_view.jsp?pa=' + pa); }
+</script>"""
+
+def _cn_date(value):
+    """2024-05-01 -> 二〇二四年五月一日"""
+    def number(n):
+        if n < 10:
+            return CN_DIGITS[n]
+        tens, ones = divmod(n, 10)
+        return ('' if tens == 1 else CN_DIGITS[tens]) + '十' + (CN_DIGITS[ones] if ones else '')
+    year = ''.join(CN_DIGITS[int(d)] for d in str(value.year))
+    return f"{year}年{number(value.month)}月{number(value.day)}日"
+
+def generate_docs(total, seed=42, start=date(2023, 1, 1)):
+    """按固定种子生成文书列表，结案日期递增"""
+    rng = random.Random(seed)
+    docs = []
+    for i in range(total):
+        close_date = start + timedelta(days=i * 365 // max(total, 1))
+        court = rng.choice((1, 2, 3))
+        reason = rng.choice(CASE_REASONS)
+        doc = {
+            'param': hashlib.sha1(f"{seed}-{i}".encode()).hexdigest()[:24].upper(),
+            'case_number': f"（{close_date.year}）沪0{court}民终{1000 + i}号",
+            'title': f"{rng.choice(SURNAMES)}某与上海某某有限公司{reason}二审民事{rng.choice(DOC_TYPES)}",
+            'doc_type': rng.choice(DOC_TYPES),
+            'case_reason': reason,
+            'department': rng.choice(DEPARTMENTS),
+            'level': rng.choice(LEVELS),
+            'close_date': close_date,
+            'ajlb': 'aYWpsYj3QzMrCz',
+            'judges': [f"{rng.choice(SURNAMES)}某" for _ in range(3)],
+            'clerk': f"{rng.choice(SURNAMES)}某",
+        }
+        docs.append(doc)
+    return docs
+
+class FixtureSite:
+    def __init__(self, host='127.0.0.1', port=8900, total_docs=300, page_size=15,
+                 list_latency=0.05, detail_latency=0.2, detail_jitter=0.1, detail_size=3000, seed=42):
+        """
+        list_latency: 列表页响应延迟（秒）
+        detail_latency / detail_jitter: 详情页基础延迟和随机附加延迟（秒）
+        detail_size: 详情正文中“查明”部分的大致字数
+        """
+        self.host = host
+        self.port = port
+        self.page_size = page_size
+        self.list_latency = list_latency
+        self.detail_latency = detail_latency
+        self.detail_jitter = detail_jitter
+        self.detail_size = detail_size
+        self.docs = generate_docs(total_docs, seed)
+        self.by_param = {doc['param']: doc for doc in self.docs}
+        self.requests = {'list': 0, 'detail': 0, 'other': 0}
+        self.server = None
+    
+    @property
+    def start_url(self):
+        return f"http://{self.host}:{self.port}{LIST_PATH}?ajlb=aYWpsYj3QzMrCz"
+    
+    async def start(self):
+        self.server = await asyncio.start_server(self.handle, self.host, self.port)
+        print(f"🧪 测试站点: {self.start_url} ({len(self.docs)} 篇文书)")
+    
+    async def serve_forever(self):
+        await self.start()
+        async with self.server:
+            await self.server.serve_forever()
+    
+    async def handle(self, reader, writer):
+        try:
+            request_line = await reader.readline()
+            if not request_line:
+                return
+            method, target, _ = request_line.decode('latin-1').split(' ', 2)
+            headers = {}
+            while True:
+                line = await reader.readline()
+                if line in (b'\r\n', b'\n', b''):
+                    break
+                name, _, value = line.decode('latin-1').partition(':')
+                headers[name.strip().lower()] = value.strip()
+            length = int(headers.get('content-length') or 0)
+            body = await reader.readexactly(length) if length else b''
+            
+            url = urlsplit(target)
+            params = {k: v[-1] for k, v in parse_qs(url.query).items()}
+            params.update({k: v[-1] for k, v in parse_qs(body.decode('utf-8', 'replace')).items()})
+            
+            if url.path == LIST_PATH:
+                self.requests['list'] += 1
+                await asyncio.sleep(self.list_latency)
+                status, page = 200, self.render_list(params, submitted=(method == 'POST'))
+            elif url.path == DETAIL_PATH:
+                self.requests['detail'] += 1
+                await asyncio.sleep(self.detail_latency + random.uniform(0, self.detail_jitter))
+                doc = self.by_param.get(params.get('pa', ''))
+                status, page = (200, self.render_detail(doc)) if doc else (404, '文书不存在')
+            else:
+                self.requests['other'] += 1
+                status, page = 404, 'not found'
+            
+            data = page.encode('utf-8')
+            writer.write(
+                f"HTTP/1.1 {status} {'OK' if status == 200 else 'Not Found'}\r\n"
+                f"Content-Type: text/html; charset=utf-8\r\n"
+                f"Content-Length: {len(data)}\r\n"
+                f"Connection: close\r\n\r\n".encode('latin-1') + data
+            )
+            await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+    
+    def filter_docs(self, params):
+        """按结案日期区间和案件类别筛选"""
+        docs = self.docs
+        ajlb = params.get('ajlb')
+        if ajlb:
+            docs = [doc for doc in docs if doc['ajlb'] == ajlb]
+        try:
+            if params.get('jarqks'):
+                date_from = date.fromisoformat(params['jarqks'])
+                docs = [doc for doc in docs if doc['close_date'] >= date_from]
+            if params.get('jarqjs'):
+                date_to = date.fromisoformat(params['jarqjs'])
+                docs = [doc for doc in docs if doc['close_date'] <= date_to]
+        except ValueError:
+            pass
+        return docs
+    
+    def render_list(self, params, submitted):
+        """未提交表单时只有搜索表单，提交后附带结果列表和分页控件"""
+        page = max(1, int(params.get('pagesnum') or 1))
+        results = ''
+        if submitted:
+            docs = self.filter_docs(params)
+            total_pages = max(1, (len(docs) + self.page_size - 1) // self.page_size)
+            page = min(page, total_pages)
+            start = (page - 1) * self.page_size
+            rows = []
+            for i, doc in enumerate(docs[start:start + self.page_size]):
+                cells = (doc['case_number'], doc['title'], doc['doc_type'], doc['case_reason'],
+                         doc['department'], doc['level'], doc['close_date'].isoformat())
+                tds = ''.join(f"<td>{html.escape(cell)}</td>" for cell in cells)
+                rows.append(f"<tr id=\"tr{i}\" onclick=\"showone('{doc['param']}')\">{tds}</tr>")
+            results = (
+                f"<center id=\"flws_list_content\"><div>共 {len(docs)} 条</div>"
+                f"<table>{''.join(rows)}</table>{self.render_pager(page, total_pages)}</center>"
+            )
+        
+        return SEARCH_PAGE.format(
+            script=PAGE_SCRIPT,
+            ajlb=html.escape(params.get('ajlb', '')),
+            date_from=html.escape(params.get('jarqks', '')),
+            date_to=html.escape(params.get('jarqjs', '')),
+            page=page,
+            results=results,
+        )
+    
+    def render_pager(self, page, total_pages):
+        """当前页前后各显示4个页码，另有首页/上一页/下一页/末页"""
+        links = []
+        if page > 1:
+            links.append('<a href="javascript:goPage(1)">首页</a>')
+            links.append(f'<a href="javascript:goPage({page - 1})">上一页</a>')
+        for n in range(max(1, page - 4), min(total_pages, page + 4) + 1):
+            if n == page:
+                links.append(f'<span class="current">{n}</span>')
+            else:
+                links.append(f'<a href="javascript:goPage({n})">{n}</a>')
+        if page < total_pages:
+            links.append(f'<a href="javascript:goPage({page + 1})">下一页</a>')
+            links.append(f'<a href="javascript:goPage({total_pages})">末页</a>')
+        return f"<div class=\"meneame\">{''.join(links)}</div>"
+    
+    def render_detail(self, doc):
+        """按固定行文结构生成裁判文书正文"""
+        findings = (f"本院经审理查明：双方当事人就{doc['case_reason']}事项发生争议，"
+                    "原审法院查明的事实属实，本院予以确认。")
+        findings += "当事人二审中均未提交新证据。" * max(1, self.detail_size // 16)
+        lines = [
+            "上海市第一中级人民法院",
+            f"民事{doc['doc_type']}",
+            doc['case_number'],
+            "上诉人（原审原告）：张某，男，1980年1月1日出生，住上海市。",
+            "被上诉人（原审被告）：上海某某有限公司，住所地上海市。",
+            f"上诉人张某因与被上诉人上海某某有限公司{doc['case_reason']}一案，不服上海市某区人民法院一审民事判决，"
+            "向本院提起上诉。本院依法组成合议庭审理了本案，现已审理终结。",
+            findings,
+            "本院认为，一审判决认定事实清楚，适用法律正确，应予维持。",
+            "依照《中华人民共和国民事诉讼法》第一百七十七条第一款第一项规定，判决如下：",
+            "驳回上诉，维持原判。",
+            "本判决为终审判决。",
+            f"审判长 {doc['judges'][0]}",
+            f"审判员 {doc['judges'][1]}",
+            f"审判员 {doc['judges'][2]}",
+            _cn_date(doc['close_date']),
+            f"书记员 {doc['clerk']}",
+        ]
+        body = ''.join(f"<p>{html.escape(line)}</p>" for line in lines)
+        return f"<html><head><meta charset=\"utf-8\"><title>{html.escape(doc['title'])}</title></head><body><div id=\"wsTable\">{body}</div></body></html>"
+
+def main():
+    parser = argparse.ArgumentParser(description="本地测试站点")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8900)
+    parser.add_argument('--docs', type=int, default=300, help="文书总数")
+    parser.add_argument('--page-size', type=int, default=15, help="每页文书数")
+    parser.add_argument('--list-latency', type=float, default=0.05, help="列表页延迟（秒）")
+    parser.add_argument('--detail-latency', type=float, default=0.2, help="详情页基础延迟（秒）")
+    parser.add_argument('--detail-jitter', type=float, default=0.1, help="详情页随机附加延迟（秒）")
+    parser.add_argument('--detail-size', type=int, default=3000, help="详情正文大致字数")
+    args = parser.parse_args()
+    
+    site = FixtureSite(
+        host=args.host,
+        port=args.port,
+        total_docs=args.docs,
+        page_size=args.page_size,
+        list_latency=args.list_latency,
+        detail_latency=args.detail_latency,
+        detail_jitter=args.detail_jitter,
+        detail_size=args.detail_size
+    )
+    try:
+        asyncio.run(site.serve_forever())
+    except KeyboardInterrupt:
+        print("\n👋 测试站点已关闭")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+HAR录制与回放
+录制：真实抓取时每个浏览器上下文录制一份HAR（列表页、翻页请求、详情页，含直连详情请求），
+回放：从录制的HAR响应所有请求，不访问网络；未录制的请求直接中止。
+用来在不访问法院网站的情况下全速分析列表/详情提取，或在大量已存页面上回归检查解析改动
+"""
+
+import base64
+import json
+import zipfile
+from pathlib import Path
+
+def har_files(path):
+    """path可以是单个.har/.zip文件，也可以是录制目录（按文件名排序取其中所有HAR）"""
+    path = Path(path)
+    if path.is_dir():
+        return sorted(p for p in path.iterdir() if p.name.endswith(('.har', '.har.zip')))
+    return [path] if path.exists() else []
+
+def _read_har(path):
+    """返回 (HAR字典, 读取附件的函数)，.zip格式的响应正文以附件形式保存在压缩包中"""
+    path = Path(path)
+    if path.suffix == '.zip':
+        archive = zipfile.ZipFile(path)
+        har_name = next(name for name in archive.namelist() if name.endswith('.har'))
+        har = json.loads(archive.read(har_name).decode('utf-8'))
+        return har, archive.read
+    with open(path, 'r', encoding='utf-8') as f:
+        har = json.load(f)
+    return har, None
+
+def _content_body(content, read_attachment):
+    if content.get('_file') and read_attachment:
+        return read_attachment(content['_file'])
+    text = content.get('text') or ''
+    if content.get('encoding') == 'base64':
+        return base64.b64decode(text)
+    return text.encode('utf-8')
+
+class HarResponse:
+    """fetch_detail需要的最小响应接口"""
+    
+    def __init__(self, url, status, headers, body):
+        self.url = url
+        self.status = status
+        self.ok = 200 <= status < 300
+        self.headers = headers
+        self._body = body
+    
+    async def body(self):
+        return self._body
+    
+    async def dispose(self):
+        pass
+
+class HarRequestContext:
+    """
+    用HAR中的GET响应代替context.request，直连模式的详情请求在回放时也不访问网络
+    同一URL有多条记录时取第一条
+    """
+    
+    def __init__(self, har_paths):
+        self._entries = {}
+        for path in har_paths:
+            har, read_attachment = _read_har(path)
+            for entry in har.get('log', {}).get('entries', []):
+                request = entry.get('request', {})
+                if request.get('method') != 'GET':
+                    continue
+                key = request.get('url')
+                if key and key not in self._entries:
+                    self._entries[key] = (entry['response'], read_attachment)
+    
+    def __len__(self):
+        return len(self._entries)
+    
+    async def get(self, url, headers=None, timeout=None):
+        found = self._entries.get(url)
+        if not found:
+            return HarResponse(url, 404, {}, b'')
+        response, read_attachment = found
+        response_headers = {h['name'].lower(): h['value'] for h in response.get('headers', [])}
+        body = _content_body(response.get('content', {}), read_attachment)
+        return HarResponse(url, response.get('status', 200), response_headers, body)
+
+async def attach_har_replay(context, har_paths):
+    """
+    在浏览器上下文上安装回放路由：先注册的兜底路由中止所有请求，
+    后注册的HAR路由优先匹配（Playwright按注册的逆序匹配路由）
+    """
+    async def abort(route):
+        await route.abort()
+    
+    await context.route('**/*', abort)
+    for path in har_paths:
+        await context.route_from_har(str(path), not_found='fallback')
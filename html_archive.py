@@ -0,0 +1,293 @@
+"""
+详情页原始HTML归档
+按内容的sha256寻址：每篇详情页HTML单独zlib压缩后追加写入pack文件（只追加、不改写），
+SQLite索引记录 哈希 -> (pack文件, 偏移, 长度)，相同内容只存一份。文书记录中保存html_sha256，
+解析规则改进后可以用 reextract 命令在本地并行重新解析，不需要再访问网站
+
+用法：
+    python html_archive.py reextract --archive 最终抓取测试/html_archive --input 最终抓取测试/cases_xxx.jsonl
+    python html_archive.py stats --archive 最终抓取测试/html_archive
+    python html_archive.py rebuild-index --archive 最终抓取测试/html_archive
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sqlite3
+import struct
+import threading
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+from case_writer import build_snapshots, iter_jsonl
+from http_detail import html_to_text
+from judgment_parser import parse_detail_text
+
+# 每条数据前的记录头：魔数、sha256摘要、压缩后长度。索引丢失时可以扫描pack文件重建
+RECORD_HEADER = struct.Struct('>4s32sI')
+RECORD_MAGIC = b'HTMZ'
+
+# 单个pack文件超过这个大小后换新文件
+DEFAULT_PACK_SIZE = 256 * 1024 * 1024
+
+COMPRESS_LEVEL = 6
+
+# reextract每批读入并解析的记录数
+REEXTRACT_BATCH = 256
+
+def read_blob(pack_path, offset, length):
+    """从pack文件读出一条记录并解压（进程池中也可以直接调用）"""
+    with open(pack_path, 'rb') as f:
+        f.seek(offset)
+        data = f.read(length)
+    return zlib.decompress(data).decode('utf-8')
+
+class HtmlArchive:
+    def __init__(self, root_dir, pack_size=DEFAULT_PACK_SIZE):
+        """
+        root_dir: 归档目录，包含 pack-NNNNNN.pack 和 index.sqlite3
+        pack_size: 单个pack文件的大小上限（字节）
+        """
+        self.root_dir = Path(root_dir)
+        self.root_dir.mkdir(parents=True, exist_ok=True)
+        self.pack_size = pack_size
+        self.stored = 0
+        self.deduplicated = 0
+        
+        # put()在线程池中执行，连接跨线程使用，由_lock串行化
+        self.conn = sqlite3.connect(str(self.root_dir / "index.sqlite3"), check_same_thread=False)
+        self._lock = threading.Lock()
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS blobs (
+                sha256 TEXT PRIMARY KEY,
+                pack TEXT,
+                offset INTEGER,
+                length INTEGER,
+                raw_size INTEGER,
+                stored_at TEXT
+            )
+        """)
+        self.conn.commit()
+        
+        self._pack_file = None
+        self._pack_name = None
+    
+    def _pack_names(self):
+        return sorted(p.name for p in self.root_dir.glob('pack-*.pack'))
+    
+    def _open_pack(self):
+        """打开最后一个pack文件追加写入，超过上限时新建"""
+        names = self._pack_names()
+        if names and (self.root_dir / names[-1]).stat().st_size < self.pack_size:
+            name = names[-1]
+        else:
+            name = f"pack-{len(names) + 1:06d}.pack"
+        self._pack_name = name
+        self._pack_file = open(self.root_dir / name, 'ab')
+    
+    def contains(self, digest):
+        return self.conn.execute('SELECT 1 FROM blobs WHERE sha256 = ?', (digest,)).fetchone() is not None
+    
+    def put(self, html):
+        """
+        保存一篇HTML，返回其sha256；已存在时直接返回
+        涉及压缩、写文件和SQLite提交，在事件循环中应通过run_in_executor调用（可多线程并发）
+        """
+        raw = html.encode('utf-8')
+        digest = hashlib.sha256(raw).hexdigest()
+        with self._lock:
+            if self.contains(digest):
+                self.deduplicated += 1
+                return digest
+        
+        # 压缩不需要持锁，多个线程可以并行
+        data = zlib.compress(raw, COMPRESS_LEVEL)
+        with self._lock:
+            return self._append(digest, data, len(raw))
+    
+    def _append(self, digest, data, raw_size):
+        if self.contains(digest):
+            # 压缩期间其他线程已经写入了相同内容
+            self.deduplicated += 1
+            return digest
+        if self._pack_file is None or self._pack_file.tell() >= self.pack_size:
+            if self._pack_file:
+                self._pack_file.close()
+            self._open_pack()
+        
+        self._pack_file.write(RECORD_HEADER.pack(RECORD_MAGIC, bytes.fromhex(digest), len(data)))
+        offset = self._pack_file.tell()
+        self._pack_file.write(data)
+        # 先把数据写进pack再登记索引：中途崩溃最多在pack末尾留下一段没有索引的数据
+        self._pack_file.flush()
+        self.conn.execute(
+            'INSERT OR IGNORE INTO blobs (sha256, pack, offset, length, raw_size, stored_at) VALUES (?, ?, ?, ?, ?, ?)',
+            (digest, self._pack_name, offset, len(data), raw_size, datetime.now().isoformat())
+        )
+        self.conn.commit()
+        self.stored += 1
+        return digest
+    
+    def locate(self, digest):
+        """返回 (pack文件路径, 偏移, 长度)，不存在时返回None"""
+        with self._lock:
+            row = self.conn.execute('SELECT pack, offset, length FROM blobs WHERE sha256 = ?', (digest,)).fetchone()
+        if not row:
+            return None
+        pack, offset, length = row
+        return str(self.root_dir / pack), offset, length
+    
+    def get(self, digest):
+        """按sha256读出HTML，不存在时返回None"""
+        location = self.locate(digest)
+        if not location:
+            return None
+        if self._pack_file:
+            self._pack_file.flush()
+        return read_blob(*location)
+    
+    def stats(self):
+        count, packed, raw = self.conn.execute(
+            'SELECT COUNT(*), COALESCE(SUM(length), 0), COALESCE(SUM(raw_size), 0) FROM blobs'
+        ).fetchone()
+        return {
+            'documents': count,
+            'packs': len(self._pack_names()),
+            'compressed_bytes': packed,
+            'raw_bytes': raw,
+        }
+    
+    def rebuild_index(self):
+        """扫描全部pack文件重建索引，返回登记的记录数（末尾不完整的记录跳过）"""
+        if self._pack_file:
+            self._pack_file.flush()
+        added = 0
+        for name in self._pack_names():
+            path = self.root_dir / name
+            size = path.stat().st_size
+            with open(path, 'rb') as f:
+                while True:
+                    header = f.read(RECORD_HEADER.size)
+                    if len(header) < RECORD_HEADER.size:
+                        break
+                    magic, digest, length = RECORD_HEADER.unpack(header)
+                    offset = f.tell()
+                    if magic != RECORD_MAGIC or offset + length > size:
+                        print(f"⚠️ {name} 在偏移 {offset} 处记录不完整，停止扫描该文件")
+                        break
+                    raw_size = len(zlib.decompress(f.read(length)))
+                    cursor = self.conn.execute(
+                        'INSERT OR IGNORE INTO blobs (sha256, pack, offset, length, raw_size, stored_at) VALUES (?, ?, ?, ?, ?, ?)',
+                        (digest.hex(), name, offset, length, raw_size, datetime.now().isoformat())
+                    )
+                    added += cursor.rowcount
+        self.conn.commit()
+        return added
+    
+    def close(self):
+        with self._lock:
+            if self._pack_file:
+                self._pack_file.close()
+                self._pack_file = None
+            self.conn.close()
+
+def _reextract_blob(location):
+    """进程池任务：读出归档的HTML并重新解析"""
+    html = read_blob(*location)
+    return parse_detail_text(html_to_text(html))
+
+def _reextract_batch(archive, pool, batch, out):
+    """重新解析一批记录并写出，返回 (更新数, 缺失数)"""
+    locations = [archive.locate(record['html_sha256']) if record.get('html_sha256') else None
+                 for record in batch]
+    targets = [location for location in locations if location]
+    results = iter(pool.map(_reextract_blob, targets, chunksize=16))
+    updated = missing = 0
+    for record, location in zip(batch, locations):
+        if location:
+            record = {**record, **next(results), 'reextracted_at': datetime.now().isoformat()}
+            updated += 1
+        elif record.get('html_sha256'):
+            missing += 1
+        out.write(json.dumps(record, ensure_ascii=False) + '\n')
+    return updated, missing
+
+def reextract(archive, input_file, output_dir, workers=4, batch_size=REEXTRACT_BATCH):
+    """
+    按记录中的html_sha256从归档取出原始HTML，在进程池中重新解析，
+    解析字段覆盖原记录后写出新的JSONL及JSON/CSV快照。没有归档HTML的记录原样保留
+    按批流式处理，内存占用与记录数量无关
+    """
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    jsonl_file = output_dir / f"reextract_{timestamp}.jsonl"
+    
+    total = updated = missing = 0
+    with ProcessPoolExecutor(max_workers=max(1, workers)) as pool, \
+            open(jsonl_file, 'w', encoding='utf-8') as out:
+        batch = []
+        for record in iter_jsonl(input_file):
+            batch.append(record)
+            if len(batch) >= batch_size:
+                done, lost = _reextract_batch(archive, pool, batch, out)
+                total, updated, missing = total + len(batch), updated + done, missing + lost
+                batch = []
+                print(f"🔁 已处理 {total} 条记录")
+        if batch:
+            done, lost = _reextract_batch(archive, pool, batch, out)
+            total, updated, missing = total + len(batch), updated + done, missing + lost
+    
+    if not total:
+        print(f"❌ 没有可处理的记录: {input_file}")
+        return None
+    
+    outputs = build_snapshots(
+        jsonl_file,
+        jsonl_file.with_suffix('.json'),
+        jsonl_file.with_suffix('.csv')
+    )
+    print(f"✅ 重新解析 {updated} 条记录（共 {total} 条，归档中缺失 {missing} 篇）")
+    print(f"   {jsonl_file}")
+    for path in outputs:
+        print(f"   {path}")
+    return jsonl_file
+
+def main():
+    """命令行入口"""
+    parser = argparse.ArgumentParser(description="详情页HTML归档")
+    parser.add_argument('command', choices=['reextract', 'stats', 'rebuild-index'])
+    parser.add_argument('--archive', default='最终抓取测试/html_archive', help="归档目录")
+    parser.add_argument('--input', help="reextract: 抓取输出的JSONL文件")
+    parser.add_argument('--output', default='重新解析', help="reextract: 输出目录")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 2, help="reextract: 解析进程数")
+    args = parser.parse_args()
+    
+    if not Path(args.archive).exists():
+        parser.error(f"归档目录不存在: {args.archive}")
+    
+    archive = HtmlArchive(args.archive)
+    try:
+        if args.command == 'reextract':
+            if not args.input:
+                parser.error("reextract 需要 --input")
+            reextract(archive, args.input, args.output, workers=args.workers)
+        elif args.command == 'stats':
+            stats = archive.stats()
+            ratio = stats['compressed_bytes'] / stats['raw_bytes'] if stats['raw_bytes'] else 0
+            print(f"文书 {stats['documents']} 篇，pack文件 {stats['packs']} 个，"
+                  f"原始 {stats['raw_bytes'] / 1024 / 1024:.1f} MB，"
+                  f"压缩后 {stats['compressed_bytes'] / 1024 / 1024:.1f} MB（{ratio:.0%}）")
+        elif args.command == 'rebuild-index':
+            added = archive.rebuild_index()
+            print(f"✅ 从pack文件登记 {added} 条记录")
+    finally:
+        archive.close()
+
+if __name__ == "__main__":
+    main()
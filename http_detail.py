@@ -0,0 +1,80 @@
+"""
+详情页直连抓取
+使用浏览器上下文自带的HTTP客户端（context.request）直接请求flws_view.jsp，
+与提交搜索的浏览器会话共享cookie和请求头，不再为每篇文书打开一个新标签页
+"""
+
+import re
+from html.parser import HTMLParser
+from readiness import MIN_DETAIL_TEXT
+
+CHARSET_PATTERN = re.compile(rb'charset\s*=\s*["\']?([\w-]+)', re.I)
+
+class _TextExtractor(HTMLParser):
+    """简单的HTML转文本，跳过script/style，块级元素处换行（文书结构解析依赖换行）"""
+    SKIP_TAGS = {'script', 'style', 'noscript'}
+    BLOCK_TAGS = {'p', 'div', 'br', 'tr', 'li', 'table', 'h1', 'h2', 'h3', 'h4', 'center'}
+    
+    def __init__(self):
+        super().__init__()
+        self.parts = []
+        self._skip = 0
+    
+    def handle_starttag(self, tag, attrs):
+        if tag in self.SKIP_TAGS:
+            self._skip += 1
+        elif tag in self.BLOCK_TAGS:
+            self.parts.append('\n')
+    
+    def handle_endtag(self, tag):
+        if tag in self.SKIP_TAGS and self._skip:
+            self._skip -= 1
+        elif tag in self.BLOCK_TAGS:
+            self.parts.append('\n')
+    
+    def handle_data(self, data):
+        if not self._skip:
+            self.parts.append(data)
+
+def html_to_text(html):
+    """提取HTML中的可见文本，保留块级元素的换行"""
+    parser = _TextExtractor()
+    parser.feed(html)
+    parser.close()
+    text = ''.join(parser.parts)
+    return '\n'.join(line.strip() for line in text.splitlines() if line.strip())
+
+def decode_html(body, content_type=""):
+    """按响应头或<meta>中的charset解码，法院网站常见GBK编码"""
+    match = CHARSET_PATTERN.search(content_type.encode('ascii', 'ignore'))
+    if not match:
+        match = CHARSET_PATTERN.search(body[:2048])
+    
+    charset = match.group(1).decode('ascii') if match else 'utf-8'
+    if charset.lower() in ('gb2312', 'gbk'):
+        charset = 'gb18030'
+    try:
+        return body.decode(charset, errors='replace')
+    except LookupError:
+        return body.decode('utf-8', errors='replace')
+
+async def fetch_detail(request_context, url, referer="", timeout=15000):
+    """
+    直接请求详情页，返回 (html, 正文文本, 最终URL)
+    非200响应或正文过短时抛出异常，由调用方回退到浏览器点击方式
+    """
+    headers = {'Referer': referer} if referer else {}
+    response = await request_context.get(url, headers=headers, timeout=timeout)
+    try:
+        if not response.ok:
+            raise RuntimeError(f"HTTP {response.status}")
+        
+        body = await response.body()
+        html = decode_html(body, response.headers.get('content-type', ''))
+        text = html_to_text(html)
+        # 文本太短通常说明拿到的是错误页或跳转页，而不是文书正文（与点击打开时用同一个阈值）
+        if len(text.strip()) < MIN_DETAIL_TEXT:
+            raise RuntimeError("详情页内容过短")
+        return html, text, response.url
+    finally:
+        await response.dispose()
@@ -0,0 +1,100 @@
+"""
+裁判文书结构化解析
+把详情页正文切分为：当事人、审理经过、法院查明与认定、裁判结果、审判人员/书记员/日期。
+纯文本处理、不依赖浏览器，可以放到进程池中运行，长文书也不会卡住事件循环
+"""
+
+import re
+
+# 案号行，例如（2024）沪01民终1234号
+CASE_NUMBER_PATTERN = re.compile(r'[（(]\d{4}[）)][^\n。]{1,40}?号')
+
+# 审理经过：当事人之后第一句包含“一案”的话
+HISTORY_PATTERN = re.compile(r'[^。\n]*一案')
+
+FINDINGS_PATTERN = re.compile(r'(经审理查明|本院经审理查明|本院查明|本院经审理认定|二审查明|本院认为)')
+
+RESULT_PATTERN = re.compile(r'(判决如下|裁定如下|决定如下|调解协议如下|协议如下)[:：]?')
+
+JUDGE_ROLES = r'审\s*判\s*长|审\s*判\s*员|代理审判员|人民陪审员|执行员'
+
+JUDGES_START_PATTERN = re.compile(rf'(?m)^\s*({JUDGE_ROLES})')
+
+JUDGE_LINE_PATTERN = re.compile(rf'(?m)^\s*({JUDGE_ROLES})\s*(\S[^\n]*)$')
+
+CLERK_PATTERN = re.compile(r'(?m)^\s*(书\s*记\s*员|法官助理)\s*(\S[^\n]*)$')
+
+CN_DIGITS = '〇○零一二三四五六七八九十'
+DATE_PATTERN = re.compile(rf'[{CN_DIGITS}]{{4}}年[{CN_DIGITS}]{{1,2}}月[{CN_DIGITS}]{{1,3}}日|\d{{4}}年\d{{1,2}}月\d{{1,2}}日')
+
+SECTION_FIELDS = (
+    'parties',
+    'trial_history',
+    'court_findings',
+    'judgment_result',
+    'judges',
+    'clerk',
+    'judgment_date',
+)
+
+def _squash(text):
+    """合并多余空白"""
+    return ' '.join(text.split())
+
+def _role_name(role, name):
+    return f"{''.join(role.split())} {_squash(name)}"
+
+def parse_judgment(text):
+    """
+    按固定行文结构切分裁判文书正文（需要保留换行）
+    找不到的部分返回空字符串
+    """
+    result = {field: '' for field in SECTION_FIELDS}
+    if not text:
+        return result
+    
+    # 各部分的起点，按出现顺序依次查找
+    header = CASE_NUMBER_PATTERN.search(text)
+    parties_start = header.end() if header else 0
+    
+    history = HISTORY_PATTERN.search(text, parties_start)
+    history_start = history.start() if history else None
+    
+    findings = FINDINGS_PATTERN.search(text, history_start or parties_start)
+    findings_start = findings.start() if findings else None
+    
+    verdict = RESULT_PATTERN.search(text, findings_start or history_start or parties_start)
+    result_start = verdict.start() if verdict else None
+    
+    judges = JUDGES_START_PATTERN.search(text, result_start or findings_start or parties_start)
+    judges_start = judges.start() if judges else len(text)
+    
+    def section(start, *ends):
+        if start is None:
+            return ''
+        end = next((e for e in ends if e is not None and e >= start), len(text))
+        return _squash(text[start:end])
+    
+    result['parties'] = section(parties_start, history_start, findings_start, result_start, judges_start)
+    result['trial_history'] = section(history_start, findings_start, result_start, judges_start)
+    result['court_findings'] = section(findings_start, result_start, judges_start)
+    result['judgment_result'] = section(result_start, judges_start)
+    
+    # 落款：审判人员、日期、书记员
+    tail = text[judges_start:]
+    result['judges'] = '；'.join(_role_name(role, name) for role, name in JUDGE_LINE_PATTERN.findall(tail))
+    result['clerk'] = '；'.join(_role_name(role, name) for role, name in CLERK_PATTERN.findall(tail))
+    date = DATE_PATTERN.search(tail)
+    result['judgment_date'] = date.group(0) if date else ''
+    
+    return result
+
+def parse_detail_text(text):
+    """
+    详情页正文处理（在进程池中执行）：保留完整正文并做结构化切分
+    返回可以直接合并进文书记录的字典
+    """
+    record = parse_judgment(text)
+    record['detail_text'] = _squash(text)
+    record['content_length'] = len(text)
+    return record
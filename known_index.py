@@ -0,0 +1,92 @@
+"""
+跨运行的已抓取文书索引
+用SQLite保存已抓取文书的案号和加密参数，列表页提取后先过滤掉已知文书，
+不再为它们打开详情页或发起HTTP请求
+"""
+
+import sqlite3
+from datetime import datetime
+
+class KnownDocIndex:
+    # SQLite单条语句的参数数量有上限，批量查询时分块
+    CHUNK = 500
+    
+    def __init__(self, path, commit_every=50):
+        """
+        path: SQLite索引文件
+        commit_every: add()登记的文书先缓存，累计多少篇后一次批量写入并提交
+        """
+        self.path = path
+        self.commit_every = commit_every
+        # 已登记但尚未写入SQLite的文书（崩溃时丢失只会导致这些文书下次再抓一遍）
+        self._pending = []
+        self.conn = sqlite3.connect(str(path))
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS known_docs (
+                case_number TEXT,
+                detail_param TEXT,
+                fetched_at TEXT
+            )
+        """)
+        self.conn.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_known_case ON known_docs(case_number)')
+        self.conn.execute('CREATE INDEX IF NOT EXISTS idx_known_param ON known_docs(detail_param)')
+        self.conn.commit()
+    
+    def count(self):
+        self.flush()
+        return self.conn.execute('SELECT COUNT(*) FROM known_docs').fetchone()[0]
+    
+    def _lookup(self, column, values):
+        found = set()
+        values = [v for v in values if v]
+        for i in range(0, len(values), self.CHUNK):
+            chunk = values[i:i + self.CHUNK]
+            placeholders = ','.join('?' * len(chunk))
+            rows = self.conn.execute(
+                f'SELECT {column} FROM known_docs WHERE {column} IN ({placeholders})', chunk
+            )
+            found.update(row[0] for row in rows)
+        return found
+    
+    def split_known(self, cases):
+        """
+        把一页文书分成 (新文书, 已知文书)
+        每页只做两次走索引的批量查询，数据量到百万级也不需要把索引读入内存
+        """
+        # 先写入缓存的文书，本次运行刚抓过的文书也能查到
+        self.flush()
+        known_numbers = self._lookup('case_number', [c.get('case_number') for c in cases])
+        known_params = self._lookup('detail_param', [c.get('detail_param') for c in cases])
+        
+        new_cases, known_cases = [], []
+        for case in cases:
+            if case.get('case_number') in known_numbers or case.get('detail_param') in known_params:
+                known_cases.append(case)
+            else:
+                new_cases.append(case)
+        return new_cases, known_cases
+    
+    def add(self, case):
+        """登记一篇已成功抓取的文书（缓存后批量提交，不在事件循环上每篇文书提交一次）"""
+        if not case.get('case_number'):
+            return
+        self._pending.append((case['case_number'], case.get('detail_param', ''), datetime.now().isoformat()))
+        if len(self._pending) >= self.commit_every:
+            self.flush()
+    
+    def flush(self):
+        """把缓存的文书写入SQLite并提交"""
+        if not self._pending:
+            return
+        self.conn.executemany(
+            'INSERT OR REPLACE INTO known_docs (case_number, detail_param, fetched_at) VALUES (?, ?, ?)',
+            self._pending
+        )
+        self.conn.commit()
+        self._pending = []
+    
+    def close(self):
+        self.flush()
+        self.conn.close()
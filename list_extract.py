@@ -0,0 +1,200 @@
+"""
+列表页文书行提取
+一次页面内evaluate取回所有文书行的id、onclick参数和七个单元格文本，
+避免逐行逐单元格调用get_attribute/inner_text产生上百次浏览器往返。
+也可以直接解析网络层捕获的列表数据响应，完全不读渲染后的DOM
+"""
+
+import asyncio
+import re
+from dataclasses import dataclass, asdict
+from html.parser import HTMLParser
+from http_detail import decode_html
+from readiness import LIST_URL_PATTERNS
+
+ROW_SELECTOR = 'tr[id^="tr"]'
+
+# 在页面内执行，一次性返回所有行的原始数据
+ROWS_SCRIPT = """
+(rows) => rows.map(row => ({
+    id: row.getAttribute('id') || '',
+    onclick: row.getAttribute('onclick') || '',
+    cells: Array.from(row.querySelectorAll('td')).map(td => td.innerText)
+}))
+"""
+
+SHOWONE_PATTERN = re.compile(r"showone\('([^']+)'\)")
+
+@dataclass
+class CaseRow:
+    """列表页中的一条文书记录"""
+    row_id: str
+    case_number: str
+    title: str
+    doc_type: str
+    case_reason: str
+    department: str
+    level: str
+    close_date: str
+    detail_param: str
+    row_index: int
+    
+    def to_dict(self):
+        return asdict(self)
+
+def parse_detail_param(onclick_attr):
+    """从onclick="showone('...')"中提取加密参数"""
+    if not onclick_attr:
+        return ""
+    match = SHOWONE_PATTERN.search(onclick_attr)
+    return match.group(1) if match else ""
+
+def clean_cell(text):
+    """
+    去掉&nbsp;并把连续空白（含换行、不换行空格）合并为一个空格
+    DOM提取（innerText）和数据响应解析得到的单元格都经过这里，两条路径结果一致
+    """
+    return ' '.join((text or '').replace('&nbsp;', '').split())
+
+def parse_row(raw, index, default_row_id=None):
+    """把页面返回的原始行数据转换为CaseRow，单元格不足7个时返回None"""
+    cells = raw.get('cells') or []
+    if len(cells) < 7:
+        return None
+    
+    return CaseRow(
+        row_id=raw.get('id') or default_row_id or f"tr{index}",
+        case_number=clean_cell(cells[0]),
+        title=clean_cell(cells[1]),
+        doc_type=clean_cell(cells[2]),
+        case_reason=clean_cell(cells[3]),
+        department=clean_cell(cells[4]),
+        level=clean_cell(cells[5]),
+        close_date=clean_cell(cells[6]),
+        detail_param=parse_detail_param(raw.get('onclick')),
+        row_index=index
+    )
+
+async def extract_rows(page, row_id_prefix="tr"):
+    """
+    一次往返提取当前页面所有文书行
+    返回 (行总数, CaseRow列表)
+    """
+    raw_rows = await page.eval_on_selector_all(ROW_SELECTOR, ROWS_SCRIPT)
+    
+    rows = []
+    for i, raw in enumerate(raw_rows):
+        row = parse_row(raw, i, default_row_id=f"{row_id_prefix}{i}")
+        if row:
+            rows.append(row)
+    return len(raw_rows), rows
+
+class _RowHTMLParser(HTMLParser):
+    """从列表数据响应（HTML片段）中解析 tr[id^="tr"] 行，结构与ROWS_SCRIPT的返回值相同"""
+    
+    def __init__(self):
+        super().__init__()
+        self.rows = []
+        self._row = None
+        self._cell = None
+        self._tr_depth = 0
+    
+    def handle_starttag(self, tag, attrs):
+        if tag == 'tr':
+            if self._row is not None:
+                self._tr_depth += 1
+                return
+            attrs = dict(attrs)
+            row_id = attrs.get('id') or ''
+            if row_id.startswith('tr'):
+                self._row = {'id': row_id, 'onclick': attrs.get('onclick') or '', 'cells': []}
+        elif tag == 'td' and self._row is not None and self._tr_depth == 0:
+            self._cell = []
+    
+    def handle_endtag(self, tag):
+        if self._row is None:
+            return
+        if tag == 'td' and self._cell is not None and self._tr_depth == 0:
+            # 空白在parse_row中由clean_cell统一处理
+            self._row['cells'].append(''.join(self._cell))
+            self._cell = None
+        elif tag == 'tr':
+            if self._tr_depth:
+                self._tr_depth -= 1
+                return
+            self.rows.append(self._row)
+            self._row = None
+            self._cell = None
+    
+    def handle_data(self, data):
+        if self._cell is not None:
+            self._cell.append(data)
+
+def parse_rows_html(html, row_id_prefix="tr"):
+    """
+    解析列表HTML中的文书行，不需要浏览器
+    返回 (行总数, CaseRow列表)
+    """
+    parser = _RowHTMLParser()
+    parser.feed(html)
+    parser.close()
+    
+    rows = []
+    for i, raw in enumerate(parser.rows):
+        row = parse_row(raw, i, default_row_id=f"{row_id_prefix}{i}")
+        if row:
+            rows.append(row)
+    return len(parser.rows), rows
+
+class ListPayloadCapture:
+    """
+    监听页面的列表数据响应并保存最新一份正文，
+    提取时直接解析这份数据；没有捕获到新数据时由调用方回退到DOM提取
+    """
+    
+    def __init__(self, url_patterns=LIST_URL_PATTERNS):
+        self.url_patterns = url_patterns
+        self.captured = 0
+        # 最近一次取出的列表数据响应的字节数
+        self.last_bytes = 0
+        self._latest = None
+        self._pending = set()
+    
+    def attach(self, page):
+        page.on('response', self._on_response)
+    
+    def _on_response(self, response):
+        if response.request.resource_type not in ('xhr', 'fetch', 'document'):
+            return
+        if not any(p in response.url for p in self.url_patterns):
+            return
+        task = asyncio.ensure_future(self._read(response))
+        self._pending.add(task)
+        task.add_done_callback(self._pending.discard)
+    
+    async def _read(self, response):
+        try:
+            body = await response.body()
+        except Exception:
+            # 页面跳转后旧响应的正文可能已不可读
+            return
+        html = decode_html(body, response.headers.get('content-type', ''))
+        if 'id="tr' in html or "id='tr" in html:
+            self._latest = (html, len(body))
+            self.captured += 1
+    
+    async def take_rows(self, row_id_prefix="tr"):
+        """
+        取出最近一次捕获的列表数据并解析，取出后清空，避免翻页失败时重复使用旧数据
+        没有可用数据时返回None
+        """
+        if self._pending:
+            await asyncio.gather(*self._pending, return_exceptions=True)
+        
+        latest, self._latest = self._latest, None
+        if not latest:
+            return None
+        html, self.last_bytes = latest
+        
+        row_count, rows = parse_rows_html(html, row_id_prefix)
+        return (row_count, rows) if rows else None
@@ -0,0 +1,171 @@
+"""
+抓取指标
+各阶段耗时直方图（goto、提交搜索、列表提取、翻页、打开详情、详情解析、保存等）和
+重试/超时/字节数计数器。可以通过本地HTTP端点以Prometheus文本格式实时查看，
+运行结束时输出JSON汇总，用来判断瓶颈在网站、浏览器还是我们自己的等待
+"""
+
+import asyncio
+import json
+import time
+from contextlib import contextmanager
+
+# 直方图分桶上限（秒）
+DEFAULT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+METRIC_PREFIX = 'court_crawler'
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{key}="{value}"' for key, value in labels) + '}'
+
+class Histogram:
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * len(self.buckets)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+    
+    def observe(self, value):
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+    
+    def quantile(self, q):
+        """按分桶估算分位数（返回所在桶的上限，超出最后一个桶时返回最大值）"""
+        if not self.count:
+            return 0.0
+        target = q * self.count
+        cumulative = 0
+        for bound, n in zip(self.buckets, self.counts):
+            cumulative += n
+            if cumulative >= target:
+                return min(bound, self.max)
+        return self.max
+    
+    def summary(self):
+        return {
+            'count': self.count,
+            'sum': round(self.sum, 3),
+            'avg': round(self.sum / self.count, 3) if self.count else 0.0,
+            'p50': self.quantile(0.5),
+            'p95': self.quantile(0.95),
+            'max': round(self.max, 3),
+        }
+
+class CrawlMetrics:
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.stages = {}
+        self.counters = {}
+        self.started = time.time()
+    
+    def observe(self, stage, seconds):
+        if stage not in self.stages:
+            self.stages[stage] = Histogram(self.buckets)
+        self.stages[stage].observe(seconds)
+    
+    @contextmanager
+    def time_stage(self, stage):
+        """记录with块的耗时（异常退出也记录）"""
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.monotonic() - start)
+    
+    def inc(self, name, amount=1, **labels):
+        """计数器加amount，例如 inc('timeouts', signal='rows_stable')"""
+        key = (name, tuple(sorted(labels.items())))
+        self.counters[key] = self.counters.get(key, 0) + amount
+    
+    def render_prometheus(self):
+        """Prometheus文本格式"""
+        lines = []
+        name = f"{METRIC_PREFIX}_stage_seconds"
+        lines.append(f"# HELP {name} Time spent per crawl stage")
+        lines.append(f"# TYPE {name} histogram")
+        for stage, hist in sorted(self.stages.items()):
+            cumulative = 0
+            for bound, n in zip(hist.buckets, hist.counts):
+                cumulative += n
+                lines.append(f'{name}_bucket{{stage="{stage}",le="{bound}"}} {cumulative}')
+            lines.append(f'{name}_bucket{{stage="{stage}",le="+Inf"}} {hist.count}')
+            lines.append(f'{name}_sum{{stage="{stage}"}} {hist.sum:.6f}')
+            lines.append(f'{name}_count{{stage="{stage}"}} {hist.count}')
+        
+        declared = set()
+        for (counter, labels), value in sorted(self.counters.items()):
+            metric = f"{METRIC_PREFIX}_{counter}_total"
+            if metric not in declared:
+                lines.append(f"# TYPE {metric} counter")
+                declared.add(metric)
+            lines.append(f"{metric}{_format_labels(labels)} {value}")
+        
+        lines.append(f"# TYPE {METRIC_PREFIX}_uptime_seconds gauge")
+        lines.append(f"{METRIC_PREFIX}_uptime_seconds {time.time() - self.started:.1f}")
+        return '\n'.join(lines) + '\n'
+    
+    def summary(self):
+        """JSON汇总：每个阶段的次数/总耗时/均值/分位数，以及所有计数器"""
+        counters = {}
+        for (counter, labels), value in sorted(self.counters.items()):
+            counters[counter + _format_labels(labels)] = value
+        return {
+            'stages': {stage: hist.summary() for stage, hist in sorted(self.stages.items())},
+            'counters': counters,
+        }
+    
+    def save_json(self, path, extra=None):
+        data = self.summary()
+        data.update(extra or {})
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+        return path
+    
+    def print_summary(self):
+        print("   阶段耗时 (次数 / 平均 / p95 / 最大，秒):")
+        for stage, info in self.summary()['stages'].items():
+            print(f"     {stage:<16} {info['count']:>5} / {info['avg']:.2f} / {info['p95']:.2f} / {info['max']:.2f}")
+
+async def serve_metrics(metrics, host='127.0.0.1', port=9108):
+    """
+    启动只读指标端点：GET /metrics 返回Prometheus文本，GET /metrics.json 返回JSON汇总
+    返回asyncio服务器对象，调用方负责close()
+    """
+    async def handle(reader, writer):
+        try:
+            request_line = await reader.readline()
+            while True:
+                line = await reader.readline()
+                if line in (b'\r\n', b'\n', b''):
+                    break
+            parts = request_line.decode('latin-1').split()
+            path = parts[1] if len(parts) > 1 else '/'
+            if path == '/metrics':
+                status, content_type = '200 OK', 'text/plain; version=0.0.4'
+                body = metrics.render_prometheus().encode('utf-8')
+            elif path == '/metrics.json':
+                status, content_type = '200 OK', 'application/json; charset=utf-8'
+                body = json.dumps(metrics.summary(), ensure_ascii=False).encode('utf-8')
+            else:
+                status, content_type, body = '404 Not Found', 'text/plain', b'not found\n'
+            writer.write(
+                f"HTTP/1.1 {status}\r\nContent-Type: {content_type}\r\n"
+                f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode('latin-1') + body
+            )
+            await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+    
+    server = await asyncio.start_server(handle, host, port)
+    print(f"📈 指标端点: http://{host}:{port}/metrics")
+    return server
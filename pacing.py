@@ -0,0 +1,143 @@
+"""
+自适应限速（AIMD）
+根据详情请求的延迟和失败/超时情况调整全局请求速率和同时抓取详情的worker数：
+响应一直正常时速率按窗口加性缓慢上升，出现错误、超时或明显变慢时乘性大幅下降。
+速率始终不超过配置的max_rate（硬上限），也不低于min_rate
+"""
+
+import asyncio
+import math
+import time
+from contextlib import asynccontextmanager
+
+DEFAULT_OPTIONS = {
+    'min_rate': 0.05,         # 速率下限（每秒请求数）
+    'start_rate': None,       # 初始速率，默认为上限的一半
+    'increase': 0.05,         # 每个正常窗口增加的速率（加性增）
+    'decrease': 0.5,          # 出错或变慢时速率乘以这个系数（乘性减）
+    'window': 10,             # 每多少次成功请求评估一次
+    'slow_factor': 2.0,       # 窗口平均延迟超过基线的多少倍视为变慢
+    'cooldown': 10.0,         # 下调后多少秒内不再下调（同一波错误只降一次）
+    'start_concurrency': 1,   # 初始同时抓取详情的worker数
+}
+
+class AimdController:
+    def __init__(self, rate_limiter, max_rate, max_concurrency, options=None, metrics=None):
+        """
+        rate_limiter: 被调整的全局RateLimiter
+        max_rate: 速率硬上限（每秒请求数）
+        max_concurrency: worker数上限（即启动的详情页worker数）
+        options: 覆盖 DEFAULT_OPTIONS
+        """
+        self.options = dict(DEFAULT_OPTIONS)
+        self.options.update(options or {})
+        self.rate_limiter = rate_limiter
+        self.max_rate = max_rate
+        self.min_rate = min(self.options['min_rate'], max_rate)
+        self.max_concurrency = max(1, max_concurrency)
+        self.metrics = metrics
+        
+        start_rate = self.options['start_rate'] or max_rate / 2
+        self.rate = self._clamp(start_rate)
+        self.concurrency = max(1, min(self.max_concurrency, self.options['start_concurrency']))
+        self.rate_limiter.set_rate(self.rate)
+        
+        # 正常窗口的平均延迟（指数平滑），作为判断变慢的基线
+        self.baseline = None
+        self.increases = 0
+        self.decreases = 0
+        self.lowest_rate = self.rate
+        self.highest_rate = self.rate
+        
+        self._latencies = []
+        self._last_decrease = 0.0
+        self.active = 0
+        self._changed = asyncio.Condition()
+    
+    def _clamp(self, rate):
+        return max(self.min_rate, min(self.max_rate, rate))
+    
+    @asynccontextmanager
+    async def slot(self):
+        """占用一个详情抓取名额，同时抓取的worker数不超过当前concurrency"""
+        async with self._changed:
+            await self._changed.wait_for(lambda: self.active < self.concurrency)
+            self.active += 1
+        try:
+            yield
+        finally:
+            async with self._changed:
+                self.active -= 1
+                self._changed.notify_all()
+    
+    async def observe(self, latency=None, failure=None):
+        """
+        记录一次请求结果
+        latency: 请求耗时（秒），不计延迟时传None
+        failure: 失败类型（超时、导航错误、直连失败等），成功时为None
+        """
+        if failure:
+            await self._decrease(f"失败: {failure}")
+            return
+        if latency is None:
+            return
+        
+        self._latencies.append(latency)
+        if len(self._latencies) < self.options['window']:
+            return
+        
+        average = sum(self._latencies) / len(self._latencies)
+        self._latencies = []
+        if self.baseline and average > self.baseline * self.options['slow_factor']:
+            # 基线也缓慢上移，网站整体变慢后不会一直停在下限
+            self.baseline = 0.9 * self.baseline + 0.1 * average
+            await self._decrease(f"变慢: 平均{average:.1f}秒，基线{self.baseline:.1f}秒")
+            return
+        
+        self.baseline = average if self.baseline is None else 0.8 * self.baseline + 0.2 * average
+        await self._increase(average)
+    
+    async def _increase(self, average):
+        rate = self._clamp(self.rate + self.options['increase'])
+        # 维持这个速率需要的并发数约为 速率 × 单次耗时（Little定律），多留一个
+        needed = math.ceil(rate * average) + 1
+        concurrency = min(self.max_concurrency, max(self.concurrency, min(needed, self.concurrency + 1)))
+        if rate == self.rate and concurrency == self.concurrency:
+            return
+        self.increases += 1
+        await self._apply(rate, concurrency, 'up', f"正常: 平均{average:.1f}秒")
+    
+    async def _decrease(self, reason):
+        now = time.monotonic()
+        self._latencies = []
+        if now - self._last_decrease < self.options['cooldown']:
+            return
+        self._last_decrease = now
+        rate = self._clamp(self.rate * self.options['decrease'])
+        concurrency = max(1, self.concurrency // 2)
+        self.decreases += 1
+        await self._apply(rate, concurrency, 'down', reason)
+    
+    async def _apply(self, rate, concurrency, direction, reason):
+        print(f"🎚️ 限速调整: {self.rate:.2f} → {rate:.2f} 次/秒，并发 {self.concurrency} → {concurrency}（{reason}）")
+        self.rate = rate
+        self.lowest_rate = min(self.lowest_rate, rate)
+        self.highest_rate = max(self.highest_rate, rate)
+        self.rate_limiter.set_rate(rate)
+        if self.metrics:
+            self.metrics.inc('rate_adjustments', direction=direction)
+        async with self._changed:
+            self.concurrency = concurrency
+            self._changed.notify_all()
+    
+    def summary(self):
+        return {
+            'rate': round(self.rate, 3),
+            'concurrency': self.concurrency,
+            'max_rate': self.max_rate,
+            'lowest_rate': round(self.lowest_rate, 3),
+            'highest_rate': round(self.highest_rate, 3),
+            'increases': self.increases,
+            'decreases': self.decreases,
+            'baseline_latency': round(self.baseline, 3) if self.baseline else None,
+        }
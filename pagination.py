@@ -0,0 +1,95 @@
+"""
+分页规划
+只在第一次翻页时解析一次分页控件，缓存翻页函数名（goPage/soPage）和总页数，
+之后跳到任意页都是一次evaluate调用。翻页是否成功以文书行指纹的变化为准，
+不依赖固定等待，也不会把同一页处理两次
+"""
+
+# 分页控件中读取翻页函数名、总页数和当前页码
+PAGER_SCRIPT = r"""
+() => {
+    const result = {name: '', total: 0, current: 0};
+    const pageDiv = document.querySelector('div.meneame') || document.querySelector('.meneame');
+    if (pageDiv) {
+        pageDiv.querySelectorAll('a, span').forEach(el => {
+            const source = (el.getAttribute('onclick') || '') + ' ' + (el.getAttribute('href') || '');
+            const re = /(goPage|soPage)\s*\(\s*['"]?(\d+)/g;
+            let m;
+            while ((m = re.exec(source)) !== null) {
+                result.name = result.name || m[1];
+                result.total = Math.max(result.total, parseInt(m[2], 10));
+            }
+            const text = (el.textContent || '').trim();
+            if (/^\d+$/.test(text)) {
+                result.total = Math.max(result.total, parseInt(text, 10));
+            }
+        });
+        const current = pageDiv.querySelector('span.current');
+        if (current) {
+            result.current = parseInt((current.textContent || '').trim(), 10) || 0;
+        }
+    }
+    if (!result.name) {
+        for (const name of ['goPage', 'soPage']) {
+            if (typeof window[name] === 'function') {
+                result.name = name;
+                break;
+            }
+        }
+    }
+    return result;
+}
+"""
+
+JUMP_SCRIPT = """
+({name, n}) => { window[name](n); }
+"""
+
+PAGER_FUNCTIONS = ('goPage', 'soPage')
+
+class PaginationPlanner:
+    """一个列表页对应一个规划器"""
+    
+    def __init__(self, readiness):
+        self.readiness = readiness
+        self.function_name = None
+        self.total_pages = 0
+    
+    async def plan(self, page):
+        """解析分页控件并缓存结果，返回是否找到翻页函数"""
+        try:
+            info = await page.evaluate(PAGER_SCRIPT)
+        except Exception as e:
+            print(f"⚠️ 解析分页控件失败: {e}")
+            return False
+        
+        if info['name'] in PAGER_FUNCTIONS:
+            self.function_name = info['name']
+        self.total_pages = max(self.total_pages, info['total'], info['current'])
+        print(f"🧭 分页: 翻页函数={self.function_name}，共{self.total_pages}页，当前第{info['current']}页")
+        return self.function_name is not None
+    
+    async def go_to(self, page, page_num):
+        """
+        跳到第page_num页，等文书行指纹变化且行数量稳定后返回True
+        超出总页数或等不到新行时返回False
+        """
+        if not self.function_name and not await self.plan(page):
+            print("❌ 页面上没有goPage/soPage翻页函数")
+            return False
+        
+        if page_num > self.total_pages:
+            # 分页控件可能只显示部分页码，重新读一次确认
+            await self.plan(page)
+            if page_num > self.total_pages:
+                print(f"ℹ️ 共{self.total_pages}页，没有第{page_num}页")
+                return False
+        
+        previous = await self.readiness.rows_fingerprint(page)
+        try:
+            await page.evaluate(JUMP_SCRIPT, {'name': self.function_name, 'n': page_num})
+        except Exception as e:
+            # 翻页函数提交表单时执行上下文可能在返回前就被销毁，以行指纹为准
+            print(f"  ⚠️ 调用{self.function_name}({page_num}): {str(e)[:80]}")
+        
+        return await self.readiness.wait_for_rows_changed(page, previous)
@@ -0,0 +1,128 @@
+"""
+查询空间切分
+按案件类别（ajlb）和结案日期区间填写搜索表单，把一个很大的结果集切成多个小查询。
+某个日期窗口的结果数超过阈值时对半拆分日期区间，直到每个窗口都不超过阈值（或只剩一天），
+各个窗口互相独立，可以并行抓取，也不需要翻到很深的页码
+"""
+
+from dataclasses import dataclass
+from datetime import date, timedelta
+
+# 搜索表单字段名，按实际页面调整（可以用debug_page_structure.py查看表单结构）
+DEFAULT_FORM_FIELDS = {
+    'ajlb': 'ajlb',          # 案件类别
+    'date_from': 'jarqks',   # 结案日期起
+    'date_to': 'jarqjs',     # 结案日期止
+}
+
+# 每个窗口的结果数上限，超过时继续拆分
+DEFAULT_MAX_RESULTS = 2000
+
+# 填写搜索表单：已有的字段直接赋值，表单中没有的字段补一个hidden input，返回补上的字段名
+FILL_FORM_SCRIPT = """
+(values) => {
+    const form = document.querySelector('form');
+    if (!form) {
+        return null;
+    }
+    const added = [];
+    for (const [name, value] of Object.entries(values)) {
+        let field = form.querySelector(`[name="${name}"]`);
+        if (!field) {
+            field = document.createElement('input');
+            field.type = 'hidden';
+            field.name = name;
+            form.appendChild(field);
+            added.push(name);
+        }
+        field.value = value;
+    }
+    return added;
+}
+"""
+
+# 结果总数：优先读页面上的“共N条”文字，读不到时返回-1
+RESULT_COUNT_SCRIPT = r"""
+() => {
+    const text = document.body ? document.body.innerText : '';
+    const m = text.match(/共\s*(\d+)\s*条/);
+    return m ? parseInt(m[1], 10) : -1;
+}
+"""
+
+@dataclass
+class QueryWindow:
+    """一个查询分区：案件类别 + 结案日期闭区间"""
+    ajlb: str
+    date_from: date
+    date_to: date
+    
+    @property
+    def days(self):
+        return (self.date_to - self.date_from).days + 1
+    
+    def split(self):
+        """按日期对半拆分为两个窗口"""
+        middle = self.date_from + timedelta(days=self.days // 2 - 1)
+        return (
+            QueryWindow(self.ajlb, self.date_from, middle),
+            QueryWindow(self.ajlb, middle + timedelta(days=1), self.date_to),
+        )
+    
+    def form_values(self, fields=None):
+        """转换为表单字段值，ajlb为空时保留表单原有的类别"""
+        fields = fields or DEFAULT_FORM_FIELDS
+        values = {
+            fields['date_from']: self.date_from.isoformat(),
+            fields['date_to']: self.date_to.isoformat(),
+        }
+        if self.ajlb:
+            values[fields['ajlb']] = self.ajlb
+        return values
+    
+    def label(self):
+        category = self.ajlb or '默认类别'
+        return f"{category} {self.date_from.isoformat()}~{self.date_to.isoformat()}"
+
+def initial_windows(categories, date_from, date_to):
+    """每个案件类别一个覆盖整个日期区间的初始窗口，categories为空时只用表单默认类别"""
+    date_from = date.fromisoformat(str(date_from))
+    date_to = date.fromisoformat(str(date_to))
+    return [QueryWindow(category, date_from, date_to) for category in (categories or [''])]
+
+class QueryPlanner:
+    def __init__(self, count_fn, max_results=DEFAULT_MAX_RESULTS):
+        """
+        count_fn: async (QueryWindow) -> 结果数，读不到时返回负数
+        max_results: 单个窗口的结果数上限
+        """
+        self.count_fn = count_fn
+        self.max_results = max_results
+    
+    async def plan(self, windows):
+        """
+        递归拆分结果数超过上限的窗口，返回 [(窗口, 结果数), ...]
+        结果数为0的窗口直接丢弃，只剩一天仍超过上限的窗口原样保留
+        """
+        partitions = []
+        stack = list(reversed(windows))
+        while stack:
+            window = stack.pop()
+            count = await self.count_fn(window)
+            print(f"  🔢 {window.label()}: {count if count >= 0 else '未知'} 条")
+            
+            if count == 0:
+                continue
+            if count > self.max_results and window.days > 1:
+                first, second = window.split()
+                # 先处理前半段，保持日期顺序
+                stack.append(second)
+                stack.append(first)
+                continue
+            if count > self.max_results:
+                print(f"  ⚠️ {window.label()} 只有一天仍有 {count} 条，不再拆分")
+            partitions.append((window, count))
+        
+        total = sum(count for _, count in partitions if count > 0)
+        print(f"🧩 切分为 {len(partitions)} 个查询分区，合计约 {total} 条")
+        return partitions
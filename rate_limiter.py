@@ -0,0 +1,39 @@
+"""
+全局请求速率限制器
+多个详情页worker共享同一个实例，保证对法院网站的总请求频率不超过上限
+"""
+
+import asyncio
+import random
+import time
+
+class RateLimiter:
+    def __init__(self, max_rate=0.3, jitter=0.3):
+        """
+        max_rate: 每秒最多发起的请求数（例如0.3 ≈ 每3.3秒一个）
+        jitter: 在最小间隔上额外叠加的随机比例，避免请求节奏过于规律
+        """
+        if max_rate <= 0:
+            raise ValueError("max_rate 必须大于0")
+        self.max_rate = max_rate
+        self.jitter = jitter
+        self._lock = asyncio.Lock()
+        self._next_time = 0.0
+    
+    def set_rate(self, max_rate):
+        """调整每秒请求数上限（自适应限速使用），从下一次acquire起生效"""
+        if max_rate <= 0:
+            raise ValueError("max_rate 必须大于0")
+        self.max_rate = max_rate
+    
+    async def acquire(self):
+        """等待直到允许发起下一个请求"""
+        async with self._lock:
+            now = time.monotonic()
+            wait = self._next_time - now
+            if wait > 0:
+                await asyncio.sleep(wait)
+                now = time.monotonic()
+            
+            interval = (1.0 / self.max_rate) * (1 + random.uniform(0, self.jitter))
+            self._next_time = now + interval
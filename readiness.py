@@ -0,0 +1,152 @@
+"""
+页面就绪等待
+用具体信号代替固定的wait_for_timeout：列表数据响应、文书行数量稳定、
+文书行指纹变化、详情页正文达到最小长度。每种信号有独立的超时，
+超时只打印警告并返回False，由调用方决定是否继续
+"""
+
+from playwright.async_api import TimeoutError as PlaywrightTimeoutError
+
+ROW_SELECTOR = 'tr[id^="tr"]'
+
+DEFAULT_TIMEOUTS = {
+    'list_response': 15000,   # 提交表单/翻页后等待列表数据响应
+    'rows_stable': 10000,     # 等待文书行出现且数量不再变化
+    'rows_changed': 15000,    # 翻页后等待文书行指纹与翻页前不同
+    'detail_text': 10000,     # 等待详情页正文达到最小长度
+}
+
+# 文书行数量保持不变多久（毫秒）视为渲染完成
+ROWS_SETTLE_MS = 300
+
+# 详情页正文最少字符数
+MIN_DETAIL_TEXT = 200
+
+# 列表数据响应的URL特征
+LIST_URL_PATTERNS = ('flws_list',)
+
+ROWS_STABLE_SCRIPT = """
+({selector, settle}) => {
+    const n = document.querySelectorAll(selector).length;
+    const now = Date.now();
+    const s = window.__crawlRowsState || (window.__crawlRowsState = {n: -1, t: now});
+    if (n !== s.n) {
+        s.n = n;
+        s.t = now;
+        return false;
+    }
+    return n > 0 && now - s.t >= settle;
+}
+"""
+
+# 文书行指纹：每行的id和onclick参数（含文书加密参数），不同页之间不会相同
+ROWS_FINGERPRINT_SCRIPT = """
+(selector) => Array.from(document.querySelectorAll(selector))
+    .map(row => (row.getAttribute('id') || '') + '|' + (row.getAttribute('onclick') || ''))
+    .join(';')
+"""
+
+ROWS_CHANGED_SCRIPT = """
+({selector, previous}) => {
+    const rows = Array.from(document.querySelectorAll(selector));
+    if (rows.length === 0) {
+        return false;
+    }
+    const fingerprint = rows
+        .map(row => (row.getAttribute('id') || '') + '|' + (row.getAttribute('onclick') || ''))
+        .join(';');
+    return fingerprint !== previous;
+}
+"""
+
+DETAIL_TEXT_SCRIPT = """
+(minLength) => !!document.body && document.body.innerText.trim().length >= minLength
+"""
+
+class Readiness:
+    def __init__(self, timeouts=None, list_url_patterns=LIST_URL_PATTERNS, metrics=None):
+        self.timeouts = dict(DEFAULT_TIMEOUTS)
+        self.timeouts.update(timeouts or {})
+        self.list_url_patterns = list_url_patterns
+        # 可选的CrawlMetrics，按信号统计超时次数
+        self.metrics = metrics
+    
+    def _timed_out(self, signal):
+        if self.metrics:
+            self.metrics.inc('timeouts', signal=signal)
+    
+    def _is_list_response(self, response):
+        if response.request.resource_type not in ('xhr', 'fetch', 'document'):
+            return False
+        return any(p in response.url for p in self.list_url_patterns)
+    
+    async def run_and_wait_for_list(self, page, action):
+        """
+        执行action（提交表单、调用goPage等），等待列表数据响应，再等文书行稳定
+        返回文书行是否就绪
+        """
+        try:
+            async with page.expect_response(self._is_list_response,
+                                            timeout=self.timeouts['list_response']):
+                await action()
+        except PlaywrightTimeoutError:
+            self._timed_out('list_response')
+            print("  ⚠️ 未等到列表数据响应")
+        
+        return await self.wait_for_rows_stable(page)
+    
+    async def wait_for_rows_stable(self, page):
+        """等待文书行出现且数量在ROWS_SETTLE_MS内不再变化"""
+        try:
+            # 表单提交会整页跳转，先等新文档可用再开始计时
+            await page.wait_for_load_state('domcontentloaded')
+            await page.evaluate("() => { window.__crawlRowsState = null; }")
+            await page.wait_for_function(
+                ROWS_STABLE_SCRIPT,
+                arg={'selector': ROW_SELECTOR, 'settle': ROWS_SETTLE_MS},
+                polling=100,
+                timeout=self.timeouts['rows_stable']
+            )
+            return True
+        except Exception as e:
+            self._timed_out('rows_stable')
+            print(f"  ⚠️ 等待文书行稳定超时: {str(e)[:80]}")
+            return False
+    
+    async def rows_fingerprint(self, page):
+        """当前页文书行指纹，页面正在跳转时返回空字符串"""
+        try:
+            return await page.evaluate(ROWS_FINGERPRINT_SCRIPT, ROW_SELECTOR)
+        except Exception:
+            return ''
+    
+    async def wait_for_rows_changed(self, page, previous):
+        """等待文书行指纹变得与previous不同（即新一页的行已经渲染），再等行数量稳定"""
+        try:
+            await page.wait_for_load_state('domcontentloaded')
+            await page.wait_for_function(
+                ROWS_CHANGED_SCRIPT,
+                arg={'selector': ROW_SELECTOR, 'previous': previous},
+                polling=100,
+                timeout=self.timeouts['rows_changed']
+            )
+        except Exception as e:
+            self._timed_out('rows_changed')
+            print(f"  ⚠️ 等待文书行变化超时: {str(e)[:80]}")
+            return False
+        return await self.wait_for_rows_stable(page)
+    
+    async def wait_for_detail_text(self, page, min_length=MIN_DETAIL_TEXT):
+        """等待详情页正文达到最小长度"""
+        try:
+            await page.wait_for_function(
+                DETAIL_TEXT_SCRIPT,
+                arg=min_length,
+                polling=100,
+                timeout=self.timeouts['detail_text']
+            )
+            return True
+        except Exception as e:
+            self._timed_out('detail_text')
+            print(f"  ⚠️ 等待详情正文超时: {str(e)[:80]}")
+            return False
@@ -0,0 +1,114 @@
+"""
+浏览器资源拦截
+列表页和详情页只读取文本，图片、字体、样式表和第三方统计脚本都不需要加载。
+按页面类型（list/detail）分别配置拦截规则，某类页面需要脚本渲染时可以单独关闭
+"""
+
+from urllib.parse import urlparse
+
+# 常见第三方统计/跟踪域名
+TRACKER_DOMAINS = (
+    'google-analytics.com',
+    'googletagmanager.com',
+    'doubleclick.net',
+    'hm.baidu.com',
+    'cnzz.com',
+    'umeng.com',
+    '51.la',
+    'zhanzhang.baidu.com',
+)
+
+DEFAULT_RULES = {
+    'list': {
+        'enabled': True,
+        'block_types': ['image', 'font', 'stylesheet', 'media'],
+        'block_trackers': True,
+    },
+    'detail': {
+        'enabled': True,
+        'block_types': ['image', 'font', 'stylesheet', 'media'],
+        'block_trackers': True,
+    },
+}
+
+# 被拦截请求的大小无法得知，按类型给一个估算值用于统计节省的流量
+ESTIMATED_BYTES = {
+    'image': 30 * 1024,
+    'font': 60 * 1024,
+    'stylesheet': 20 * 1024,
+    'media': 300 * 1024,
+    'script': 40 * 1024,
+}
+
+class ResourceBlocker:
+    def __init__(self, site_url, rules=None):
+        """
+        site_url: 目标网站地址，用于区分第一方和第三方请求
+        rules: 按页面类型覆盖 DEFAULT_RULES，例如 {'detail': {'enabled': False}}
+        """
+        self.site_host = urlparse(site_url).hostname or ''
+        self.rules = {}
+        for page_type, default in DEFAULT_RULES.items():
+            rule = dict(default)
+            rule.update((rules or {}).get(page_type, {}))
+            rule['block_types'] = set(rule['block_types'])
+            self.rules[page_type] = rule
+        
+        self._page_types = {}
+        self.stats = {
+            'blocked_requests': 0,
+            'blocked_bytes_est': 0,
+            'allowed_requests': 0,
+            'by_type': {},
+        }
+    
+    async def attach(self, context):
+        """在浏览器上下文上安装拦截路由（对之后打开的所有标签页生效）"""
+        await context.route('**/*', self._handle)
+    
+    def set_page_type(self, page, page_type):
+        """标记页面类型，未标记的页面（点击打开的新标签页）按detail处理"""
+        self._page_types[page] = page_type
+    
+    def _page_type_of(self, request):
+        try:
+            page = request.frame.page
+        except Exception:
+            return 'detail'
+        return self._page_types.get(page, 'detail')
+    
+    def _is_tracker(self, url):
+        host = urlparse(url).hostname or ''
+        if not host or host == self.site_host:
+            return False
+        return any(host == d or host.endswith('.' + d) for d in TRACKER_DOMAINS)
+    
+    def should_block(self, page_type, resource_type, url):
+        rule = self.rules.get(page_type)
+        if not rule or not rule['enabled']:
+            return False
+        if resource_type in rule['block_types']:
+            return True
+        return rule['block_trackers'] and self._is_tracker(url)
+    
+    async def _handle(self, route):
+        request = route.request
+        resource_type = request.resource_type
+        page_type = self._page_type_of(request)
+        
+        if self.should_block(page_type, resource_type, request.url):
+            self.stats['blocked_requests'] += 1
+            self.stats['blocked_bytes_est'] += ESTIMATED_BYTES.get(resource_type, 10 * 1024)
+            key = f"{page_type}:{resource_type}"
+            self.stats['by_type'][key] = self.stats['by_type'].get(key, 0) + 1
+            await route.abort()
+        else:
+            self.stats['allowed_requests'] += 1
+            await route.continue_()
+    
+    def summary(self):
+        """返回一行统计文字"""
+        saved_kb = self.stats['blocked_bytes_est'] / 1024
+        return (f"拦截请求 {self.stats['blocked_requests']} 个，"
+                f"放行 {self.stats['allowed_requests']} 个，"
+                f"估算节省 {saved_kb:.0f} KB")
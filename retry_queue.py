@@ -0,0 +1,191 @@
+"""
+详情页失败重试
+抓取失败的文书按失败类型分类后进入重试队列，指数退避加随机抖动后由单独的重试worker重新抓取，
+不占用主队列、不阻塞列表翻页。超过最大尝试次数的文书写入死信JSONL，
+之后可以用 --retry-dead 单独重放
+"""
+
+import asyncio
+import heapq
+import json
+import os
+import random
+import time
+from datetime import datetime
+from pathlib import Path
+
+try:
+    from playwright.async_api import TimeoutError as PlaywrightTimeoutError
+except ImportError:
+    # 死信读取、合并等不打开浏览器的场景不需要playwright，此时也不会出现Playwright超时异常
+    PlaywrightTimeoutError = asyncio.TimeoutError
+
+# 失败类型
+TIMEOUT = 'timeout'              # 等待页面加载/正文超时
+NAVIGATION = 'navigation'        # 打开详情URL失败（网络错误、跳转中断等）
+EMPTY_CONTENT = 'empty_content'  # 页面打开了但没有文书正文
+POPUP = 'popup'                  # 点击行后没有打开详情标签页
+OTHER = 'other'
+
+FAILURE_KINDS = (TIMEOUT, NAVIGATION, EMPTY_CONTENT, POPUP, OTHER)
+
+DEAD_LETTER_FILE = "dead_letter.jsonl"
+
+class DetailFailure(Exception):
+    """详情页抓取失败，kind为失败类型"""
+    def __init__(self, kind, message=""):
+        super().__init__(message or kind)
+        self.kind = kind
+
+def classify_failure(error, step=''):
+    """
+    按异常和出错的步骤归类失败
+    step: 'open'（点击行等待弹窗）、'load'（打开/加载详情页）、'extract'（提取正文）
+    """
+    if isinstance(error, DetailFailure):
+        return error.kind
+    if step == 'open':
+        return POPUP
+    if isinstance(error, (PlaywrightTimeoutError, asyncio.TimeoutError)):
+        return TIMEOUT
+    message = str(error)
+    if 'Timeout' in message:
+        return TIMEOUT
+    if step == 'load' or 'net::' in message or 'navigat' in message.lower():
+        return NAVIGATION
+    return OTHER
+
+class DeadLetterLog:
+    def __init__(self, path):
+        self.path = Path(path)
+        self.written = 0
+        self._file = None
+    
+    def append(self, case, kind, error, attempts):
+        """追加一条死信，立即落盘"""
+        if not self._file:
+            self._file = open(self.path, 'a', encoding='utf-8')
+        entry = {
+            'case': case,
+            'kind': kind,
+            'error': error[:300],
+            'attempts': attempts,
+            'failed_at': datetime.now().isoformat(),
+        }
+        self._file.write(json.dumps(entry, ensure_ascii=False) + '\n')
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self.written += 1
+    
+    def close(self):
+        if self._file:
+            self._file.close()
+            self._file = None
+
+def take_dead_letters(path):
+    """
+    取出死信文件中的文书用于重放：文件改名为 dead_letter_<时间>.replayed.jsonl 留档，
+    重放中再次失败的文书会写入新的死信文件。返回去重后的文书列表
+    """
+    path = Path(path)
+    if not path.exists():
+        return []
+    archived = path.with_name(f"{path.stem}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.replayed.jsonl")
+    path.rename(archived)
+    
+    cases = {}
+    with open(archived, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                case = json.loads(line)['case']
+            except (json.JSONDecodeError, KeyError, TypeError):
+                continue
+            key = case.get('detail_param') or case.get('case_number') or case.get('detail_url')
+            cases[key] = case
+    print(f"📮 死信文件已移到 {archived}，待重放 {len(cases)} 篇")
+    return list(cases.values())
+
+class RetryQueue:
+    def __init__(self, dead_letters, max_attempts=3, base_delay=5.0, max_delay=120.0, metrics=None):
+        """
+        dead_letters: DeadLetterLog，超过尝试次数的文书写入这里
+        max_attempts: 每篇文书最多尝试次数（含第一次）
+        base_delay/max_delay: 退避基数和上限（秒），第n次重试等待 base*2^(n-1)，再乘0.5~1.5的随机抖动
+        """
+        self.dead_letters = dead_letters
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.metrics = metrics
+        self.scheduled = 0
+        self.dead = 0
+        
+        self._heap = []
+        # 每篇文书已失败的次数，按文书对象记录，不写进文书记录
+        self._attempts = {}
+        self._seq = 0
+        self._unfinished = 0
+        self._changed = asyncio.Condition()
+    
+    def backoff(self, attempts):
+        """第attempts次失败后的等待时间（秒）"""
+        delay = min(self.max_delay, self.base_delay * 2 ** (attempts - 1))
+        return delay * random.uniform(0.5, 1.5)
+    
+    async def failed(self, case, kind, error=""):
+        """
+        登记一次失败：未超过尝试次数时安排重试并返回'retry'，否则写入死信并返回'dead'
+        """
+        attempts = self._attempts.get(id(case), 0) + 1
+        self._attempts[id(case)] = attempts
+        if self.metrics:
+            self.metrics.inc('failures', kind=kind)
+        
+        if attempts >= self.max_attempts:
+            self.forget(case)
+            self.dead_letters.append(case, kind, error, attempts)
+            self.dead += 1
+            print(f"  ☠️ {case.get('case_number', '')} 失败{attempts}次（{kind}），写入死信")
+            return 'dead'
+        
+        delay = self.backoff(attempts)
+        async with self._changed:
+            self._seq += 1
+            heapq.heappush(self._heap, (time.monotonic() + delay, self._seq, case))
+            self._unfinished += 1
+            self.scheduled += 1
+            self._changed.notify_all()
+        if self.metrics:
+            self.metrics.inc('retries', kind=kind)
+        print(f"  🔁 {case.get('case_number', '')} 失败（{kind}），{delay:.0f}秒后第{attempts + 1}次尝试")
+        return 'retry'
+    
+    def forget(self, case):
+        """文书处理结束（成功或写入死信）后清除失败计数"""
+        self._attempts.pop(id(case), None)
+    
+    async def next_due(self):
+        """等待并取出下一篇到期的文书"""
+        async with self._changed:
+            while True:
+                if self._heap:
+                    wait = self._heap[0][0] - time.monotonic()
+                    if wait <= 0:
+                        return heapq.heappop(self._heap)[2]
+                else:
+                    wait = None
+                try:
+                    await asyncio.wait_for(self._changed.wait(), wait)
+                except asyncio.TimeoutError:
+                    pass
+    
+    async def task_done(self):
+        """一篇重试文书处理结束（成功、再次排队或写入死信）"""
+        async with self._changed:
+            self._unfinished -= 1
+            self._changed.notify_all()
+    
+    async def join(self):
+        """等待所有已安排的重试处理完（包括处理中再次安排的重试）"""
+        async with self._changed:
+            await self._changed.wait_for(lambda: self._unfinished == 0)
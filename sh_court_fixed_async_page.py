@@ -3,46 +3,202 @@
 使用方法：python sh_court_fixed_async_page.py
 """
 
+import argparse
 import asyncio
-import json
-import random
-import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import asynccontextmanager, contextmanager
 from datetime import datetime
 from pathlib import Path
-import pandas as pd
+from urllib.parse import urljoin
 from playwright.async_api import async_playwright
+from case_writer import JsonlCaseWriter, build_snapshots
+from checkpoint import CrawlCheckpoint
+from html_archive import HtmlArchive
+from http_detail import fetch_detail
+from judgment_parser import parse_detail_text
+from known_index import KnownDocIndex
+from list_extract import ListPayloadCapture, extract_rows
+from har_replay import HarRequestContext, attach_har_replay, har_files
+from metrics import CrawlMetrics, serve_metrics
+from pacing import AimdController
+from pagination import PaginationPlanner
+from parquet_writer import PartitionedParquetWriter
+from query_planner import (DEFAULT_MAX_RESULTS, FILL_FORM_SCRIPT, RESULT_COUNT_SCRIPT,
+                           QueryPlanner, initial_windows)
+from rate_limiter import RateLimiter
+from readiness import MIN_DETAIL_TEXT, Readiness
+from resource_blocker import ResourceBlocker
+from retry_queue import (DEAD_LETTER_FILE, EMPTY_CONTENT, DeadLetterLog, DetailFailure,
+                         RetryQueue, classify_failure, take_dead_letters)
+from tracing import DEFAULT_SAMPLE_RATE, DEFAULT_SLOW_THRESHOLD, NULL_TRACE, CaseTracer
+
+# HAR回放时的请求速率上限（不访问网络，只用于保留限速器的调用路径）
+REPLAY_MAX_RATE = 1000
 
 class FixedAsyncCourtCrawler:
-    def __init__(self, headless=False, max_cases=30, output_dir="抓取结果"):
+    def __init__(self, headless=False, max_cases=30, output_dir="抓取结果",
+                 concurrency=1, max_rate=0.3, http_detail=False, resume=False,
+                 skip_known=True, block_resources=True, resource_rules=None,
+                 readiness_timeouts=None, capture_list_payload=True, parse_workers=2,
+                 parquet_output=False, shards=1, partitions=None,
+                 storage_state_file=None, browser_endpoint=None,
+                 rate_limiter=None, record_sink=None, metrics=None, metrics_port=None,
+                 tracing=None, har_record=None, har_replay=None, archive_html=True,
+                 queue_size=None, max_attempts=3, retry_base_delay=5.0, retry_dead=False,
+                 adaptive=None, known_index=None, html_archive=None, dead_letters=None):
         self.headless = headless
         self.max_cases = max_cases
+        # 详情页worker数量，所有worker共享一个浏览器上下文和一个全局限速器
+        self.concurrency = max(1, concurrency)
+        # 列表页与详情页worker之间的有界队列：worker跟不上时列表翻页暂停等待，内存不随文书数增长
+        self.queue_size = queue_size or self.concurrency * 2
+        # 礼貌限速只由max_rate控制：提交搜索、翻页和详情请求都要先经过这个限速器
+        # （常驻服务中多个任务传入同一个限速器，共享一个全局上限）
+        self.rate_limiter = rate_limiter or RateLimiter(max_rate=max_rate)
+        # HAR录制：每个浏览器上下文录制一份HAR；HAR回放：所有响应来自录制文件，不访问网络
+        self.har_record_dir = Path(har_record) if har_record else None
+        self.har_replay = har_files(har_replay) if har_replay else []
+        self.har_request = None
+        if har_replay:
+            if not self.har_replay:
+                raise FileNotFoundError(f"找不到HAR文件: {har_replay}")
+            # 直连模式的详情请求同样从HAR读取
+            self.har_request = HarRequestContext(self.har_replay)
+            print(f"📼 HAR回放: {len(self.har_replay)} 个文件，{len(self.har_request)} 个GET响应")
+            # 回放不访问网站，不需要礼貌限速
+            if not rate_limiter:
+                self.rate_limiter = RateLimiter(max_rate=REPLAY_MAX_RATE, jitter=0)
+        # 各阶段耗时直方图和重试/超时/字节计数，metrics_port设置时提供Prometheus文本端点
+        self.metrics = metrics or CrawlMetrics()
+        # 自适应限速（AIMD）：max_rate作为硬上限，按详情请求的延迟和失败情况调整实际速率和同时抓取的worker数
+        # （HAR回放不限速；常驻服务共享的限速器由服务统一设置，也不做调整）
+        self.pacing = None
+        if adaptive and not har_replay and not rate_limiter:
+            self.pacing = AimdController(self.rate_limiter, max_rate, self.concurrency,
+                                         adaptive, metrics=self.metrics)
+        self.metrics_port = metrics_port
+        # 就绪等待：按具体信号等待（列表响应、行数稳定、行指纹变化、正文长度），各自有超时
+        self.readiness = Readiness(readiness_timeouts, metrics=self.metrics)
+        # 直接解析网络层捕获的列表数据响应，DOM提取只作为回退
+        self.capture_list_payload = capture_list_payload
+        self.list_captures = {}
+        self.pagers = {}
+        # 每个列表页面当前显示的页码（翻页过程中为None），点击回退只在文书所在页仍显示时点击行
+        self.displayed_pages = {}
+        # 文书结构化解析在独立进程中执行，不占用驱动浏览器的事件循环
+        self.parse_workers = parse_workers
+        self.parse_pool = None
+        # 点击行打开新标签页必须串行，否则expect_page无法区分是哪个worker的弹窗
+        self._popup_lock = asyncio.Lock()
+        # 列表页分片：多个浏览器上下文各自用goPage(n)跳到自己的起始页，并行处理不同页码范围
+        self.shards = max(1, shards)
+        # 查询分区：按案件类别和结案日期区间切分搜索，结果数超过上限的日期窗口继续拆分，
+        # 各分区并行抓取（同时打开的分区数同shards）
+        self.partitions = partitions
+        # 已分发但尚未完成的文书数，多个分片共享，避免超出max_cases
+        self.in_flight = 0
+        # 直连模式：用浏览器会话的cookie直接HTTP请求详情页，失败再回退到点击打开
+        self.http_detail = http_detail
+        # 详情页地址，运行时按start_url推算（本地测试站点和正式网站路径结构相同）
+        self.detail_base_url = "https://www.hshfy.sh.cn/shfy/web/flws_view.jsp"
         self.output_dir = Path(output_dir)
         self.output_dir.mkdir(exist_ok=True)
         
-        self.all_cases = []
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
         self.json_file = self.output_dir / f"cases_{timestamp}.json"
         self.csv_file = self.output_dir / f"cases_{timestamp}.csv"
+        # 每篇文书追加写入JSONL，JSON/CSV只在结束时或按需从它生成
+        self.jsonl_file = self.output_dir / f"cases_{timestamp}.jsonl"
+        self.metrics_file = self.output_dir / f"metrics_{timestamp}.json"
+        self.run_timestamp = timestamp
+        # 单篇文书追踪：按采样率和慢阈值写出各步骤span，慢文书保存Playwright trace
+        self.tracer = None
+        if tracing:
+            self.tracer = CaseTracer(
+                self.output_dir / f"traces_{timestamp}.jsonl",
+                sample_rate=tracing.get('sample_rate', DEFAULT_SAMPLE_RATE),
+                slow_threshold=tracing.get('slow_threshold', DEFAULT_SLOW_THRESHOLD),
+                trace_dir=self.output_dir / "playwright_traces" if tracing.get('playwright_traces', True) else None
+            )
+        self.writer = JsonlCaseWriter(self.jsonl_file)
+        # Parquet分区输出（按结案年月分区，需要pyarrow）
+        self.parquet = None
+        if parquet_output:
+            try:
+                self.parquet = PartitionedParquetWriter(self.output_dir / "parquet", run_id=timestamp)
+            except ImportError as e:
+                print(f"⚠️ {e}，本次不输出Parquet")
+        # 断点日志：resume=True 时从上次中断的列表页继续，并跳过已完成的文书
+        self.resume = resume
+        self.checkpoint = None
+        # 跨运行的已抓取文书索引，已知文书不再打开详情页
+        # （HAR回放用来在录制的页面上回归检查解析，录制时登记过的文书不能被跳过）
+        # 常驻服务给所有任务传入同一个已知索引、HTML归档和死信文件（由服务负责关闭），
+        # 否则在本次的输出目录下创建
+        self._shared_state = [obj for obj in (known_index, html_archive, dead_letters) if obj]
+        self.known_index = None
+        if skip_known and not har_replay:
+            self.known_index = known_index or KnownDocIndex(self.output_dir / "known_docs.sqlite3")
+        # 详情页原始HTML按内容哈希归档（压缩pack文件+索引，跨运行去重），记录中保存html_sha256
+        self.archive = None
+        if archive_html:
+            self.archive = html_archive or HtmlArchive(self.output_dir / "html_archive")
+        # 失败重试：按失败类型记录，指数退避后由重试worker重新抓取，超过max_attempts写入死信文件
+        self.max_attempts = max_attempts
+        self.retry_base_delay = retry_base_delay
+        self.dead_letters = dead_letters or DeadLetterLog(self.output_dir / DEAD_LETTER_FILE)
+        # retry_dead=True 时不翻列表页，只重放死信文件中的文书
+        self.retry_dead = retry_dead
+        # 资源拦截：按页面类型（list/detail）拦截图片、字体、样式表和第三方统计脚本
+        self.block_resources = block_resources
+        self.resource_rules = resource_rules
+        self.blocker = None
+        # 会话状态（cookie/localStorage）保存到文件，下次新建上下文时恢复
+        self.storage_state_file = Path(storage_state_file) if storage_state_file else None
+        # 常驻浏览器的CDP地址（warm_browser.py启动），设置后不再每次冷启动Chromium
+        self.browser_endpoint = browser_endpoint
+        self._started = None
+        # page_range模式下run()结束后表示页码范围是否处理完（协调器据此判断单元完成）
+        self.range_finished = False
+        # 本次运行创建的浏览器上下文，使用外部传入的共享浏览器时结束后逐个关闭
+        self.contexts = []
+        # 额外的记录输出（需要提供 async write(record)），常驻服务用它把记录实时推给调用方
+        self.record_sink = record_sink
         
         self.stats = {
             'total': 0,
             'success': 0,
-            'failed': 0,
+            'saved': 0,
+            'failed': 0,     # 失败次数（每次尝试都计入）
+            'dead': 0,       # 超过尝试次数写入死信的文书
             'pages': 0,
+            'http_detail': 0,
+            'http_fallback': 0,
+            'known_hit': 0,
+            'known_miss': 0,
+            'list_from_payload': 0,
+            'list_from_dom': 0,
+            'first_rows_sec': None,     # 从run开始到提取到第一页文书行
+            'first_record_sec': None,   # 从run开始到写出第一条文书记录
             'start': datetime.now().isoformat()
         }
     
-    async def random_delay(self, min_sec=1, max_sec=3):
-        await asyncio.sleep(random.uniform(min_sec, max_sec))
-    
-    async def submit_search(self, page):
-        """提交搜索表单"""
+    async def submit_search(self, page, query=None):
+        """提交搜索表单，query为QueryWindow时先填写案件类别和结案日期区间"""
         print("🔍 提交搜索表单...")
         
         try:
-            # 等待页面加载
-            await page.wait_for_load_state('networkidle', timeout=15000)
-            await self.random_delay(1, 2)
+            # 等待表单可用
+            await page.wait_for_load_state('domcontentloaded', timeout=15000)
+            await self.rate_limiter.acquire()
+            
+            if query:
+                form_fields = (self.partitions or {}).get('form_fields')
+                added = await page.evaluate(FILL_FORM_SCRIPT, query.form_values(form_fields))
+                print(f"📝 查询条件: {query.label()}")
+                if added:
+                    print(f"  ⚠️ 表单中没有字段 {added}，已补为隐藏字段")
             
             # 直接通过JavaScript提交
             submit_script = """
@@ -57,16 +213,19 @@ class FixedAsyncCourtCrawler:
             }
             """
             
-            result = await page.evaluate(submit_script)
-            if result:
-                print("✅ 表单已提交")
+            result = False
             
-            # 等待结果加载
+            async def submit():
+                nonlocal result
+                result = await page.evaluate(submit_script)
+            
+            # 提交并等待结果：列表数据响应 + 文书行数量稳定
             print("⏳ 等待搜索结果...")
-            await page.wait_for_timeout(5000)
+            with self.metrics.time_stage('submit_search'):
+                has_case_rows = await self.readiness.run_and_wait_for_list(page, submit)
+            if result:
+                print("✅ 表单已提交")
             
-            # 检查是否出现文书行
-            has_case_rows = await page.locator('tr[id^="tr"]').count() > 0
             if has_case_rows:
                 print("✅ 检测到文书数据行")
                 return True
@@ -78,194 +237,34 @@ class FixedAsyncCourtCrawler:
             print(f"❌ 表单提交失败: {e}")
             return False
     
-    async def analyze_page_control(self, page):
-        """分析分页控件并打印详细信息"""
-        try:
-            print("🔍 分析分页控件...")
-            
-            # 等待分页控件加载
-            try:
-                await page.wait_for_selector('div.meneame, .meneame, center#flws_list_content', timeout=5000)
-            except:
-                print("  ⚠️ 等待分页控件超时")
-            
-            # 获取分页区域的所有HTML
-            page_control_script = """
-            () => {
-                const pageDiv = document.querySelector('div.meneame') || 
-                               document.querySelector('.meneame') ||
-                               document.querySelector('center#flws_list_content');
-                
-                if (!pageDiv) {
-                    return {html: '未找到分页控件', links: []};
-                }
-                
-                const html = pageDiv.innerHTML;
-                const links = [];
-                
-                // 查找所有链接
-                const allLinks = pageDiv.querySelectorAll('a');
-                allLinks.forEach((link, index) => {
-                    links.push({
-                        index: index,
-                        href: link.getAttribute('href') || '',
-                        onclick: link.getAttribute('onclick') || '',
-                        text: link.textContent || link.innerText || '',
-                        outerHTML: link.outerHTML
-                    });
-                });
-                
-                // 查找当前页码
-                const currentSpan = pageDiv.querySelector('span.current');
-                const currentPage = currentSpan ? (currentSpan.textContent || currentSpan.innerText) : '';
-                
-                return {
-                    html: html,
-                    links: links,
-                    currentPage: currentPage,
-                    hasCurrentSpan: !!currentSpan,
-                    totalLinks: allLinks.length
-                };
-            }
-            """
-            
-            result = await page.evaluate(page_control_script)
-            
-            print(f"  分页控件HTML（前500字符）: {result['html'][:500]}...")
-            print(f"  当前页码: {result['currentPage']}")
-            print(f"  是否有current span: {result['hasCurrentSpan']}")
-            print(f"  总链接数: {result['totalLinks']}")
-            
-            # 打印所有链接详细信息
-            print(f"  链接详细信息:")
-            for link in result['links']:
-                print(f"    [{link['index']}] text='{link['text']}' onclick='{link['onclick']}' href='{link['href']}'")
-            
-            return result
-            
-        except Exception as e:
-            print(f"❌ 分页控件分析失败: {e}")
-            return None
+    def pager_for(self, page):
+        """每个列表页一个分页规划器，首次翻页时解析分页控件"""
+        if page not in self.pagers:
+            self.pagers[page] = PaginationPlanner(self.readiness)
+        return self.pagers[page]
     
     async def check_and_go_next_page(self, page, current_page_num):
-        """检查并跳转到下一页"""
-        try:
-            print(f"🔍 尝试翻页，当前应该是第{current_page_num}页")
-            
-            # 先分析分页控件
-            page_info = await self.analyze_page_control(page)
-            
-            if not page_info:
-                print("❌ 无法获取分页信息")
-                return False, current_page_num
-            
-            # 查找下一页链接
-            next_page_num = current_page_num + 1
-            
-            # 方法1：查找包含下一页数字的链接
-            print(f"  方法1: 查找页码 {next_page_num} 的链接")
-            for link in page_info['links']:
-                # 检查onclick中的页码
-                if link['onclick']:
-                    # 匹配 goPage 或 soPage
-                    matches = re.findall(r'(?:goPage|soPage)\s*\(\s*[\'\"]?(\d+)[\'\"]?\s*\)', link['onclick'])
-                    for match in matches:
-                        if int(match) == next_page_num:
-                            print(f"    ✅ 找到onclick翻页链接: {link['onclick']}")
-                            await page.evaluate(f"() => {{ {link['onclick']} }}")
-                            await self.wait_for_page_load(page, next_page_num)
-                            return True, next_page_num
-                
-                # 检查href中的页码
-                if link['href'] and 'javascript:' in link['href']:
-                    matches = re.findall(r'(?:goPage|soPage)\s*\(\s*[\'\"]?(\d+)[\'\"]?\s*\)', link['href'])
-                    for match in matches:
-                        if int(match) == next_page_num:
-                            print(f"    ✅ 找到href翻页链接: {link['href']}")
-                            await page.click(f'a[href="{link["href"]}"]')
-                            await self.wait_for_page_load(page, next_page_num)
-                            return True, next_page_num
-            
-            # 方法2：查找"下一页"文本的链接
-            print(f"  方法2: 查找'下一页'文本的链接")
-            for link in page_info['links']:
-                if link['text'] and ('下一页' in link['text'] or 'next' in link['text'].lower()):
-                    print(f"    ✅ 找到'下一页'文本链接: {link['text']}")
-                    
-                    if link['onclick']:
-                        await page.evaluate(f"() => {{ {link['onclick']} }}")
-                    elif link['href']:
-                        await page.click(f'a[href="{link["href"]}"]')
-                    else:
-                        # 直接点击
-                        await page.locator('a').nth(link['index']).click()
-                    
-                    await self.wait_for_page_load(page, next_page_num)
-                    return True, next_page_num
-            
-            # 方法3：尝试点击当前页之后的第一个链接
-            print(f"  方法3: 尝试点击当前页后的链接")
-            if page_info['currentPage']:
-                try:
-                    current_page = int(page_info['currentPage'])
-                    # 查找比当前页大的第一个链接
-                    for link in page_info['links']:
-                        if link['onclick']:
-                            matches = re.findall(r'(?:goPage|soPage)\s*\(\s*[\'\"]?(\d+)[\'\"]?\s*\)', link['onclick'])
-                            for match in matches:
-                                page_num = int(match)
-                                if page_num > current_page:
-                                    print(f"    ✅ 找到页码 {page_num} 的链接")
-                                    await page.evaluate(f"() => {{ {link['onclick']} }}")
-                                    await self.wait_for_page_load(page, page_num)
-                                    return True, page_num
-                except:
-                    pass
-            
-            # 方法4：如果只有数字链接，尝试点击最后一个链接
-            print(f"  方法4: 尝试最后一个数字链接")
-            if page_info['links']:
-                last_link = page_info['links'][-1]
-                if last_link['onclick']:
-                    matches = re.findall(r'(?:goPage|soPage)\s*\(\s*[\'\"]?(\d+)[\'\"]?\s*\)', last_link['onclick'])
-                    if matches:
-                        last_page = int(matches[-1])
-                        if last_page > current_page_num:
-                            print(f"    ✅ 点击最后页码链接: {last_page}")
-                            await page.evaluate(f"() => {{ {last_link['onclick']} }}")
-                            await self.wait_for_page_load(page, last_page)
-                            return True, last_page
-            
-            print("❌ 未找到有效的翻页方法")
-            return False, current_page_num
-            
-        except Exception as e:
-            print(f"❌ 翻页失败: {e}")
-            return False, current_page_num
-    
-    async def wait_for_page_load(self, page, page_num):
-        """等待页面加载完成"""
-        print(f"⏳ 等待第{page_num}页加载...")
+        """跳转到下一页，以文书行指纹变化确认翻页成功"""
+        next_page_num = current_page_num + 1
+        print(f"🔍 尝试翻页，当前应该是第{current_page_num}页")
         
-        # 等待网络空闲
-        try:
-            await page.wait_for_load_state('networkidle', timeout=10000)
-        except:
-            print("  ⚠️ 等待networkidle超时")
-        
-        # 等待文书行重新出现
-        try:
-            await page.wait_for_selector('tr[id^="tr"]', timeout=10000)
-        except:
-            print("  ⚠️ 等待文书行超时")
-        
-        # 额外等待时间
-        await self.random_delay(2, 3)
+        with self.metrics.time_stage('page_turn'):
+            turned = await self.pager_for(page).go_to(page, next_page_num)
+        if not turned:
+            return False, current_page_num
         
-        # 检查文书数量
         rows_count = await page.locator('tr[id^="tr"]').count()
-        print(f"✅ 第{page_num}页加载完成，有 {rows_count} 个文书")
-        
+        print(f"✅ 第{next_page_num}页加载完成，有 {rows_count} 个文书")
+        return True, next_page_num
+    
+    async def jump_to_page(self, page, page_num):
+        """通过页面上的goPage(n)/soPage(n)直接跳转到指定页"""
+        print(f"⏩ 直接跳转到第{page_num}页...")
+        with self.metrics.time_stage('page_turn'):
+            jumped = await self.pager_for(page).go_to(page, page_num)
+        if not jumped:
+            print(f"❌ 跳转到第{page_num}页失败")
+            return False
         return True
     
     async def extract_case_data(self, page, current_page=1):
@@ -274,75 +273,42 @@ class FixedAsyncCourtCrawler:
         
         cases = []
         try:
-            # 等待文书行出现
-            await page.wait_for_selector('tr[id^="tr"]', timeout=15000)
+            # 优先解析捕获到的列表数据响应，不依赖渲染后的DOM
+            extract_started = time.monotonic()
+            parsed = None
+            list_capture = self.list_captures.get(page)
+            if list_capture:
+                parsed = await list_capture.take_rows(row_id_prefix=f"tr_{current_page}_")
             
-            # 找到所有文书行
-            case_rows = await page.locator('tr[id^="tr"]').all()
-            print(f"找到 {len(case_rows)} 个文书行")
+            if parsed:
+                row_count, rows = parsed
+                self.stats['list_from_payload'] += 1
+                self.metrics.inc('bytes', list_capture.last_bytes, kind='list_payload')
+                self.mark_first('first_rows_sec')
+                print(f"📡 从列表数据响应中解析到 {row_count} 个文书行")
+            else:
+                # 回退：等待文书行出现，一次页面内evaluate取回所有行
+                await page.wait_for_selector('tr[id^="tr"]', timeout=15000)
+                row_count, rows = await extract_rows(page, row_id_prefix=f"tr_{current_page}_")
+                self.stats['list_from_dom'] += 1
+                self.mark_first('first_rows_sec')
+                print(f"找到 {row_count} 个文书行")
+            self.metrics.observe('list_extract', time.monotonic() - extract_started)
             
-            for i, row in enumerate(case_rows):
-                try:
-                    # 获取行属性
-                    row_id = await row.get_attribute('id') or f"tr_{current_page}_{i}"
-                    onclick_attr = await row.get_attribute('onclick') or ""
-                    
-                    # 提取加密参数
-                    detail_param = ""
-                    if onclick_attr:
-                        match = re.search(r"showone\('([^']+)'\)", onclick_attr)
-                        if match:
-                            detail_param = match.group(1)
-                    
-                    # 提取所有单元格
-                    cells = await row.locator('td').all()
-                    
-                    if len(cells) >= 7:
-                        # 分别获取每个单元格的文本
-                        case_number = await cells[0].inner_text()
-                        title = await cells[1].inner_text()
-                        doc_type = await cells[2].inner_text()
-                        
-                        case_reason_text = await cells[3].inner_text()
-                        case_reason = case_reason_text.replace('&nbsp;', '').strip()
-                        
-                        department_text = await cells[4].inner_text()
-                        department = department_text.replace('&nbsp;', '').strip()
-                        
-                        level_text = await cells[5].inner_text()
-                        level = level_text.replace('&nbsp;', '').strip()
-                        
-                        close_date = await cells[6].inner_text()
-                        
-                        case_data = {
-                            'row_id': row_id,
-                            'case_number': case_number.strip(),
-                            'title': title.strip(),
-                            'doc_type': doc_type.strip(),
-                            'case_reason': case_reason,
-                            'department': department,
-                            'level': level,
-                            'close_date': close_date.strip(),
-                            'detail_param': detail_param,
-                            'row_index': i,
-                            'page_number': current_page
-                        }
-                        
-                        # 构建详情页URL
-                        if detail_param:
-                            base_url = "https://www.hshfy.sh.cn/shfy/web/flws_view.jsp"
-                            case_data['detail_url'] = f"{base_url}?pa={detail_param}"
-                        else:
-                            case_data['detail_url'] = ""
-                        
-                        cases.append(case_data)
-                        print(f"  已提取: {case_data['case_number']} (第{current_page}页)")
-                        
-                except Exception as e:
-                    print(f"  第{current_page}页第{i}行提取失败: {str(e)[:100]}")
-                    continue
+            for row in rows:
+                case_data = row.to_dict()
+                case_data['page_number'] = current_page
+                
+                # 构建详情页URL
+                if case_data['detail_param']:
+                    case_data['detail_url'] = f"{self.detail_base_url}?pa={case_data['detail_param']}"
+                else:
+                    case_data['detail_url'] = ""
+                
+                cases.append(case_data)
+                print(f"  已提取: {case_data['case_number']} (第{current_page}页)")
             
-            self.stats['total'] += len(case_rows)
+            self.stats['total'] += row_count
             print(f"✅ 成功提取 {len(cases)} 个文书 (第{current_page}页)")
             return cases
             
@@ -351,47 +317,97 @@ class FixedAsyncCourtCrawler:
             await page.screenshot(path=self.output_dir / f'extract_error_page{current_page}.png')
             return cases
     
-    async def crawl_detail_page(self, context, case_data, main_page):
-        """抓取详情页内容"""
+    def filter_known(self, cases):
+        """用已抓取文书索引过滤掉之前运行中已经抓取过的文书"""
+        if not self.known_index:
+            return cases
+        
+        new_cases, known_cases = self.known_index.split_known(cases)
+        self.stats['known_hit'] += len(known_cases)
+        self.stats['known_miss'] += len(new_cases)
+        if known_cases:
+            print(f"⏭️ 跳过 {len(known_cases)} 个已抓取过的文书（已知文书索引）")
+        return new_cases
+    
+    @contextmanager
+    def stage(self, name, trace=NULL_TRACE):
+        """同时记入阶段耗时直方图和当前文书的追踪span"""
+        with self.metrics.time_stage(name), trace.span(name):
+            yield
+    
+    async def crawl_detail_page(self, context, case_data, main_page, trace=NULL_TRACE):
+        """抓取详情页内容，失败时抛出带失败类型的DetailFailure（由调用方安排重试）"""
         print(f"📄 打开详情页: {case_data['case_number']} (第{case_data['page_number']}页)")
         
         if not case_data.get('detail_url'):
             print("  ⚠️ 无详情链接，跳过")
             return None
         
+        # 直连模式：不开标签页，直接请求详情URL
+        if self.http_detail:
+            detail_content = await self.fetch_detail_http(context, case_data, main_page, trace)
+            if detail_content:
+                self.stats['success'] += 1
+                self.stats['http_detail'] += 1
+                print(f"✅ 详情页直连抓取成功 (第{case_data['page_number']}页)")
+                return {**case_data, **detail_content}
+            self.stats['http_fallback'] += 1
+            self.metrics.inc('retries', kind='http_fallback')
+            await self.record_pacing(failure='http_fallback')
+            print("  ↩️ 直连失败，回退到浏览器点击")
+        
         detail_page = None
+        open_started = time.monotonic()
+        # 当前步骤，失败时据此归类（open: 点击等待弹窗，load: 加载详情页，extract: 提取正文）
+        step = 'open'
         try:
-            # 监听新页面打开
-            async with context.expect_page() as new_page_info:
-                # 点击对应的行
-                try:
-                    row_selector = f'tr[id="{case_data["row_id"]}"]'
-                    if await main_page.locator(row_selector).count() > 0:
-                        await main_page.click(row_selector)
-                        print(f"  点击行: {case_data['row_id']}")
-                    else:
-                        # 备选：通过案号查找
-                        case_number_text = case_data['case_number'].replace('(', '\\(').replace(')', '\\)')
-                        text_selector = f'text="{case_number_text}"'
-                        if await main_page.locator(text_selector).count() > 0:
-                            await main_page.click(text_selector)
-                            print(f"  点击案号文本: {case_data['case_number']}")
-                except Exception as e:
-                    print(f"  点击失败: {e}")
-                    # 直接访问URL
+            # 多个worker共用主页面，打开弹窗这一步需要加锁串行
+            async with self._popup_lock:
+                trace.record('popup_lock', open_started)
+                if self.displayed_pages.get(main_page, case_data['page_number']) != case_data['page_number']:
+                    # 列表已经翻到后面的页，这一行不在主页面上了，直接打开详情URL
+                    step = 'load'
                     detail_page = await context.new_page()
                     await detail_page.goto(case_data['detail_url'], timeout=30000)
+                    print("  列表已翻页，直接打开详情URL")
+                else:
+                    # 监听新页面打开
+                    async with context.expect_page() as new_page_info:
+                        # 点击对应的行
+                        try:
+                            row_selector = f'tr[id="{case_data["row_id"]}"]'
+                            if await main_page.locator(row_selector).count() > 0:
+                                await main_page.click(row_selector)
+                                print(f"  点击行: {case_data['row_id']}")
+                            else:
+                                # 备选：通过案号查找
+                                case_number_text = case_data['case_number'].replace('(', '\\(').replace(')', '\\)')
+                                text_selector = f'text="{case_number_text}"'
+                                if await main_page.locator(text_selector).count() > 0:
+                                    await main_page.click(text_selector)
+                                    print(f"  点击案号文本: {case_data['case_number']}")
+                        except Exception as e:
+                            print(f"  点击失败: {e}")
+                            # 直接访问URL
+                            step = 'load'
+                            detail_page = await context.new_page()
+                            await detail_page.goto(case_data['detail_url'], timeout=30000)
+                    
+                    # 获取新页面
+                    if not detail_page:
+                        detail_page = await new_page_info.value
             
-            # 获取新页面
-            if not detail_page:
-                detail_page = await new_page_info.value
-            
-            # 等待详情页加载
-            await detail_page.wait_for_load_state('networkidle', timeout=15000)
-            await self.random_delay(0.5, 1.5)
+            # 等待详情页文档加载（正文就绪在extract_detail_content中等待）
+            step = 'load'
+            await detail_page.wait_for_load_state('domcontentloaded', timeout=15000)
+            # 含等待弹窗锁的时间
+            self.metrics.observe('detail_open', time.monotonic() - open_started)
+            trace.record('detail_open', open_started)
             
             # 提取详情内容
-            detail_content = await self.extract_detail_content(detail_page)
+            step = 'extract'
+            with self.stage('detail_extract', trace):
+                detail_content = await self.extract_detail_content(detail_page)
             
             # 合并数据
             full_data = {**case_data, **detail_content}
@@ -401,161 +417,619 @@ class FixedAsyncCourtCrawler:
             return full_data
             
         except Exception as e:
-            print(f"❌ 详情页失败: {str(e)[:100]}")
+            kind = classify_failure(e, step)
+            print(f"❌ 详情页失败（{kind}）: {str(e)[:100]}")
             self.stats['failed'] += 1
-            return None
+            self.metrics.inc('errors', stage='detail', kind=kind)
+            raise DetailFailure(kind, str(e)[:200]) from e
         finally:
             if detail_page:
                 await detail_page.close()
     
-    async def extract_detail_content(self, page):
-        """提取详情页内容"""
+    async def fetch_detail_http(self, context, case_data, main_page, trace=NULL_TRACE):
+        """通过浏览器上下文的HTTP客户端直接获取详情页，失败返回None"""
         try:
-            # 等待内容加载
-            await page.wait_for_timeout(2000)
-            
-            # 获取页面内容
-            content = await page.content()
-            
-            # 简单提取文本
-            text = await page.locator('body').inner_text()
-            cleaned_text = ' '.join(text.split())  # 合并多余空格
+            with self.stage('detail_http', trace):
+                html, text, url = await fetch_detail(
+                    self.har_request or context.request,
+                    case_data['detail_url'],
+                    referer=main_page.url
+                )
+            # 正文已解码，按UTF-8估算字节数
+            self.metrics.inc('bytes', len(html.encode('utf-8')), kind='detail_http')
+            with self.stage('detail_extract', trace):
+                parsed = await self.parse_detail(text)
+            with self.stage('archive', trace):
+                digest = await self.archive_html(html)
             
             return {
-                'detail_text': cleaned_text[:5000] + '...' if len(cleaned_text) > 5000 else cleaned_text,
-                'detail_url': page.url,
-                'detail_fetched_at': datetime.now().isoformat(),
-                'content_length': len(content)
+                **parsed,
+                'html_sha256': digest,
+                'detail_url': url,
+                'detail_fetched_at': datetime.now().isoformat()
             }
         except Exception as e:
-            print(f"  详情内容提取失败: {e}")
-            return {}
+            print(f"  ⚠️ 直连详情页失败: {str(e)[:100]}")
+            return None
     
-    async def save_data(self):
-        """保存数据"""
-        if not self.all_cases:
-            print("⚠️ 无数据可保存")
+    async def parse_detail(self, text):
+        """在进程池中解析详情正文（完整正文 + 当事人/审理经过/查明认定/裁判结果/落款）"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.parse_pool, parse_detail_text, text)
+    
+    async def process_case(self, worker_id, case, context, main_page, retries, on_done=None):
+        """
+        抓取并写出一篇文书，记录写出后即释放，不在内存中保留
+        失败的文书交给重试队列；on_done(case)在文书最终处理结束（成功、跳过或写入死信）后调用
+        """
+        trace = NULL_TRACE
+        status = 'failed'
+        try:
+            if self.tracer:
+                trace = await self.tracer.start_case(case, worker_id, context)
+            async with self.detail_slot():
+                with self.stage('rate_wait', trace):
+                    await self.rate_limiter.acquire()
+                print(f"\n[W{worker_id}] {case['case_number']} (第{case['page_number']}页)")
+                
+                request_started = time.monotonic()
+                try:
+                    detail_data = await self.crawl_detail_page(context, case, main_page, trace)
+                except DetailFailure as e:
+                    await self.record_pacing(failure=e.kind)
+                    raise
+                await self.record_pacing(time.monotonic() - request_started)
+            if detail_data:
+                self.stats['saved'] += 1
+                with self.stage('save', trace):
+                    # 立即追加到JSONL（后台写盘，不阻塞事件循环）
+                    await self.writer.write(detail_data)
+                    self.mark_first('first_record_sec')
+                    if self.record_sink:
+                        await self.record_sink.write(detail_data)
+                    if self.parquet:
+                        await self.parquet.write(detail_data)
+                    self.checkpoint.mark_done(detail_data)
+                    if self.known_index:
+                        self.known_index.add(detail_data)
+                self.metrics.inc('records', result='saved')
+                status = 'saved'
+                print(f"  [W{worker_id}] 已保存 (累计: {self.stats['saved']}/{self.max_cases})")
+        except DetailFailure as e:
+            status = await retries.failed(case, e.kind, str(e))
+        except Exception as e:
+            status = 'error'
+            print(f"❌ [W{worker_id}] 处理异常: {str(e)[:100]}")
+        finally:
+            if self.tracer:
+                await self.tracer.finish_case(trace, status)
+            # 安排了重试的文书仍然算在处理中
+            if status != 'retry':
+                retries.forget(case)
+                self.in_flight -= 1
+                if on_done:
+                    on_done(case)
+    
+    @asynccontextmanager
+    async def detail_slot(self):
+        """自适应限速开启时，同时抓取详情的worker数不超过控制器当前的并发数"""
+        if not self.pacing:
+            yield
             return
+        async with self.pacing.slot():
+            yield
+    
+    async def record_pacing(self, latency=None, failure=None):
+        """把详情请求的耗时或失败类型反馈给自适应限速"""
+        if self.pacing:
+            await self.pacing.observe(latency, failure)
+    
+    async def detail_worker(self, worker_id, queue, context, main_page, retries, on_done=None):
+        """详情页worker：从队列中取文书，在全局限速下抓取详情"""
+        while True:
+            case = await queue.get()
+            try:
+                await self.process_case(worker_id, case, context, main_page, retries, on_done)
+            finally:
+                queue.task_done()
+    
+    async def retry_worker(self, worker_id, retries, context, main_page, on_done=None):
+        """重试worker：退避时间到了的失败文书在这里重新抓取，不占用主队列"""
+        while True:
+            case = await retries.next_due()
+            try:
+                await self.process_case(worker_id, case, context, main_page, retries, on_done)
+            finally:
+                await retries.task_done()
+    
+    def new_retry_queue(self):
+        return RetryQueue(self.dead_letters, max_attempts=self.max_attempts,
+                          base_delay=self.retry_base_delay, metrics=self.metrics)
+    
+    async def extract_detail_content(self, page):
+        """
+        提取详情页内容
+        正文没有达到最小长度（错误页、没渲染出来）时抛出DetailFailure(EMPTY_CONTENT)，
+        其他异常（如超时）原样抛出，由crawl_detail_page归类后安排重试
+        """
+        # 等待正文达到最小长度
+        if not await self.readiness.wait_for_detail_text(page):
+            raise DetailFailure(EMPTY_CONTENT, "详情正文未达到最小长度")
         
-        print("💾 保存数据...")
+        # 取正文（保留换行，结构化解析依赖行结构），解析交给进程池
+        text = await page.locator('body').inner_text()
+        if len(text.strip()) < MIN_DETAIL_TEXT:
+            raise DetailFailure(EMPTY_CONTENT, f"详情正文只有{len(text.strip())}字")
+        parsed = await self.parse_detail(text)
+        html = await page.content() if self.archive else ''
         
+        return {
+            **parsed,
+            'html_sha256': await self.archive_html(html),
+            'detail_url': page.url,
+            'detail_fetched_at': datetime.now().isoformat()
+        }
+    
+    async def archive_html(self, html):
+        """把详情页HTML存入归档（在线程池中压缩和写盘），返回sha256；未启用归档或保存失败时返回空字符串"""
+        if not self.archive or not html:
+            return ''
         try:
-            # 保存JSON
-            with open(self.json_file, 'w', encoding='utf-8') as f:
-                json.dump(self.all_cases, f, ensure_ascii=False, indent=2)
-            print(f"   JSON: {self.json_file}")
-            
-            # 保存CSV
-            df = pd.DataFrame(self.all_cases)
-            df.to_csv(self.csv_file, index=False, encoding='utf-8-sig')
-            print(f"   CSV: {self.csv_file}")
-            
-            # 保存简版CSV（不含长文本）
-            if 'detail_text' in df.columns:
-                simple_df = df.drop(columns=['detail_text'])
-                simple_file = self.csv_file.with_name(f"简版_{self.csv_file.name}")
-                simple_df.to_csv(simple_file, index=False, encoding='utf-8-sig')
-                print(f"   简版CSV: {simple_file}")
-                
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(None, self.archive.put, html)
         except Exception as e:
-            print(f"❌ 保存失败: {e}")
+            print(f"  ⚠️ HTML归档失败: {str(e)[:80]}")
+            return ''
     
-    async def run(self, start_url):
-        """主运行流程"""
-        print("=" * 50)
-        print("上海市高级人民法院文书抓取（修复翻页检测版）")
-        print("=" * 50)
+    async def save_data(self):
+        """生成JSON/CSV快照（从增量JSONL构建，只在结束时或按需调用）"""
+        # 先把后台写入任务中的记录全部落盘，之后再有写入会自动重新打开文件
+        await self.writer.close()
         
-        playwright = None
-        browser = None
+        print("💾 生成数据快照...")
         
         try:
-            # 启动浏览器
-            playwright = await async_playwright().start()
-            browser = await playwright.chromium.launch(
-                headless=self.headless,
-                args=['--start-maximized']
+            loop = asyncio.get_running_loop()
+            outputs = await loop.run_in_executor(
+                None, build_snapshots, self.jsonl_file, self.json_file, self.csv_file
             )
-            context = await browser.new_context(
-                viewport={'width': 1200, 'height': 800}
-            )
-            
-            # 打开页面
-            page = await context.new_page()
-            print(f"🌐 访问: {start_url}")
-            await page.goto(start_url, timeout=30000)
-            
-            # 提交搜索
-            if not await self.submit_search(page):
-                print("❌ 搜索失败，程序结束")
+            if not outputs:
+                print("⚠️ 无数据可保存")
                 return
             
-            current_page = 1
-            total_processed = 0
+            print(f"   JSONL: {self.jsonl_file}")
+            for output in outputs:
+                print(f"   快照: {output}")
+                
+        except Exception as e:
+            print(f"❌ 保存失败: {e}")
+    
+    def mark_first(self, key):
+        """记录某个阶段第一次发生距run开始的秒数"""
+        if self._started is not None and self.stats[key] is None:
+            self.stats[key] = round(time.monotonic() - self._started, 2)
+            print(f"⏱️ {key}: {self.stats[key]}秒")
+    
+    async def launch_browser(self, playwright):
+        """配置了常驻浏览器时通过CDP连接，否则启动新的Chromium"""
+        if self.browser_endpoint:
+            try:
+                browser = await playwright.chromium.connect_over_cdp(self.browser_endpoint)
+                print(f"🔥 已连接常驻浏览器: {self.browser_endpoint}")
+                return browser
+            except Exception as e:
+                print(f"⚠️ 连接常驻浏览器失败，改为启动新浏览器: {str(e)[:100]}")
+        return await playwright.chromium.launch(
+            headless=self.headless,
+            args=['--start-maximized']
+        )
+    
+    async def save_storage_state(self, context):
+        """保存会话状态，下次运行新建上下文时直接带上cookie"""
+        if not self.storage_state_file:
+            return
+        try:
+            await context.storage_state(path=str(self.storage_state_file))
+            print(f"💾 会话状态已保存: {self.storage_state_file}")
+        except Exception as e:
+            print(f"⚠️ 保存会话状态失败: {e}")
+    
+    async def open_search_page(self, browser, start_url, query=None):
+        """新建浏览器上下文，打开列表页并提交搜索，返回 (context, page)，搜索失败时page为None"""
+        storage_state = None
+        if self.storage_state_file and self.storage_state_file.exists():
+            storage_state = str(self.storage_state_file)
+        context_options = {}
+        if self.har_record_dir:
+            # .zip格式：响应正文作为附件保存，HAR在context.close()时写出
+            self.har_record_dir.mkdir(parents=True, exist_ok=True)
+            har_path = self.har_record_dir / f"record_{self.run_timestamp}_{len(self.contexts) + 1:02d}.har.zip"
+            context_options['record_har_path'] = str(har_path)
+            print(f"📼 录制HAR: {har_path}")
+        context = await browser.new_context(
+            viewport={'width': 1200, 'height': 800},
+            storage_state=storage_state,
+            **context_options
+        )
+        self.contexts.append(context)
+        if self.har_replay:
+            # 回放时所有请求都由HAR响应，资源拦截也不需要
+            await attach_har_replay(context, self.har_replay)
+        elif self.blocker:
+            await self.blocker.attach(context)
+        
+        # 打开页面
+        page = await context.new_page()
+        if self.blocker:
+            self.blocker.set_page_type(page, 'list')
+        if self.capture_list_payload:
+            self.list_captures[page] = ListPayloadCapture()
+            self.list_captures[page].attach(page)
+        print(f"🌐 访问: {start_url}")
+        with self.metrics.time_stage('goto'):
+            await page.goto(start_url, timeout=30000)
+        
+        # 提交搜索
+        if not await self.submit_search(page, query):
+            return context, None
+        return context, page
+    
+    async def crawl_pages(self, context, page, start_page=1, end_page=None, label=""):
+        """
+        从当前所在的start_page开始逐页处理，直到end_page（含）、没有下一页或达到目标数量
+        列表页作为生产者把文书放入有界队列，详情页worker消费并写出记录：
+        队列满时列表翻页等待（背压），内存占用只与队列长度有关，与文书总数无关
+        返回页码范围是否处理完（处理到end_page或已经没有下一页），达到目标数量或中途出错时返回False
+        """
+        tag = f"[{label}] " if label else ""
+        
+        # 每页尚未处理完的文书数，断点只记录到最早还有未完成文书的页
+        outstanding = {}
+        
+        def case_done(case):
+            page_num = case['page_number']
+            outstanding[page_num] -= 1
+            if not outstanding[page_num]:
+                del outstanding[page_num]
+        
+        # 启动详情页worker池，列表页提取结果通过有界队列分发；失败的文书由单独的重试worker处理
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        retries = self.new_retry_queue()
+        workers = [
+            asyncio.create_task(self.detail_worker(f"{label}{n + 1}", queue, context, page, retries, case_done))
+            for n in range(self.concurrency)
+        ]
+        workers.append(asyncio.create_task(self.retry_worker(f"{label}R", retries, context, page, case_done)))
+        print(f"👷 {tag}启动 {self.concurrency} 个详情页worker（队列上限 {self.queue_size}）和 1 个重试worker")
+        
+        finished = False
+        try:
+            current_page = start_page
+            self.displayed_pages[page] = current_page
             
-            while total_processed < self.max_cases:
-                print(f"\n📄 处理第 {current_page} 页")
-                print(f"当前累计处理: {total_processed}/{self.max_cases}")
+            while self.checkpoint.done_count < self.max_cases:
+                print(f"\n📄 {tag}处理第 {current_page} 页")
+                print(f"当前累计处理: {self.checkpoint.done_count}/{self.max_cases}")
                 
-                # 等待页面稳定
-                if current_page > 1:
-                    print("🔄 等待翻页后页面稳定...")
-                    await self.random_delay(3, 4)
+                self.checkpoint.record_page(min(outstanding, default=current_page))
                 
                 # 提取当前页文书
                 cases = await self.extract_case_data(page, current_page)
                 
                 if not cases:
-                    print("⚠️ 未提取到文书数据")
+                    print(f"⚠️ {tag}未提取到文书数据")
                     break
                 
-                # 计算本页需要处理多少文书
-                remaining = self.max_cases - total_processed
-                cases_to_process = cases[:remaining]
+                # 跳过以前已抓取过的文书，以及断点前已完成的文书
+                known_filtered = self.filter_known(cases)
+                pending = [case for case in known_filtered if not self.checkpoint.is_done(case)]
+                if len(pending) < len(known_filtered):
+                    print(f"⏭️ 跳过 {len(known_filtered) - len(pending)} 个断点前已完成的文书")
                 
-                print(f"📊 本页处理 {len(cases_to_process)} 个文书 (剩余需求: {remaining})")
+                # 计算本页需要处理多少文书（扣除已分发、尚未完成的，包括其他分片的）
+                remaining = max(0, self.max_cases - self.checkpoint.done_count - self.in_flight)
+                cases_to_process = pending[:remaining]
                 
-                # 抓取详情页
-                for i, case in enumerate(cases_to_process):
-                    print(f"\n[{total_processed + i + 1}/{self.max_cases}] {case['case_number']} (第{current_page}页)")
-                    
-                    detail_data = await self.crawl_detail_page(context, case, page)
-                    if detail_data:
-                        self.all_cases.append(detail_data)
-                        total_processed += 1
-                        print(f"  已保存到列表 (累计: {total_processed}/{self.max_cases})")
-                    
-                    # 每抓取2个就保存一次（避免丢失数据）
-                    if (total_processed % 2 == 0) and total_processed > 0:
-                        await self.save_data()
-                    
-                    # 延迟（避免请求过快）
-                    if total_processed < self.max_cases:
-                        delay = random.uniform(2, 4)
-                        print(f"  等待 {delay:.1f}秒...")
-                        await asyncio.sleep(delay)
+                print(f"📊 {tag}本页处理 {len(cases_to_process)} 个文书 (剩余需求: {remaining})")
+                
+                # 放入有界队列，队列满时在这里等待worker（背压），不会提前翻页
+                for case in cases_to_process:
+                    self.in_flight += 1
+                    outstanding[current_page] = outstanding.get(current_page, 0) + 1
+                    with self.metrics.time_stage('queue_wait'):
+                        await queue.put(case)
+                
+                # 只能点击打开详情时，worker点击的是本页的行，翻页前必须等本页全部完成；
+                # 直连模式下worker不依赖主页面，本页剩余文书留在队列中，列表继续翻页
+                if not self.http_detail:
+                    await queue.join()
                 
                 # 更新进度
-                self.stats['pages'] = current_page
+                self.stats['pages'] += 1
                 
-                # 检查是否还需要继续翻页
-                if total_processed >= self.max_cases:
+                # 已分发的文书足够时，等worker和重试处理完再判断（写入死信的文书不计入完成数）
+                if self.checkpoint.done_count + self.in_flight >= self.max_cases:
+                    await queue.join()
+                    await retries.join()
+                if self.checkpoint.done_count >= self.max_cases:
                     print(f"✅ 已达到目标数量 {self.max_cases}")
                     break
+                if end_page and current_page >= end_page:
+                    print(f"✅ {tag}分片页码范围已处理完 (至第{end_page}页)")
+                    finished = True
+                    break
                 
-                # 尝试翻页
-                print(f"\n🔄 尝试翻页到第{current_page + 1}页...")
+                # 尝试翻页（先标记为翻页中，之后的点击回退不再点击主页面上的行）
+                print(f"\n🔄 {tag}尝试翻页到第{current_page + 1}页...")
+                async with self._popup_lock:
+                    self.displayed_pages[page] = None
+                await self.rate_limiter.acquire()
                 success, new_page = await self.check_and_go_next_page(page, current_page)
                 
                 if success:
                     current_page = new_page
-                    print(f"✅ 成功翻页到第{current_page}页")
+                    self.displayed_pages[page] = current_page
+                    print(f"✅ {tag}成功翻页到第{current_page}页")
                 else:
-                    print("❌ 翻页失败，停止抓取")
+                    total_pages = self.pager_for(page).total_pages
+                    if total_pages and current_page >= total_pages:
+                        print(f"✅ {tag}已是最后一页 (共{total_pages}页)")
+                        finished = True
+                    else:
+                        print(f"❌ {tag}翻页失败，停止抓取")
                     break
             
-            # 最终保存
-            await self.save_data()
+            # 等队列中剩余的文书和待重试的文书处理完，之后前面各页都已完成，断点记到最后处理的页
+            await queue.join()
+            await retries.join()
+            self.checkpoint.record_page(current_page)
+            return finished
+        finally:
+            # 停止worker
+            for worker in workers:
+                worker.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+            self.displayed_pages.pop(page, None)
+            self.stats['dead'] += retries.dead
+    
+    async def crawl_dead_letters(self, context, page):
+        """
+        只重放死信文件中的文书：搜索页只用来建立会话，不翻列表页，
+        文书直接放入队列（不点击列表行，直接请求/打开详情URL），再次失败的写入新的死信文件
+        """
+        cases = take_dead_letters(self.dead_letters.path)
+        cases = [case for case in self.filter_known(cases) if not self.checkpoint.is_done(case)]
+        cases = cases[:self.max_cases]
+        if not cases:
+            print("📮 没有需要重放的死信文书")
+            return
+        
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        retries = self.new_retry_queue()
+        workers = [
+            asyncio.create_task(self.detail_worker(f"D{n + 1}", queue, context, page, retries))
+            for n in range(self.concurrency)
+        ]
+        workers.append(asyncio.create_task(self.retry_worker("DR", retries, context, page)))
+        # 主页面上没有这些文书的行
+        self.displayed_pages[page] = None
+        print(f"📮 重放 {len(cases)} 篇死信文书")
+        
+        try:
+            for case in cases:
+                self.in_flight += 1
+                await queue.put(case)
+            await queue.join()
+            await retries.join()
+        finally:
+            for worker in workers:
+                worker.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+            self.displayed_pages.pop(page, None)
+            self.stats['dead'] += retries.dead
+    
+    async def crawl_shard(self, browser, start_url, start_page, end_page, label, context=None, page=None):
+        """处理一个页码分片：独立的浏览器上下文，用goPage(n)直接跳到起始页，返回分片是否处理完"""
+        if page is None:
+            context, page = await self.open_search_page(browser, start_url)
+            if not page:
+                print(f"❌ [{label}] 搜索失败，分片 {start_page}-{end_page} 未处理")
+                return False
+        
+        if start_page > 1:
+            await self.rate_limiter.acquire()
+            if not await self.jump_to_page(page, start_page):
+                print(f"❌ [{label}] 无法跳到第{start_page}页，分片 {start_page}-{end_page} 未处理")
+                return False
+        
+        return await self.crawl_pages(context, page, start_page, end_page, label=label)
+    
+    async def count_results(self, page, start_url, query):
+        """在page上按query重新搜索并读取结果数，读不到时返回-1"""
+        await page.goto(start_url, timeout=30000)
+        if not await self.submit_search(page, query):
+            return -1
+        
+        count = await page.evaluate(RESULT_COUNT_SCRIPT)
+        if count >= 0:
+            return count
+        
+        # 页面上没有“共N条”时按 总页数 x 本页行数 估算
+        rows_count = await page.locator('tr[id^="tr"]').count()
+        if rows_count == 0:
+            return 0
+        pager = PaginationPlanner(self.readiness)
+        await pager.plan(page)
+        return max(pager.total_pages, 1) * rows_count
+    
+    async def crawl_partition(self, browser, start_url, query, label, semaphore):
+        """用独立的浏览器上下文抓取一个查询分区的全部页面"""
+        async with semaphore:
+            if self.checkpoint.done_count >= self.max_cases:
+                return
+            context, page = await self.open_search_page(browser, start_url, query)
+            try:
+                if not page:
+                    print(f"❌ [{label}] 搜索失败，分区 {query.label()} 未处理")
+                    return
+                await self.crawl_pages(context, page, label=label)
+            finally:
+                self.list_captures.pop(page, None)
+                self.pagers.pop(page, None)
+                await context.close()
+    
+    async def crawl_partitions(self, browser, start_url, page):
+        """按查询分区配置切分搜索，再并行抓取各个分区"""
+        options = self.partitions
+        windows = initial_windows(options.get('categories'), options['date_from'], options['date_to'])
+        print(f"🗂️ 切分查询空间: {len(windows)} 个案件类别，{options['date_from']} ~ {options['date_to']}")
+        
+        planner = QueryPlanner(
+            lambda query: self.count_results(page, start_url, query),
+            max_results=options.get('max_results', DEFAULT_MAX_RESULTS)
+        )
+        partitions = await planner.plan(windows)
+        
+        semaphore = asyncio.Semaphore(self.shards)
+        tasks = [
+            self.crawl_partition(browser, start_url, query, f"Q{i + 1}-", semaphore)
+            for i, (query, _) in enumerate(partitions)
+        ]
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+        for (query, _), result in zip(partitions, results):
+            if isinstance(result, Exception):
+                print(f"❌ 分区 {query.label()} 异常: {str(result)[:200]}")
+    
+    async def crawl_sharded(self, browser, start_url, context, page):
+        """读取总页数，把页码范围切分给多个浏览器上下文并行处理"""
+        pager = self.pager_for(page)
+        await pager.plan(page)
+        total_pages = pager.total_pages
+        shards = min(self.shards, total_pages)
+        if shards <= 1:
+            print(f"ℹ️ 总页数 {total_pages}，不需要分片")
+            await self.crawl_pages(context, page)
+            return
+        
+        # 连续切分，前面的分片多分一页
+        size, extra = divmod(total_pages, shards)
+        ranges = []
+        first = 1
+        for i in range(shards):
+            last = first + size - 1 + (1 if i < extra else 0)
+            ranges.append((first, last))
+            first = last + 1
+        print(f"🧩 共 {total_pages} 页，分成 {shards} 个分片: {ranges}")
+        
+        # 第一个分片直接使用已经提交过搜索的页面
+        tasks = []
+        for i, (first, last) in enumerate(ranges):
+            if i == 0:
+                tasks.append(self.crawl_shard(browser, start_url, first, last, f"S{i + 1}-", context, page))
+            else:
+                tasks.append(self.crawl_shard(browser, start_url, first, last, f"S{i + 1}-"))
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+        for i, result in enumerate(results):
+            if isinstance(result, Exception):
+                print(f"❌ 分片S{i + 1}异常: {str(result)[:200]}")
+    
+    async def count_pages(self, start_url):
+        """只提交搜索并读取总页数，不抓取文书（协调器切分工作单元时使用）"""
+        playwright = await async_playwright().start()
+        browser = None
+        try:
+            browser = await self.launch_browser(playwright)
+            if self.block_resources:
+                self.blocker = ResourceBlocker(start_url, self.resource_rules)
+            
+            context, page = await self.open_search_page(browser, start_url)
+            if not page:
+                return 0
+            pager = self.pager_for(page)
+            await pager.plan(page)
+            return pager.total_pages
+        finally:
+            if browser:
+                await browser.close()
+            await playwright.stop()
+    
+    async def run(self, start_url, page_range=None, browser=None):
+        """
+        主运行流程
+        page_range: (起始页, 结束页)，只抓取这个页码范围（协调器分配的工作单元），
+                    处理完后self.range_finished为True
+        browser: 调用方管理的共享浏览器（常驻服务），不传时自己启动或连接
+        返回是否正常完成：搜索失败或运行异常时返回False（异常信息记在stats['error']）
+        """
+        print("=" * 50)
+        print("上海市高级人民法院文书抓取（修复翻页检测版）")
+        print("=" * 50)
+        
+        playwright = None
+        shared_browser = browser is not None
+        metrics_server = None
+        self._started = time.monotonic()
+        self.range_finished = False
+        ok = False
+        
+        self.detail_base_url = urljoin(start_url, '../web/flws_view.jsp')
+        
+        # 断点日志（按查询区分，死信重放单独一份），恢复时沿用上次的输出文件
+        self.checkpoint = CrawlCheckpoint(self.output_dir, f"{start_url}#retry-dead" if self.retry_dead else start_url)
+        resumed = self.checkpoint.start(self.resume, self.jsonl_file)
+        if resumed:
+            self.jsonl_file = Path(self.checkpoint.output_file)
+            self.json_file = self.jsonl_file.with_suffix('.json')
+            self.csv_file = self.jsonl_file.with_suffix('.csv')
+            self.writer = JsonlCaseWriter(self.jsonl_file)
+            print(f"♻️ 从断点恢复: 第{self.checkpoint.page}页，已完成 {self.checkpoint.done_count} 个文书")
+        
+        try:
+            self.parse_pool = ProcessPoolExecutor(max_workers=self.parse_workers)
+            if self.metrics_port:
+                try:
+                    metrics_server = await serve_metrics(self.metrics, port=self.metrics_port)
+                except OSError as e:
+                    print(f"⚠️ 指标端点启动失败: {e}")
+            
+            # 启动浏览器（或连接常驻浏览器）
+            if not shared_browser:
+                playwright = await async_playwright().start()
+                browser = await self.launch_browser(playwright)
+            if self.block_resources:
+                self.blocker = ResourceBlocker(start_url, self.resource_rules)
+            
+            context, page = await self.open_search_page(browser, start_url)
+            if not page:
+                print("❌ 搜索失败，程序结束")
+                self.stats['error'] = "搜索失败"
+                return False
+            await self.save_storage_state(context)
+            
+            if self.retry_dead:
+                await self.crawl_dead_letters(context, page)
+            elif page_range:
+                # 协调器分配的页码范围，断点恢复时从断点页继续
+                first_page, last_page = page_range
+                if resumed and first_page < self.checkpoint.page <= last_page:
+                    first_page = self.checkpoint.page
+                self.range_finished = await self.crawl_shard(browser, start_url, first_page, last_page,
+                                                             f"P{page_range[0]}-", context, page)
+            elif self.partitions:
+                # 查询分区模式：已完成的文书按断点日志跳过
+                await self.crawl_partitions(browser, start_url, page)
+            elif self.shards > 1:
+                # 分片模式：已完成的文书按断点日志跳过，不再跳回断点页
+                await self.crawl_sharded(browser, start_url, context, page)
+            else:
+                current_page = 1
+                if resumed and self.checkpoint.page > 1:
+                    await self.rate_limiter.acquire()
+                    if await self.jump_to_page(page, self.checkpoint.page):
+                        current_page = self.checkpoint.page
+                    else:
+                        print("⚠️ 无法跳回断点页，从第1页开始（已完成的文书会被跳过）")
+                await self.crawl_pages(context, page, current_page)
             
             # 统计信息
             self.stats['end'] = datetime.now().isoformat()
@@ -566,37 +1040,129 @@ class FixedAsyncCourtCrawler:
             print("\n" + "=" * 50)
             print("✅ 抓取完成！")
             print(f"   发现文书总数: {self.stats['total']}")
-            print(f"   处理页数: {self.stats['pages']}")
+            print(f"   处理页数: {self.stats['pages']} (数据响应解析: {self.stats['list_from_payload']}, DOM提取: {self.stats['list_from_dom']})")
             print(f"   成功抓取: {self.stats['success']}")
-            print(f"   失败: {self.stats['failed']}")
+            print(f"   失败: {self.stats['failed']} 次，写入死信: {self.stats['dead']} 篇")
+            if self.stats['dead']:
+                print(f"   死信文件: {self.dead_letters.path}（用 --retry-dead 重放）")
+            if self.known_index:
+                print(f"   已知文书跳过: {self.stats['known_hit']} (新文书: {self.stats['known_miss']})")
+            if self.blocker:
+                print(f"   资源拦截: {self.blocker.summary()}")
+            if self.pacing:
+                pacing = self.pacing.summary()
+                print(f"   自适应限速: 最终 {pacing['rate']} 次/秒（上限 {pacing['max_rate']}，"
+                      f"区间 {pacing['lowest_rate']}~{pacing['highest_rate']}），并发 {pacing['concurrency']}，"
+                      f"上调 {pacing['increases']} 次，下调 {pacing['decreases']} 次")
+            if self.http_detail:
+                print(f"   直连抓取: {self.stats['http_detail']} (回退点击: {self.stats['http_fallback']})")
             print(f"   目标数量: {self.max_cases}")
-            print(f"   实际抓取: {len(self.all_cases)}")
+            print(f"   实际抓取: {self.stats['saved']}")
+            if resumed:
+                print(f"   累计完成（含断点前）: {self.checkpoint.done_count}")
             print(f"   耗时: {duration:.1f}秒")
+            self.metrics.print_summary()
+            if self.tracer:
+                print(f"   追踪: 写出 {self.tracer.written} 篇，慢文书 {self.tracer.slow_cases} 篇 ({self.tracer.path})")
+            print(f"   首页文书行: {self.stats['first_rows_sec']}秒，首条记录: {self.stats['first_record_sec']}秒")
             print(f"   输出目录: {self.output_dir}")
             print("=" * 50)
+            ok = True
             
         except Exception as e:
+            self.stats['error'] = str(e)[:200]
             print(f"\n❌ 程序运行异常: {str(e)[:200]}")
             import traceback
             traceback.print_exc()
         finally:
             # 清理资源
-            if browser:
+            if self.parse_pool:
+                self.parse_pool.shutdown(wait=False)
+                self.parse_pool = None
+            # 先逐个关闭本次创建的上下文（录制的HAR在这一步写出），
+            # 共享浏览器由调用方管理，不再关闭浏览器本身
+            for context in self.contexts:
+                try:
+                    await context.close()
+                except Exception:
+                    pass
+            if browser and not shared_browser:
+                # 连接的常驻浏览器只会关闭本次创建的上下文并断开连接
                 await browser.close()
             if playwright:
                 await playwright.stop()
             
-            # 最后保存一次
-            if self.all_cases:
-                await self.save_data()
+            # 最后生成一次快照（异常退出时JSONL中已有的数据也不会丢）
+            await self.save_data()
+            if self.parquet:
+                await self.parquet.close()
+                print(f"   Parquet: {self.parquet.root_dir} ({self.parquet.rows_written} 条)")
+            self.checkpoint.close()
+            if self.known_index and self.known_index not in self._shared_state:
+                self.known_index.close()
+            elif self.known_index:
+                # 共享的索引由调用方关闭，这里只提交本次缓存的文书
+                self.known_index.flush()
+            if self.dead_letters not in self._shared_state:
+                self.dead_letters.close()
+            if self.archive and self.archive not in self._shared_state:
+                print(f"   HTML归档: {self.archive.root_dir} (新增 {self.archive.stored} 篇，重复 {self.archive.deduplicated} 篇)")
+                self.archive.close()
+            if self.tracer:
+                self.tracer.close()
+            
+            # 指标JSON汇总
+            extra = {'stats': self.stats}
+            if self.blocker:
+                extra['resource_blocker'] = self.blocker.stats
+            if self.pacing:
+                extra['pacing'] = self.pacing.summary()
+            self.metrics.save_json(self.metrics_file, extra)
+            print(f"   指标汇总: {self.metrics_file}")
+            if metrics_server:
+                metrics_server.close()
+        return ok
 
 async def main():
     """主函数"""
+    parser = argparse.ArgumentParser(description="上海市高级人民法院文书抓取")
+    parser.add_argument('--resume', action='store_true', help="从上次中断的列表页继续抓取，跳过已完成的文书")
+    parser.add_argument('--record-har', metavar='DIR', help="把本次抓取的网络请求录制为HAR，保存到DIR")
+    parser.add_argument('--replay-har', metavar='PATH', help="从HAR文件或录制目录回放，不访问网络")
+    parser.add_argument('--retry-dead', action='store_true', help="只重放死信文件（多次失败的文书），不翻列表页")
+    args = parser.parse_args()
+    
     config = {
         'start_url': 'https://www.hshfy.sh.cn/shfy/gweb2017/flws_list_new.jsp?ajlb=aYWpsYj3QzMrCz',
         'headless': False,  # 调试时设为False
         'max_cases': 30,    # 测试用30个，会自动翻页
-        'output_dir': '最终抓取测试'
+        'output_dir': '最终抓取测试',
+        'concurrency': 3,   # 详情页worker数量
+        'queue_size': None, # 列表页与worker之间的队列上限，默认concurrency*2，队列满时列表翻页等待
+        'max_attempts': 3,  # 每篇文书最多尝试次数，失败后指数退避重试，仍失败的写入死信文件
+        'retry_dead': args.retry_dead,
+        'max_rate': 0.5,    # 全局请求上限（每秒请求数），自适应限速不会超过它
+        # 自适应限速：响应正常时缓慢提速，出错/超时/变慢时减半（速率和并发），None为固定max_rate
+        'adaptive': {'min_rate': 0.05, 'increase': 0.05, 'window': 10},
+        'http_detail': True, # 详情页直接HTTP请求（失败时自动回退到点击打开）
+        'resume': args.resume,
+        'block_resources': True,
+        # 按页面类型覆盖拦截规则，例如某类页面需要脚本渲染时：{'detail': {'enabled': False}}
+        'resource_rules': None,
+        'parquet_output': True, # 按结案年月分区的Parquet输出（需要pyarrow，未安装时自动跳过）
+        'shards': 1,            # 列表页分片数（多个浏览器上下文并行翻页），共享max_rate限速
+        # 查询分区，例如：{'categories': [], 'date_from': '2020-01-01', 'date_to': '2024-12-31',
+        #                  'max_results': 2000, 'form_fields': None}
+        # categories为空时使用表单默认类别，form_fields可覆盖表单字段名
+        'partitions': None,
+        'storage_state_file': '最终抓取测试/storage_state.json',  # 会话状态文件，下次运行时恢复cookie
+        'browser_endpoint': None, # 常驻浏览器地址，例如 'http://127.0.0.1:9222'（先运行 python warm_browser.py）
+        'metrics_port': None,     # 设置端口（如9108）时提供 /metrics（Prometheus文本）和 /metrics.json
+        # 单篇文书追踪，例如 {'sample_rate': 0.1, 'slow_threshold': 20, 'playwright_traces': True}
+        'tracing': None,
+        'har_record': args.record_har,
+        'har_replay': args.replay_har,
+        'archive_html': True    # 详情页原始HTML归档，之后可用 python html_archive.py reextract 离线重新解析
     }
     
     print("配置:")
@@ -606,7 +1172,27 @@ async def main():
     crawler = FixedAsyncCourtCrawler(
         headless=config['headless'],
         max_cases=config['max_cases'],
-        output_dir=config['output_dir']
+        output_dir=config['output_dir'],
+        concurrency=config['concurrency'],
+        queue_size=config['queue_size'],
+        max_attempts=config['max_attempts'],
+        retry_dead=config['retry_dead'],
+        adaptive=config['adaptive'],
+        max_rate=config['max_rate'],
+        http_detail=config['http_detail'],
+        resume=config['resume'],
+        block_resources=config['block_resources'],
+        resource_rules=config['resource_rules'],
+        parquet_output=config['parquet_output'],
+        shards=config['shards'],
+        partitions=config['partitions'],
+        storage_state_file=config['storage_state_file'],
+        browser_endpoint=config['browser_endpoint'],
+        metrics_port=config['metrics_port'],
+        tracing=config['tracing'],
+        har_record=config['har_record'],
+        har_replay=config['har_replay'],
+        archive_html=config['archive_html']
     )
     
     await crawler.run(config['start_url'])
@@ -0,0 +1,54 @@
+import tempfile
+import unittest
+
+from checkpoint import CrawlCheckpoint
+
+class PartitionRowKeyTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.checkpoint = CrawlCheckpoint(self.tmp.name, 'https://example.com/list')
+        self.checkpoint.start(False, 'cases.jsonl')
+    
+    def tearDown(self):
+        self.checkpoint.close()
+        self.tmp.cleanup()
+    
+    def test_partitions_sharing_page_and_row(self):
+        # 两个查询分区的第1页第一行行号都是tr0，但文书不同
+        q1 = {'row_id': 'tr0', 'page_number': 1, 'detail_param': 'P1', 'case_number': '（2024）沪01民终1号'}
+        q2 = {'row_id': 'tr0', 'page_number': 1, 'detail_param': 'P2', 'case_number': '（2024）沪01民终2号'}
+        
+        self.checkpoint.mark_done(q1)
+        self.assertTrue(self.checkpoint.is_done(q1))
+        self.assertFalse(self.checkpoint.is_done(q2))
+        
+        self.checkpoint.mark_done(q2)
+        self.assertEqual(self.checkpoint.done_count, 2)
+    
+    def test_row_key_without_identifiers(self):
+        case = {'row_id': 'tr3', 'page_number': 2}
+        self.checkpoint.mark_done(case)
+        self.assertTrue(self.checkpoint.is_done(dict(case)))
+        self.assertFalse(self.checkpoint.is_done({'row_id': 'tr3', 'page_number': 3}))
+    
+    def test_reload_counts_documents(self):
+        self.checkpoint.mark_done({'row_id': 'tr0', 'page_number': 1, 'detail_param': 'P1'})
+        self.checkpoint.mark_done({'row_id': 'tr0', 'page_number': 1, 'detail_param': 'P2'})
+        self.checkpoint.close()
+        
+        reloaded = CrawlCheckpoint(self.tmp.name, 'https://example.com/list')
+        self.assertTrue(reloaded.load())
+        self.assertEqual(reloaded.done_count, 2)
+    
+    def test_unsynced_events_are_flushed(self):
+        # fsync按批进行，但每条事件都已写到文件，进程被杀后可以恢复
+        self.checkpoint.mark_done({'row_id': 'tr0', 'page_number': 1, 'detail_param': 'P1'})
+        self.checkpoint.record_page(2)
+        
+        reloaded = CrawlCheckpoint(self.tmp.name, 'https://example.com/list')
+        self.assertTrue(reloaded.load())
+        self.assertEqual(reloaded.page, 2)
+        self.assertEqual(reloaded.done_count, 1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,45 @@
+import os
+import tempfile
+import unittest
+
+from known_index import KnownDocIndex
+
+class KnownDocIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, 'known_docs.sqlite3')
+        self.index = KnownDocIndex(self.path)
+    
+    def tearDown(self):
+        self.index.close()
+        self.tmp.cleanup()
+    
+    def test_split_known_by_case_number_or_param(self):
+        self.index.add({'case_number': '（2024）沪01民终1号', 'detail_param': 'P1'})
+        cases = [
+            {'case_number': '（2024）沪01民终1号', 'detail_param': 'P9'},
+            {'case_number': '', 'detail_param': 'P1'},
+            {'case_number': '（2024）沪01民终2号', 'detail_param': 'P2'},
+        ]
+        new_cases, known_cases = self.index.split_known(cases)
+        self.assertEqual(new_cases, [cases[2]])
+        self.assertEqual(known_cases, cases[:2])
+    
+    def test_case_without_number_is_not_indexed(self):
+        self.index.add({'case_number': '', 'detail_param': 'P1'})
+        self.assertEqual(self.index.count(), 0)
+        new_cases, _ = self.index.split_known([{'detail_param': 'P1'}])
+        self.assertEqual(len(new_cases), 1)
+    
+    def test_pending_adds_survive_reopen(self):
+        # add()批量提交，close时写入剩余的文书
+        self.index.add({'case_number': '（2024）沪01民终1号', 'detail_param': 'P1'})
+        self.index.close()
+        
+        self.index = KnownDocIndex(self.path)
+        self.assertEqual(self.index.count(), 1)
+        _, known_cases = self.index.split_known([{'case_number': '（2024）沪01民终1号'}])
+        self.assertEqual(len(known_cases), 1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,63 @@
+import unittest
+
+from pacing import AimdController
+from rate_limiter import RateLimiter
+
+class AimdControllerTest(unittest.IsolatedAsyncioTestCase):
+    def make_controller(self, **options):
+        options.setdefault('window', 2)
+        options.setdefault('cooldown', 0)
+        self.limiter = RateLimiter(max_rate=1.0, jitter=0)
+        return AimdController(self.limiter, max_rate=1.0, max_concurrency=3, options=options)
+    
+    async def observe_window(self, controller, latency):
+        for _ in range(controller.options['window']):
+            await controller.observe(latency=latency)
+    
+    async def test_additive_increase_per_window(self):
+        controller = self.make_controller(start_rate=0.5, increase=0.1)
+        await controller.observe(latency=1.0)
+        self.assertEqual(controller.rate, 0.5)
+        
+        await controller.observe(latency=1.0)
+        self.assertAlmostEqual(controller.rate, 0.6)
+        self.assertAlmostEqual(self.limiter.max_rate, 0.6)
+        # Little定律：0.6次/秒 × 1秒 + 1 = 2，但每个窗口最多加一个worker
+        self.assertEqual(controller.concurrency, 2)
+    
+    async def test_multiplicative_decrease_on_failure(self):
+        controller = self.make_controller(start_rate=0.8, start_concurrency=2)
+        await controller.observe(failure='timeout')
+        self.assertAlmostEqual(controller.rate, 0.4)
+        self.assertEqual(controller.concurrency, 1)
+        self.assertEqual(controller.decreases, 1)
+        
+        # 不低于min_rate
+        for _ in range(10):
+            await controller.observe(failure='timeout')
+        self.assertEqual(controller.rate, controller.min_rate)
+    
+    async def test_cooldown_limits_decreases(self):
+        controller = self.make_controller(start_rate=0.8, cooldown=60)
+        await controller.observe(failure='timeout')
+        await controller.observe(failure='timeout')
+        self.assertEqual(controller.decreases, 1)
+        self.assertAlmostEqual(controller.rate, 0.4)
+    
+    async def test_slow_window_decreases(self):
+        controller = self.make_controller(start_rate=0.5)
+        await self.observe_window(controller, 1.0)
+        rate = controller.rate
+        await self.observe_window(controller, 5.0)
+        self.assertAlmostEqual(controller.rate, rate * 0.5)
+    
+    async def test_never_exceeds_ceiling(self):
+        controller = self.make_controller(start_rate=0.5, increase=0.2)
+        for _ in range(20):
+            await self.observe_window(controller, 3.0)
+        self.assertEqual(controller.rate, 1.0)
+        self.assertEqual(controller.concurrency, 3)
+        self.assertLessEqual(self.limiter.max_rate, 1.0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,44 @@
+import unittest
+from datetime import date
+
+from query_planner import QueryPlanner, QueryWindow, initial_windows
+
+class QueryPlannerTest(unittest.IsolatedAsyncioTestCase):
+    def test_split_halves_dates(self):
+        first, second = QueryWindow('', date(2024, 1, 1), date(2024, 1, 10)).split()
+        self.assertEqual((first.date_from, first.date_to), (date(2024, 1, 1), date(2024, 1, 5)))
+        self.assertEqual((second.date_from, second.date_to), (date(2024, 1, 6), date(2024, 1, 10)))
+        
+        first, second = QueryWindow('', date(2024, 1, 1), date(2024, 1, 3)).split()
+        self.assertEqual(first.days + second.days, 3)
+    
+    async def test_plan_splits_until_under_limit(self):
+        # 每天100条，上限250：10天的窗口要拆到每段不超过2天
+        async def count(window):
+            return window.days * 100
+        
+        planner = QueryPlanner(count, max_results=250)
+        partitions = await planner.plan(initial_windows(['民事'], '2024-01-01', '2024-01-10'))
+        
+        windows = [window for window, _ in partitions]
+        self.assertTrue(all(count <= 250 for _, count in partitions))
+        self.assertEqual(sum(window.days for window in windows), 10)
+        # 按日期顺序且首尾相接
+        self.assertEqual(windows[0].date_from, date(2024, 1, 1))
+        self.assertEqual(windows[-1].date_to, date(2024, 1, 10))
+        for previous, window in zip(windows, windows[1:]):
+            self.assertEqual((window.date_from - previous.date_to).days, 1)
+    
+    async def test_plan_drops_empty_and_keeps_single_day(self):
+        async def count(window):
+            if window.date_from >= date(2024, 1, 3):
+                return 0
+            return 5000 if window.days == 1 else 10000
+        
+        planner = QueryPlanner(count, max_results=2000)
+        partitions = await planner.plan([QueryWindow('', date(2024, 1, 1), date(2024, 1, 4))])
+        self.assertEqual([(w.date_from, w.days, c) for w, c in partitions],
+                         [(date(2024, 1, 1), 1, 5000), (date(2024, 1, 2), 1, 5000)])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,68 @@
+import json
+import tempfile
+import unittest
+from pathlib import Path
+
+from retry_queue import (DEAD_LETTER_FILE, EMPTY_CONTENT, TIMEOUT, DeadLetterLog,
+                         RetryQueue, take_dead_letters)
+
+class RetryQueueTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.dead_path = Path(self.tmp.name) / DEAD_LETTER_FILE
+        self.dead_letters = DeadLetterLog(self.dead_path)
+    
+    def tearDown(self):
+        self.dead_letters.close()
+        self.tmp.cleanup()
+    
+    async def test_backoff_doubles_with_jitter_and_cap(self):
+        retries = RetryQueue(self.dead_letters, base_delay=5.0, max_delay=120.0)
+        for attempts, delay in ((1, 5.0), (2, 10.0), (3, 20.0), (10, 120.0)):
+            for _ in range(20):
+                backoff = retries.backoff(attempts)
+                self.assertGreaterEqual(backoff, delay * 0.5)
+                self.assertLessEqual(backoff, delay * 1.5)
+    
+    async def test_retry_then_dead_letter(self):
+        retries = RetryQueue(self.dead_letters, max_attempts=2, base_delay=0, max_delay=0)
+        case = {'case_number': '（2024）沪01民终1号', 'detail_param': 'P1'}
+        
+        self.assertEqual(await retries.failed(case, TIMEOUT, 'timeout'), 'retry')
+        self.assertIs(await retries.next_due(), case)
+        await retries.task_done()
+        
+        self.assertEqual(await retries.failed(case, EMPTY_CONTENT, '正文过短'), 'dead')
+        self.assertEqual((retries.scheduled, retries.dead), (1, 1))
+        # 尝试次数只记在队列里，不写进文书记录
+        self.assertNotIn('attempts', case)
+        
+        self.dead_letters.close()
+        with open(self.dead_path, 'r', encoding='utf-8') as f:
+            entry = json.loads(f.readline())
+        self.assertEqual(entry['kind'], EMPTY_CONTENT)
+        self.assertEqual(entry['attempts'], 2)
+        self.assertEqual(entry['case']['detail_param'], 'P1')
+    
+    async def test_forget_resets_attempts(self):
+        retries = RetryQueue(self.dead_letters, max_attempts=2, base_delay=0, max_delay=0)
+        case = {'case_number': '（2024）沪01民终1号'}
+        await retries.failed(case, TIMEOUT)
+        retries.forget(case)
+        self.assertEqual(await retries.failed(case, TIMEOUT), 'retry')
+    
+    async def test_take_dead_letters_dedupes_and_archives(self):
+        case = {'case_number': '（2024）沪01民终1号', 'detail_param': 'P1'}
+        self.dead_letters.append(case, TIMEOUT, 'timeout', 3)
+        self.dead_letters.append(dict(case), TIMEOUT, 'timeout', 3)
+        self.dead_letters.append({'case_number': '（2024）沪01民终2号', 'detail_param': 'P2'}, TIMEOUT, '', 3)
+        self.dead_letters.close()
+        
+        cases = take_dead_letters(self.dead_path)
+        self.assertEqual([c['detail_param'] for c in cases], ['P1', 'P2'])
+        self.assertFalse(self.dead_path.exists())
+        self.assertEqual(len(list(Path(self.tmp.name).glob('*.replayed.jsonl'))), 1)
+        self.assertEqual(take_dead_letters(self.dead_path), [])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,197 @@
+"""
+单篇文书追踪
+记录每篇文书在crawl_detail_page各步骤的耗时（span），按采样率或超过慢阈值写入JSONL追踪文件。
+设置trace_dir时每个浏览器上下文持续录制滚动的Playwright trace分段，慢文书或被采样的文书结束时
+把当前分段保存为zip，否则在上下文上没有进行中的文书时丢弃。
+一个上下文同一时间只能录制一个分段，多个worker共用上下文时，保存的分段也包含同时进行的其他文书。
+关闭追踪时使用NULL_TRACE，span只是空的上下文管理器，几乎没有开销
+"""
+
+import asyncio
+import json
+import random
+import re
+import time
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
+from pathlib import Path
+
+DEFAULT_SAMPLE_RATE = 0.1
+
+# 单篇文书总耗时超过多少秒视为慢文书
+DEFAULT_SLOW_THRESHOLD = 20.0
+
+# 上下文一直有进行中的文书时，分段录制超过多少秒也滚动丢弃，限制trace占用的内存
+MAX_CHUNK_SECONDS = 300
+
+class NullTrace:
+    """追踪关闭或未采样时使用，所有操作都是空操作"""
+    sampled = False
+    
+    def span(self, name):
+        return nullcontext()
+    
+    def record(self, name, started):
+        pass
+
+NULL_TRACE = NullTrace()
+
+class CaseTrace:
+    def __init__(self, case, worker_id, sampled):
+        self.case_number = case.get('case_number', '')
+        self.page_number = case.get('page_number')
+        self.worker_id = worker_id
+        self.sampled = sampled
+        self.started = time.monotonic()
+        self.started_at = datetime.now().isoformat()
+        self.spans = []
+        self.context = None
+    
+    @contextmanager
+    def span(self, name):
+        start = time.monotonic()
+        error = ''
+        try:
+            yield
+        except BaseException as e:
+            error = f"{type(e).__name__}: {str(e)[:200]}"
+            raise
+        finally:
+            self._add(name, start, error)
+    
+    def record(self, name, started):
+        """补记一个从started（time.monotonic()）到现在的span"""
+        self._add(name, started, '')
+    
+    def _add(self, name, start, error):
+        span = {
+            'name': name,
+            'start': round(start - self.started, 3),
+            'duration': round(time.monotonic() - start, 3),
+        }
+        if error:
+            span['error'] = error
+        self.spans.append(span)
+
+class CaseTracer:
+    def __init__(self, path, sample_rate=DEFAULT_SAMPLE_RATE, slow_threshold=DEFAULT_SLOW_THRESHOLD,
+                 trace_dir=None):
+        """
+        path: span输出的JSONL文件
+        sample_rate: 采样比例，被采样的文书无论快慢都写出span并保存Playwright trace
+        slow_threshold: 超过该秒数的文书总会写出span并保存Playwright trace
+        trace_dir: Playwright trace保存目录，为None时不录制
+        """
+        self.path = Path(path)
+        self.sample_rate = sample_rate
+        self.slow_threshold = slow_threshold
+        self.trace_dir = Path(trace_dir) if trace_dir else None
+        if self.trace_dir:
+            self.trace_dir.mkdir(parents=True, exist_ok=True)
+        self.written = 0
+        self.slow_cases = 0
+        self._file = open(self.path, 'a', encoding='utf-8')
+        # 每个浏览器上下文同一时间只能录制一个trace分段：上下文 -> {'started': 开始时间, 'active': 进行中的文书}
+        self._tracing_contexts = set()
+        self._chunks = {}
+        self._chunk_lock = asyncio.Lock()
+    
+    async def start_case(self, case, worker_id, context=None):
+        trace = CaseTrace(case, worker_id, random.random() < self.sample_rate)
+        if self.trace_dir and context is not None:
+            async with self._chunk_lock:
+                chunk = await self._open_chunk(context)
+                if chunk is not None:
+                    chunk['active'].add(trace)
+                    trace.context = context
+        return trace
+    
+    async def _open_chunk(self, context):
+        """返回上下文正在录制的分段，没有时开始一个新分段"""
+        chunk = self._chunks.get(context)
+        if chunk is not None:
+            return chunk
+        try:
+            if context not in self._tracing_contexts:
+                await context.tracing.start(screenshots=True, snapshots=True)
+                # 丢弃start自带的第一段，之后按滚动分段录制
+                await context.tracing.stop_chunk()
+                self._tracing_contexts.add(context)
+            await context.tracing.start_chunk()
+        except Exception as e:
+            print(f"  ⚠️ 启动Playwright trace失败: {str(e)[:100]}")
+            return None
+        chunk = {'started': time.monotonic(), 'active': set()}
+        self._chunks[context] = chunk
+        return chunk
+    
+    async def _close_chunk(self, context, trace, keep):
+        """
+        文书结束时处理所在上下文的分段：keep=True时保存并返回zip路径；
+        否则上下文空闲或分段超过MAX_CHUNK_SECONDS时丢弃。分段结束后仍有进行中的文书则立即开始新分段
+        """
+        chunk = self._chunks.get(context)
+        if chunk is None:
+            return ''
+        chunk['active'].discard(trace)
+        if not keep and chunk['active'] and time.monotonic() - chunk['started'] < MAX_CHUNK_SECONDS:
+            return ''
+        
+        trace_file = ''
+        try:
+            if keep:
+                name = re.sub(r'[\\/:*?"<>|\s]+', '_', trace.case_number) or 'case'
+                trace_file = str(self.trace_dir / f"{name}_{int(time.time())}.zip")
+                await context.tracing.stop_chunk(path=trace_file)
+            else:
+                await context.tracing.stop_chunk()
+        except Exception as e:
+            trace_file = ''
+            print(f"  ⚠️ 保存Playwright trace失败: {str(e)[:100]}")
+        
+        del self._chunks[context]
+        if chunk['active']:
+            new_chunk = await self._open_chunk(context)
+            if new_chunk is not None:
+                new_chunk['active'] = chunk['active']
+            else:
+                for other in chunk['active']:
+                    other.context = None
+        return trace_file
+    
+    async def finish_case(self, trace, status):
+        """结束一篇文书的追踪，慢文书或被采样的文书写入JSONL"""
+        duration = time.monotonic() - trace.started
+        slow = duration >= self.slow_threshold
+        
+        trace_file = ''
+        if trace.context is not None:
+            context, trace.context = trace.context, None
+            async with self._chunk_lock:
+                trace_file = await self._close_chunk(context, trace, keep=slow or trace.sampled)
+        
+        if slow:
+            self.slow_cases += 1
+            print(f"  🐢 慢文书 {trace.case_number}: {duration:.1f}秒" + (f"，trace: {trace_file}" if trace_file else ""))
+        if not (slow or trace.sampled):
+            return
+        
+        entry = {
+            'case_number': trace.case_number,
+            'page_number': trace.page_number,
+            'worker': trace.worker_id,
+            'status': status,
+            'started_at': trace.started_at,
+            'duration': round(duration, 3),
+            'slow': slow,
+            'sampled': trace.sampled,
+            'spans': trace.spans,
+        }
+        if trace_file:
+            entry['playwright_trace'] = trace_file
+        self._file.write(json.dumps(entry, ensure_ascii=False) + '\n')
+        self._file.flush()
+        self.written += 1
+    
+    def close(self):
+        self._file.close()
@@ -0,0 +1,44 @@
+"""
+常驻浏览器
+启动一个开启远程调试端口的Chromium并保持运行，抓取程序配置browser_endpoint后通过CDP连接，
+省去每次运行冷启动浏览器的时间，适合频繁执行的小规模增量抓取。
+使用方法：python warm_browser.py [--port 9222] [--headless]
+按 Ctrl+C 关闭
+"""
+
+import argparse
+import asyncio
+from playwright.async_api import async_playwright
+
+async def serve(port, headless):
+    playwright = await async_playwright().start()
+    browser = None
+    try:
+        browser = await playwright.chromium.launch(
+            headless=headless,
+            args=[f'--remote-debugging-port={port}']
+        )
+        print(f"🔥 常驻浏览器已启动 (Chromium {browser.version})")
+        print(f"   抓取配置: 'browser_endpoint': 'http://127.0.0.1:{port}'")
+        print("   按 Ctrl+C 关闭")
+        
+        # 一直运行，直到被中断
+        await asyncio.Event().wait()
+    finally:
+        if browser:
+            await browser.close()
+        await playwright.stop()
+
+def main():
+    parser = argparse.ArgumentParser(description="启动供抓取程序连接的常驻浏览器")
+    parser.add_argument('--port', type=int, default=9222, help="远程调试端口")
+    parser.add_argument('--headless', action='store_true', help="无界面运行")
+    args = parser.parse_args()
+    
+    try:
+        asyncio.run(serve(args.port, args.headless))
+    except KeyboardInterrupt:
+        print("\n👋 常驻浏览器已关闭")
+
+if __name__ == "__main__":
+    main()